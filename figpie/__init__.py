@@ -4,14 +4,24 @@ from .properties import Cell
 from .properties import Action
 from .properties import CellContainer
 from .properties import StrictCellContainer
+from .properties import OptionSet
 from .properties import Lambda
+from .properties import LambdaCacheInfo
+from .properties import ReactiveLambda
 from .properties import Property
+from .properties import PropertyArray
 from .properties import PropertyBool
 from .properties import PropertyEnum
 from .properties import PropertyFloat
 from .properties import PropertyInt
 from .properties import PropertyString
 from .properties import Union
+from .snapshot import Snapshot
+from .concurrency import RWLock
+from .concurrency import guard
+from .concurrency import unguard
+from .diff import Patch
+from .diff import diff
 
 from .properties import NotExecutableException
 from .properties import NotWriteableException
@@ -20,5 +30,8 @@ from .properties import WrongTypeException
 from .properties import WrongValueException
 from .properties import WrongNameException
 
+from .history import History
+from .search import FuzzyIndex
+from .search import NameIndex
 from .menu import Menu
 from .state import State
@@ -0,0 +1,463 @@
+#encoding=utf-8
+from __future__ import absolute_import
+
+import array
+import json
+import mmap
+import os
+import struct
+from collections import OrderedDict
+from itertools import islice, izip
+
+from .properties import (_PendingCell, Action, Cell, CellContainer,
+        StrictCellContainer, Lambda, Property, PropertyArray, PropertyBool,
+        PropertyEnum, PropertyFloat, PropertyInt, PropertyString, Union,
+        WrongTypeException, WrongValueException)
+from . import concurrency as conc
+
+
+'''
+Binary format of trees, read lazily from memory mapped files.
+
+File layout (little endian):
+    header      MAGIC, VERSION (H)
+    records     one per cell, children before their container
+    name table  count (I), count + 1 offsets (Q) into the blob, blob of
+                utf-8 names
+    trailer     offset of name table (Q), offset of root record (Q), MAGIC
+
+Every record starts with kind (B), flags (B: 1 not readable, 2 not
+writeable) and name index (I), followed by:
+    container   count (I), name indexes (count * I), offsets (count * Q)
+    union       index of mode name (I), number of modes (I), then for every
+                mode: name index (I) and cells as in container
+    int         value (q)
+    float       value (d)
+    str         utf-8 text
+    enum        value index (I), count (I), option name indexes (count * I)
+    bool        value (B)
+    array       typecode (c), json minimum and maximum, count (Q), items
+    variant     json text
+where text is length (I) and bytes. Actions and lambdas are not written.
+
+Containers of a loaded tree keep only the offset of their record: a cell
+looked up by name is found through indexes of the name table and of the
+container's name indexes (both built on first lookup) and decoded from the
+mapping, so opening a file does not depend on it's size and subtrees that
+are never accessed are not decoded at all. Placeholders of all cells (as
+in LAZY containers) are made only when a container is listed or changed.
+Unions are decoded with all their cells.
+'''
+
+MAGIC = 'FGPB'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sH')
+_TRAILER = struct.Struct('<QQ4s')
+_RECORD = struct.Struct('<BBI')
+_COUNT = struct.Struct('<I')
+
+CELL, CONTAINER, STRICT, UNION, VARIANT, INT, FLOAT, STR, ENUM, BOOL, ARRAY \
+        = range(11)
+
+_NOT_READABLE = 1
+_NOT_WRITEABLE = 2
+
+
+''' Writes tree to given path. The file is written aside and renamed, so
+trees loaded from the path keep reading their (still mapped) old file. '''
+def save(tree, path):
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as stream:
+        dump(tree, stream)
+        stream.flush()
+        os.fsync(stream.fileno())
+    os.rename(temporary, path)
+
+
+''' Writes tree to a binary stream (does not need to be seekable) '''
+def dump(tree, stream):
+    _Writer(stream).run(tree)
+
+
+def dumps(tree):
+    chunks = []
+    _Writer(_ListStream(chunks)).run(tree)
+    return ''.join(chunks)
+
+
+''' Opens tree from given path; the file stays mapped while any cell of the
+tree is alive '''
+def load(path):
+    with open(path, 'rb') as stream:
+        mapping = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    return _Reader(mapping).root()
+
+
+def loads(data):
+    return _Reader(data).root()
+
+
+class _ListStream(object):
+
+    def __init__(self, chunks):
+        self.write = chunks.append
+
+
+class _Writer(object):
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._offset = 0
+        self._names = {}
+
+    def run(self, tree):
+        self._write(_HEADER.pack(MAGIC, VERSION))
+        root = self._cell(tree)
+        if root is None:
+            raise WrongValueException('{} cannot be written'.format(tree))
+        names_offset = self._offset
+        self._write_names()
+        self._write(_TRAILER.pack(names_offset, root, MAGIC))
+
+    def _write(self, data):
+        self._stream.write(data)
+        self._offset += len(data)
+
+    def _name(self, name):
+        index = self._names.get(name)
+        if index is None:
+            index = self._names[name] = len(self._names)
+        return index
+
+    def _write_names(self):
+        names = [None] * len(self._names)
+        for name, index in self._names.iteritems():
+            names[index] = (name.encode('utf-8')
+                    if isinstance(name, unicode) else name)
+        offsets = [0]
+        for name in names:
+            offsets.append(offsets[-1] + len(name))
+        self._write(_COUNT.pack(len(names)))
+        self._write(struct.pack('<{}Q'.format(len(offsets)), *offsets))
+        self._write(''.join(names))
+
+    ''' Writes cell (after it's subtree); returns offset of it's record or
+    None for cells that are not written '''
+    def _cell(self, cell):
+        if isinstance(cell, (Action, Lambda)):
+            return None
+
+        if isinstance(cell, Union):
+            modes = [(mode, self._cells(cells))
+                    for mode, cells in cell._map.iteritems()]
+            body = [_COUNT.pack(self._name(cell.mode)), _COUNT.pack(len(modes))]
+            for mode, cells in modes:
+                body.append(_COUNT.pack(self._name(mode)))
+                body.append(self._pairs(cells))
+            return self._record(UNION, cell, ''.join(body))
+        elif isinstance(cell, CellContainer):
+            kind = STRICT if isinstance(cell, StrictCellContainer) else CONTAINER
+            return self._record(kind, cell, self._pairs(self._cells(cell)))
+        elif isinstance(cell, Property):
+            kind, body = self._value(cell)
+            return self._record(kind, cell, body)
+        return self._record(CELL, cell, '')
+
+    def _cells(self, cells):
+        written = []
+        for cell in cells:
+            offset = self._cell(cell)
+            if offset is not None:
+                written.append((self._name(cell.name), offset))
+        return written
+
+    def _pairs(self, pairs):
+        count = len(pairs)
+        return (_COUNT.pack(count)
+                + struct.pack('<{}I'.format(count), *[n for n, o in pairs])
+                + struct.pack('<{}Q'.format(count), *[o for n, o in pairs]))
+
+    def _value(self, cell):
+        value = cell._value
+        if isinstance(cell, PropertyBool):
+            return BOOL, struct.pack('<B', value == 'True')
+        elif isinstance(cell, PropertyEnum):
+            options = [self._name(name) for name in cell._options.keys()]
+            return ENUM, (_COUNT.pack(self._name(value))
+                    + _COUNT.pack(len(options))
+                    + struct.pack('<{}I'.format(len(options)), *options))
+        elif isinstance(cell, PropertyArray):
+            return ARRAY, (cell._typecode
+                    + _text(json.dumps(cell._minimum))
+                    + _text(json.dumps(cell._maximum))
+                    + struct.pack('<Q', len(value)) + value.tostring())
+        elif isinstance(cell, PropertyString):
+            return STR, _text(value)
+        elif isinstance(cell, PropertyFloat):
+            return FLOAT, struct.pack('<d', value)
+        elif isinstance(cell, PropertyInt):
+            return INT, struct.pack('<q', value)
+        return VARIANT, _text(json.dumps(value))
+
+    def _record(self, kind, cell, body):
+        flags = ((0 if cell._r else _NOT_READABLE)
+                | (0 if cell._w else _NOT_WRITEABLE)
+                if isinstance(cell, Property) else 0)
+        offset = self._offset
+        self._write(_RECORD.pack(kind, flags, self._name(cell.name)))
+        self._write(body)
+        return offset
+
+
+def _text(value):
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return _COUNT.pack(len(value)) + value
+
+
+class _Reader(object):
+
+    def __init__(self, data):
+        self._data = data
+        if len(data) < _HEADER.size + _TRAILER.size:
+            raise WrongValueException('not a figpie binary file')
+        magic, version = _HEADER.unpack_from(data, 0)
+        names_offset, self._root, trailer_magic = _TRAILER.unpack_from(
+                data, len(data) - _TRAILER.size)
+        if magic != MAGIC or trailer_magic != MAGIC:
+            raise WrongValueException('not a figpie binary file')
+        if version != VERSION:
+            raise WrongValueException('unsupported version {}'
+                    .format(version))
+        count, = _COUNT.unpack_from(data, names_offset)
+        self._names_count = count
+        self._names_table = names_offset + _COUNT.size
+        self._names_blob = self._names_table + 8 * (count + 1)
+        self._names = {}
+        self._name_indexes = None
+
+    def root(self):
+        return self.cell(self._root)
+
+    def _name(self, index):
+        name = self._names.get(index)
+        if name is None:
+            if index >= self._names_count:
+                raise WrongValueException('wrong name index {}'.format(index))
+            start, end = struct.unpack_from('<2Q', self._data,
+                    self._names_table + 8 * index)
+            raw = self._data[self._names_blob + start:self._names_blob + end]
+            try:
+                raw.decode('ascii')
+                name = intern(raw)
+            except UnicodeDecodeError:
+                name = raw.decode('utf-8')
+            self._names[index] = name
+        return name
+
+    ''' Returns index of given name in the name table (or None) '''
+    def _name_index(self, name):
+        indexes = self._name_indexes
+        if indexes is None:
+            offsets = struct.unpack_from('<{}Q'.format(self._names_count + 1),
+                    self._data, self._names_table)
+            blob = self._data[self._names_blob:self._names_blob + offsets[-1]]
+            indexes = self._name_indexes = dict(izip(
+                    (blob[start:end] for start, end
+                        in izip(offsets, islice(offsets, 1, None))),
+                    xrange(self._names_count)))
+        if isinstance(name, unicode):
+            name = name.encode('utf-8')
+        return indexes.get(name)
+
+    def _text(self, offset):
+        length, = _COUNT.unpack_from(self._data, offset)
+        start = offset + _COUNT.size
+        return self._data[start:start + length], start + length
+
+    def _pairs(self, offset):
+        count, = _COUNT.unpack_from(self._data, offset)
+        offset += _COUNT.size
+        names = struct.unpack_from('<{}I'.format(count), self._data, offset)
+        offset += 4 * count
+        offsets = struct.unpack_from('<{}Q'.format(count), self._data, offset)
+        cached = self._names
+        return [cached.get(name) or self._name(name) for name in names], \
+                offsets, offset + 8 * count
+
+    ''' Decodes cell from record at given offset '''
+    def cell(self, offset):
+        data = self._data
+        kind, flags, name = _RECORD.unpack_from(data, offset)
+        name = self._name(name)
+        offset += _RECORD.size
+        rw = {'r': not flags & _NOT_READABLE, 'w': not flags & _NOT_WRITEABLE}
+
+        if kind in (CONTAINER, STRICT):
+            container_type = (MappedStrictContainer if kind == STRICT
+                    else MappedContainer)
+            return container_type(name, self, offset)
+        elif kind == UNION:
+            mode, count = struct.unpack_from('<2I', data, offset)
+            offset += 8
+            modes = []
+            for i in xrange(count):
+                mode_name, = _COUNT.unpack_from(data, offset)
+                names, offsets, offset = self._pairs(offset + _COUNT.size)
+                modes.append((self._name(mode_name),
+                        [self.cell(cell_offset) for cell_offset in offsets]))
+            union = Union(name, OrderedDict(modes))
+            union.mode = self._name(mode)
+            return union
+        elif kind == CELL:
+            return Cell(name)
+        elif kind == INT:
+            return PropertyInt(name,
+                    struct.unpack_from('<q', data, offset)[0], **rw)
+        elif kind == FLOAT:
+            return PropertyFloat(name,
+                    struct.unpack_from('<d', data, offset)[0], **rw)
+        elif kind == STR:
+            return PropertyString(name,
+                    self._text(offset)[0].decode('utf-8'), **rw)
+        elif kind == ENUM:
+            value, count = struct.unpack_from('<2I', data, offset)
+            options = struct.unpack_from('<{}I'.format(count), data,
+                    offset + 8)
+            return PropertyEnum(name, [self._name(i) for i in options],
+                    self._name(value), **rw)
+        elif kind == BOOL:
+            return PropertyBool(name,
+                    bool(struct.unpack_from('<B', data, offset)[0]), **rw)
+        elif kind == ARRAY:
+            typecode = data[offset]
+            minimum, offset = self._text(offset + 1)
+            maximum, offset = self._text(offset)
+            count, = struct.unpack_from('<Q', data, offset)
+            offset += 8
+            values = array.array(typecode)
+            values.fromstring(data[offset:offset + count * values.itemsize])
+            return PropertyArray(name, values, typecode, json.loads(minimum),
+                    json.loads(maximum), **rw)
+        elif kind == VARIANT:
+            return Property(name, json.loads(self._text(offset)[0]), **rw)
+        raise WrongValueException('unknown record kind {}'.format(kind))
+
+
+''' Unpacks cells of a mapped container on first access to given
+attribute; the unpacked attribute set on the instance hides it then '''
+class _Unpacked(object):
+
+    def __init__(self, name):
+        self._name = name
+
+    def __get__(self, container, owner):
+        if container is None:
+            return self
+        container._unpack()
+        return container.__dict__[self._name]
+
+
+''' Container of a loaded tree; cells are decoded on first access '''
+class _Mapped(object):
+
+    _cells = _Unpacked('_cells')
+    _index = _Unpacked('_index')
+
+    ''' Positions of cells by index of their names, built on first lookup '''
+    _positions = None
+
+    def __init__(self, name, reader, offset):
+        super(_Mapped, self).__init__(name, [])
+        del self._cells, self._index
+        self._reader = reader
+        self._offset = offset
+        self._count, = _COUNT.unpack_from(reader._data, offset)
+        # cells decoded before unpacking, by position
+        self._created = {}
+
+    def _unpacked(self):
+        return '_index' in self.__dict__
+
+    def _unpack(self):
+        if conc._count:
+            with conc.creating:
+                if not self._unpacked():
+                    self._put_unpacked()
+        else:
+            self._put_unpacked()
+
+    def _put_unpacked(self):
+        names, offsets, _ = self._reader._pairs(self._offset)
+        created = self._created
+        cells = []
+        index = {}
+        for position, (cell_name, offset) in enumerate(izip(names, offsets)):
+            cell = created.get(position)
+            if cell is None:
+                cell = _PendingCell(cell_name, offset, position)
+            cells.append(cell)
+            index[cell_name] = cell
+        self._created = None
+        self._cells = cells
+        self._index = index
+
+    def _position(self, name):
+        positions = self._positions
+        if positions is None:
+            indexes = struct.unpack_from('<{}I'.format(self._count),
+                    self._reader._data, self._offset + _COUNT.size)
+            positions = self._positions = dict(
+                    izip(indexes, xrange(self._count)))
+        return positions.get(self._reader._name_index(name))
+
+    def _lookup(self, name):
+        if self._unpacked():
+            return super(_Mapped, self)._lookup(name)
+        position = self._position(name)
+        if position is None:
+            return None
+        cell = self._created.get(position)
+        if cell is not None:
+            return cell
+        if not conc._count:
+            return self._create_at(position)
+        with conc.creating:
+            # other thread could create it (or unpack the container) first
+            if self._unpacked():
+                return super(_Mapped, self)._lookup(name)
+            cell = self._created.get(position)
+            return cell if cell is not None else self._create_at(position)
+
+    def _create_at(self, position):
+        offset, = struct.unpack_from('<Q', self._reader._data, self._offset
+                + _COUNT.size + 4 * self._count + 8 * position)
+        cell = self._reader.cell(offset)
+        if not self._is_proper_type(cell):
+            raise WrongTypeException('cell should be of type {} ({} given)'
+                    .format(self.CONTAINED_TYPE, type(cell)))
+        self._created[position] = cell
+        cell._parent = self
+        return cell
+
+    def contains(self, name):
+        if self._unpacked():
+            return super(_Mapped, self).contains(name)
+        return self._position(name) is not None
+
+    def __len__(self):
+        if self._unpacked():
+            return super(_Mapped, self).__len__()
+        return self._count
+
+    def _create_pending(self, pending):
+        return self._reader.cell(pending.creator)
+
+
+class MappedContainer(_Mapped, CellContainer):
+    pass
+
+
+class MappedStrictContainer(_Mapped, StrictCellContainer):
+    pass
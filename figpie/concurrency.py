@@ -0,0 +1,286 @@
+#encoding=utf-8
+from __future__ import absolute_import
+
+import threading
+import weakref
+from thread import get_ident as _ident
+
+from . import hooks
+
+
+'''
+Optional locking of trees shared by threads.
+
+Nothing is locked until a container is guarded (see guard). Writes to cells
+of a guarded subtree (values, appends, removals, union mode switches) hold
+the write side of it's RWLock, so writers of one subtree are serialised
+while writers of other subtrees go on. Single reads take no lock at all:
+values and union views are swapped by single assignments, so a read sees
+either the old or the new state. Reads of many cells that have to be
+consistent with each other (eg. union's mode and it's cells) are made under
+reading(container), which shares the read side with other readers and only
+waits for writers.
+
+Writes of many cells (transaction commits, CellContainer.set_many, undo
+and redo) hold the locks of all subtrees they change for the whole write.
+Callbacks of subscriptions run in the writer's thread with the lock held.
+'''
+
+
+''' Guarded containers; nothing is locked while _count is 0 '''
+_guarded = weakref.WeakSet()
+_count = 0
+
+''' Serialises creation of lazy cells (see CellContainer.LAZY) of guarded
+trees, which readers do too '''
+creating = threading.RLock()
+
+
+'''
+Lock shared by readers and exclusive for a writer.
+
+Writers are preferred: new readers wait while a writer waits, so a steady
+stream of readers does not starve writers. Both sides are reentrant and
+a writer can read, but a reader cannot start writing (it would wait for
+itself).
+'''
+class RWLock(object):
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._local = threading.local()
+        self._readers = 0
+        self._writer = None
+        self._writes = 0
+        self._waiting = 0
+        self.read = _Read(self)
+        self.write = _Write(self)
+
+    def acquire_read(self):
+        depth = getattr(self._local, 'depth', 0)
+        with self._cond:
+            if not depth and self._writer != _ident():
+                while self._writer is not None or self._waiting:
+                    self._cond.wait()
+            self._readers += 1
+        self._local.depth = depth + 1
+
+    def release_read(self):
+        self._local.depth -= 1
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        ident = _ident()
+        with self._cond:
+            if self._writer == ident:
+                self._writes += 1
+                return
+            if getattr(self._local, 'depth', 0):
+                raise RuntimeError('cannot write while reading')
+            self._waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting -= 1
+            self._writer = ident
+            self._writes = 1
+
+    def release_write(self):
+        with self._cond:
+            self._writes -= 1
+            if not self._writes:
+                self._writer = None
+                self._cond.notify_all()
+
+
+class _Read(object):
+
+    def __init__(self, lock):
+        self._lock = lock
+
+    def __enter__(self):
+        self._lock.acquire_read()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._lock.release_read()
+        return False
+
+
+class _Write(_Read):
+
+    def __enter__(self):
+        self._lock.acquire_write()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._lock.release_write()
+        return False
+
+
+''' Read side of many locks, taken in a fixed order '''
+class _ReadAll(object):
+
+    def __init__(self, locks):
+        self._locks = sorted(locks, key=id)
+
+    def __enter__(self):
+        taken = []
+        try:
+            for lock in self._locks:
+                lock.acquire_read()
+                taken.append(lock)
+        except BaseException:
+            for lock in reversed(taken):
+                lock.release_read()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for lock in reversed(self._locks):
+            lock.release_read()
+        return False
+
+
+''' Write side of many locks, taken in a fixed order '''
+class _WriteAll(object):
+
+    def __init__(self, locks):
+        self._locks = sorted(locks, key=id)
+
+    def __enter__(self):
+        taken = []
+        try:
+            for lock in self._locks:
+                lock.acquire_write()
+                taken.append(lock)
+        except BaseException:
+            for lock in reversed(taken):
+                lock.release_write()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for lock in reversed(self._locks):
+            lock.release_write()
+        return False
+
+
+class _Unlocked(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_UNLOCKED = _Unlocked()
+
+
+'''
+Makes writes to the container's subtree serialised by a new RWLock
+(returned). Guarded subtrees cannot be nested.
+'''
+def guard(container):
+    global _count
+    from .properties import WrongValueException
+    if lock_of(container) is not None or _guarded_below(container):
+        raise WrongValueException('{} is already guarded (or a part of it)!'
+                .format(container.name))
+    container._lock = RWLock()
+    _guarded.add(container)
+    _count += 1
+    hooks.enable()
+    return container._lock
+
+
+''' Stops locking of a subtree guarded with guard '''
+def unguard(container):
+    global _count
+    from .properties import WrongValueException
+    if container._lock is None:
+        raise WrongValueException('{} is not guarded!'.format(container.name))
+    container._lock = None
+    _guarded.discard(container)
+    _count -= 1
+    hooks.disable()
+
+
+''' Returns lock of the guarded subtree the cell belongs to (or None) '''
+def lock_of(cell):
+    node = cell
+    while node is not None:
+        lock = getattr(node, '_lock', None)
+        if lock is not None:
+            return lock
+        node = node._parent
+    return None
+
+
+''' Returns context manager holding the write side of the cell's lock '''
+def writing(cell):
+    if not _count:
+        return _UNLOCKED
+    lock = lock_of(cell)
+    return _UNLOCKED if lock is None else lock.write
+
+
+'''
+Returns context manager holding the write side of locks of all guarded
+subtrees given cells belong to, so that writes of many cells are seen by
+readers all at once. Locks are taken in a fixed order, but a thread that
+already holds some write lock can still wait for another thread doing the
+same in reverse.
+'''
+def writing_all(cells):
+    if not _count:
+        return _UNLOCKED
+    locks = set()
+    for cell in cells:
+        lock = lock_of(cell)
+        if lock is not None:
+            locks.add(lock)
+    return _WriteAll(locks) if locks else _UNLOCKED
+
+
+''' Returns context manager in which no other thread reads or writes the
+container's subtree (like reading, but holding the write side) '''
+def writing_tree(container):
+    if not _count:
+        return _UNLOCKED
+    lock = lock_of(container)
+    if lock is not None:
+        return lock.write
+    locks = [guarded._lock for guarded in _guarded_below(container)]
+    return _WriteAll(locks) if locks else _UNLOCKED
+
+
+'''
+Returns context manager in which no writer changes the container's subtree:
+it holds the read side of the lock of the guarded subtree it belongs to or,
+for a container above guarded subtrees, of all of them.
+'''
+def reading(container):
+    if not _count:
+        return _UNLOCKED
+    lock = lock_of(container)
+    if lock is not None:
+        return lock.read
+    locks = [guarded._lock for guarded in _guarded_below(container)]
+    return _ReadAll(locks) if locks else _UNLOCKED
+
+
+def _guarded_below(container):
+    below = []
+    for guarded in list(_guarded):
+        node = guarded._parent
+        while node is not None and node is not container:
+            node = node._parent
+        if node is container:
+            below.append(guarded)
+    return below
@@ -0,0 +1,208 @@
+#encoding=utf-8
+from __future__ import absolute_import
+
+import hashlib
+
+from . import events
+from . import spec
+from .properties import (CellContainer, Lambda, Property, PropertyArray,
+        PropertyEnum, Union, WrongValueException)
+
+
+''' Kinds of patch operations '''
+SET = 'set'         # [SET, path, value]
+ADD = 'add'         # [ADD, path, spec of the cell] (see figpie.spec)
+REMOVE = 'remove'   # [REMOVE, path]
+REPLACE = 'replace' # [REPLACE, path, spec of the cell]
+
+
+'''
+Changes that turn one tree into another (see diff).
+
+Operations are lists of plain values (paths are lists of names), so
+a patch can be stored with to_list and restored with from_list.
+'''
+class Patch(object):
+
+    def __init__(self, operations=()):
+        self._operations = [list(operation) for operation in operations]
+
+    @classmethod
+    def from_list(cls, operations):
+        return cls(operations)
+
+    def to_list(self):
+        return [list(operation) for operation in self._operations]
+
+    def __len__(self):
+        return len(self._operations)
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __nonzero__(self):
+        return bool(self._operations)
+
+    def __eq__(self, other):
+        return isinstance(other, Patch) and self.to_list() == other.to_list()
+
+    def __ne__(self, other):
+        return not self == other
+
+    ''' Applies operations to given tree; listeners get all changes at once.
+    Values are set in one transaction, so if any of them is wrong (or it's
+    path is not found) the tree is left untouched. Cells are added and
+    removed after that, in order.
+    '''
+    def apply(self, tree):
+        structural = []
+        for operation in self._operations:
+            kind = operation[0]
+            if kind == ADD:
+                structural.append((ADD, operation[1],
+                        spec.decode(operation[2])))
+            elif kind == REMOVE:
+                structural.append((REMOVE, operation[1], None))
+            elif kind == REPLACE:
+                raise WrongValueException('cannot replace {} of the tree'
+                        .format(operation[1] or 'root'))
+            elif kind != SET:
+                raise WrongValueException('unknown operation {}'
+                        .format(kind))
+
+        with events.batch():
+            # union modes switch on commit, so cells of a new mode are
+            # resolved through the staged modes
+            modes = {}
+            with tree.transaction():
+                for operation in self._operations:
+                    if operation[0] == SET:
+                        _set(tree, operation[1], operation[2], modes)
+            for kind, path, cell in structural:
+                container = _resolve(tree, path[:-1], modes)
+                if kind == ADD:
+                    container.append(cell)
+                else:
+                    container.remove(path[-1])
+
+    def __str__(self):
+        return "<Patch[{}]>".format(len(self))
+
+
+def _resolve(tree, path, modes):
+    node = tree
+    for name in path:
+        mode = modes.get(node) if isinstance(node, Union) else None
+        if mode is None:
+            node = node._resolve([name])
+        else:
+            node = node._view(mode)[1].get(name)
+            if node is None:
+                raise KeyError('path {} not found'.format(path))
+    return node
+
+
+def _set(tree, path, value, modes):
+    if not path:
+        raise KeyError('path {} not found'.format(path))
+    parent = _resolve(tree, path[:-1], modes)
+    prop = _resolve(parent, path[-1:], modes)
+    if not isinstance(prop, Property):
+        raise KeyError('cell at path {} is not a Property'.format(path))
+    prop.value = value
+    if isinstance(parent, Union) and prop is parent._mode:
+        modes[parent] = prop._checked(value)
+
+
+''' Returns digest (SHA-1) of container's subtree, computed once and cached
+until something in it changes. Equal digests are taken as equal subtrees.
+Unions count in their current mode only, lambdas by name.
+'''
+def digest(container):
+    value = container._digest
+    if value is None:
+        value = hashlib.sha1(
+                ''.join(_cell_digest(cell) for cell in container)).digest()
+        container._digest = value
+    return value
+
+
+def _cell_digest(cell):
+    if isinstance(cell, CellContainer):
+        parts = (cell.TYPE, cell.name, digest(cell))
+    elif isinstance(cell, Lambda):
+        parts = (cell.TYPE, cell.name)
+    elif isinstance(cell, PropertyEnum):
+        parts = (cell.TYPE, cell.name, repr(cell._value),
+                cell._options._names)
+    elif isinstance(cell, Property):
+        parts = (cell.TYPE, cell.name, repr(cell._value))
+    else:
+        parts = (cell.TYPE, cell.name)
+    # repr of a tuple of strings cannot be produced by other parts
+    return hashlib.sha1(repr(parts)).digest()
+
+
+'''
+Returns Patch that turns tree a into tree b.
+
+Subtrees with equal digests are skipped, so comparing a tree with slightly
+changed copy of it visits only the changed paths. Cells of different types
+(or enums with different options, arrays of different typecodes) are
+replaced; unions are compared in the mode of b. Trees that cannot be
+compared at all (eg. a container and a union) give a single REPLACE, which
+cannot be applied.
+'''
+def diff(a, b):
+    if not _compatible(a, b):
+        return Patch([[REPLACE, [], spec.encode(b)]])
+    operations = []
+    _diff_containers(a, b, [], operations)
+    return Patch(operations)
+
+
+def _diff_containers(a, b, path, operations):
+    if digest(a) == digest(b):
+        return
+
+    if isinstance(b, Union):
+        if a.mode != b.mode:
+            operations.append([SET, path + [a._mode.name], b.mode])
+        a_cells, b_cells = a._map[b.mode], b._map[b.mode]
+    else:
+        a_cells, b_cells = a.values(), b.values()
+
+    a_index = {cell.name: cell for cell in a_cells}
+    b_names = set(cell.name for cell in b_cells)
+    for cell in a_cells:
+        if cell.name not in b_names:
+            operations.append([REMOVE, path + [cell.name]])
+    for cell in b_cells:
+        other = a_index.get(cell.name)
+        if other is None:
+            operations.append([ADD, path + [cell.name], spec.encode(cell)])
+        elif not _compatible(other, cell):
+            operations.append([REMOVE, path + [cell.name]])
+            operations.append([ADD, path + [cell.name], spec.encode(cell)])
+        elif isinstance(cell, CellContainer):
+            _diff_containers(other, cell, path + [cell.name], operations)
+        elif isinstance(cell, Property) and not isinstance(cell, Lambda):
+            if not _same(other._value, cell._value):
+                operations.append(
+                        [SET, path + [cell.name], spec.plain(cell._value)])
+
+
+def _compatible(a, b):
+    if a.TYPE != b.TYPE:
+        return False
+    elif isinstance(b, Union):
+        return set(a._map) == set(b._map)
+    elif isinstance(b, PropertyEnum):
+        return a._options is b._options
+    elif isinstance(b, PropertyArray):
+        return a._typecode == b._typecode
+    return True
+
+
+def _same(a, b):
+    return type(a) is type(b) and a == b
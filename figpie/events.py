@@ -0,0 +1,183 @@
+#encoding=utf-8
+from __future__ import absolute_import
+
+import threading
+from collections import OrderedDict, deque, namedtuple
+from fnmatch import fnmatchcase
+
+from . import hooks
+
+
+''' Kinds of changes '''
+VALUE = 'value'     # property got new value (old -> new)
+APPEND = 'append'   # cell (new) was appended to a container (cell)
+REMOVE = 'remove'   # cell (old) was removed from a container (cell)
+
+'''
+Single change as seen by a subscription.
+
+cell is the changed property (or the container for APPEND and REMOVE), path
+is a tuple of names from the subscribed cell down to it.
+'''
+ChangeEvent = namedtuple('ChangeEvent', ['kind', 'cell', 'path', 'old', 'new'])
+
+
+_local = threading.local()
+
+''' Subscriptions with queued events, delivered by flush() '''
+_queued = deque()
+
+''' Number of live subscriptions; nothing is collected while it is 0 '''
+_count = 0
+
+
+'''
+Observer of a cell or a subtree, created by Cell.subscribe.
+
+The callback gets a list of ChangeEvents: once per change, once per batch
+(see batch) or, when queued, once per flush(). Repeated writes to the same
+cell are coalesced into one event (first old, last new value).
+'''
+class Subscription(object):
+
+    def __init__(self, owner, callback, pattern=None, queued=False):
+        self._owner = owner
+        self._callback = callback
+        self._pattern = pattern
+        self._queued = queued
+        self._pending = []
+        self._active = True
+
+    @property
+    def active(self):
+        return self._active
+
+    ''' Returns True if change at given path (tuple) is observed '''
+    def matches(self, path):
+        if self._pattern is None:
+            return True
+        return fnmatchcase('/'.join(path), self._pattern)
+
+    def cancel(self):
+        global _count
+        if self._active:
+            self._active = False
+            self._owner._observers.remove(self)
+            _count -= 1
+            hooks.disable()
+            del self._pending[:]
+
+    def _receive(self, events):
+        if not self._active:
+            return
+        if self._queued:
+            if not self._pending:
+                _queued.append(self)
+            self._pending.extend(events)
+        else:
+            self._callback(events)
+
+    def _flush(self):
+        events, self._pending = self._pending, []
+        if events and self._active:
+            self._callback(_coalesce(events))
+
+
+''' Adds subscription to the cell's observers '''
+def subscribe(cell, callback, pattern=None, queued=False):
+    global _count
+    subscription = Subscription(cell, callback, pattern, queued)
+    if cell._observers is None:
+        cell._observers = []
+    cell._observers.append(subscription)
+    _count += 1
+    hooks.enable()
+    return subscription
+
+
+''' Delivers queued events (see Subscription) '''
+def flush():
+    while _queued:
+        _queued.popleft()._flush()
+
+
+''' Collects changes and delivers them, coalesced, at the end of the outermost
+batch '''
+class batch(object):
+
+    def __enter__(self):
+        self._outer = getattr(_local, 'batch', None)
+        if self._outer is None:
+            _local.batch = self
+            self._changes = OrderedDict()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._outer is None:
+            _local.batch = None
+            _deliver(self._changes.itervalues())
+        return False
+
+    def _add(self, kind, cell, old, new):
+        if kind == VALUE:
+            key = (kind, cell)
+            change = self._changes.get(key)
+            if change is not None:
+                self._changes[key] = (kind, cell, change[2], new)
+                return
+        else:
+            key = (kind, cell, old, new)
+        self._changes[key] = (kind, cell, old, new)
+
+
+''' Reports a change; called by cells '''
+def emit(kind, cell, old, new):
+    if not _count:
+        return
+    current = getattr(_local, 'batch', None)
+    if current is not None:
+        current._add(kind, cell, old, new)
+    else:
+        _deliver([(kind, cell, old, new)])
+
+
+def _deliver(changes):
+    received = OrderedDict()
+    for kind, cell, old, new in changes:
+        if kind == VALUE and _same(old, new):
+            continue
+        node, names = cell, []
+        while node is not None:
+            if node._observers:
+                path = tuple(reversed(names))
+                for subscription in node._observers:
+                    if subscription.matches(path):
+                        event = ChangeEvent(kind, cell, path, old, new)
+                        received.setdefault(subscription, []).append(event)
+            names.append(node.name)
+            node = node._parent
+
+    for subscription, events in received.iteritems():
+        subscription._receive(events)
+
+
+def _coalesce(events):
+    coalesced = OrderedDict()
+    for event in events:
+        if event.kind == VALUE:
+            key = (event.kind, event.cell)
+            first = coalesced.get(key)
+            if first is not None:
+                event = event._replace(old=first.old)
+        else:
+            key = (event.kind, event.cell, event.old, event.new)
+        coalesced[key] = event
+    return [event for event in coalesced.itervalues()
+            if event.kind != VALUE or not _same(event.old, event.new)]
+
+
+def _same(old, new):
+    try:
+        return old is new or bool(old == new)
+    except Exception:
+        return False
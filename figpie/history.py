@@ -0,0 +1,138 @@
+#encoding=utf-8
+from __future__ import absolute_import
+
+import array
+import sys
+import warnings
+from collections import deque
+
+from . import concurrency as conc
+from . import events
+
+
+''' Default memory budget of a History (bytes) '''
+BUDGET = 1 << 20
+
+
+'''
+Undo/redo of property changes in a tree.
+
+Every change is stored as a delta (path, old, new) relative to the root;
+all changes delivered together (a batch, a transaction commit or
+CellContainer.set_many) form one step. The oldest steps are dropped when
+the estimated size of stored deltas exceeds the budget (bytes); the newest
+step is always kept. Appended cells are not tracked.
+'''
+class History(object):
+
+    def __init__(self, root, budget=BUDGET):
+        self._root = root
+        self._budget = budget
+        self._undo = deque()
+        self._redo = []
+        self._size = 0
+        self._paths = {}
+        self._replaying = False
+        self._subscription = root.subscribe(self._record)
+
+    @property
+    def budget(self):
+        return self._budget
+
+    ''' Estimated size of stored deltas (bytes) '''
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def __len__(self):
+        return len(self._undo)
+
+    ''' Reverts the last step; returns False if there is nothing to undo '''
+    def undo(self):
+        if not self._undo:
+            return False
+        step = self._undo[-1]
+        self._apply([(path, old) for path, old, new in reversed(step[1])])
+        self._size -= self._undo.pop()[0]
+        self._redo.append(step)
+        return True
+
+    ''' Repeats the last undone step; returns False if there is nothing to
+    redo '''
+    def redo(self):
+        if not self._redo:
+            return False
+        step = self._redo[-1]
+        self._apply([(path, new) for path, old, new in step[1]])
+        self._push(self._redo.pop())
+        return True
+
+    def clear(self):
+        self._undo.clear()
+        del self._redo[:]
+        self._size = 0
+        self._paths.clear()
+
+    ''' Stops recording changes '''
+    def close(self):
+        self._subscription.cancel()
+
+    def _record(self, changes):
+        if self._replaying:
+            return
+        deltas = tuple(
+                (self._paths.setdefault(event.path, event.path),
+                    _detached(event.old), _detached(event.new))
+                for event in changes if event.kind == events.VALUE)
+        if deltas:
+            del self._redo[:]
+            self._push((_size_of(deltas), deltas))
+
+    def _push(self, step):
+        self._undo.append(step)
+        self._size += step[0]
+        while self._size > self._budget and len(self._undo) > 1:
+            self._size -= self._undo.popleft()[0]
+
+    ''' Assigns values (already checked once) in given order; union modes
+    are restored before the cells that depend on them. Paths that cannot be
+    resolved any more (eg. cells of a union mode switched outside of the
+    history) are skipped with a warning '''
+    def _apply(self, values):
+        self._replaying = True
+        try:
+            with conc.writing_tree(self._root), events.batch():
+                for path, value in values:
+                    try:
+                        prop = self._root._resolve_property(path)
+                    except KeyError as e:
+                        warnings.warn('skipped {}: {}'.format(path, e),
+                                RuntimeWarning)
+                        continue
+                    prop._assign(_detached(value))
+        finally:
+            self._replaying = False
+
+
+''' Copies values changed in place (arrays) so stored deltas stay intact '''
+def _detached(value):
+    if isinstance(value, array.array):
+        return array.array(value.typecode, value)
+    return value
+
+
+''' Rough size of deltas; paths are shared between deltas and not counted '''
+def _size_of(deltas):
+    size = sys.getsizeof(deltas)
+    for delta in deltas:
+        size += (sys.getsizeof(delta) + sys.getsizeof(delta[1])
+                + sys.getsizeof(delta[2]))
+    return size
@@ -0,0 +1,26 @@
+#encoding=utf-8
+from __future__ import absolute_import
+
+import threading
+
+
+'''
+Number of enabled features that have to see every property write: event
+subscriptions, transactions, live snapshots and guarded trees. While it is
+0 (the usual case) Property writes only store values (see Property.value).
+'''
+active = 0
+
+_lock = threading.Lock()
+
+
+def enable():
+    global active
+    with _lock:
+        active += 1
+
+
+def disable():
+    global active
+    with _lock:
+        active -= 1
@@ -63,6 +63,11 @@ class InputManager:
         self._spc = ''
 
     def _handle_spc(self, state):
+        # typed query is not a short of any action
+        if state.mode == 'search':
+            self._handle_spc_search(state)
+            return
+
         if self._handle_possible_action(state, self._spc):
             self._clean_spc()
             return
@@ -79,8 +84,25 @@ class InputManager:
     def _handle_spc_container(self, state):
         pass
 
+    def _handle_spc_search(self, state):
+        if self._spc == 'KEY_ENTER':
+            found = state.find(self._inp)
+            state.stop_search()
+            if found:
+                state.jump(found[0])
+            else:
+                state.add_warning('nothing found for: {}'.format(self._inp))
+            self._clean_all()
+        elif self._spc == 'KEY_ESCAPE':
+            state.stop_search()
+            self._clean_all()
+
     def _handle_spc_enum(self, state):
-        pass
+        # whole option name typed (eg. when it's a prefix of other options)
+        if self._spc == 'KEY_ENTER' and state.current.contains(self._inp):
+            state.current.value = self._inp
+            state.go_previous()
+            self._clean_all()
 
     def _handle_spc_property(self, state):
         if self._spc == 'KEY_ENTER':
@@ -101,11 +123,22 @@ class InputManager:
 
 
     def _handle_spc_action(self, state):
-        if self._spc == 'KEY_ESCAPE':
+        if self._spc == 'KEY_ENTER':
+            # runs in the background, the menu stays responsive
+            try:
+                state.run_action(state.current)
+            finally:
+                self._clean_all()
+                state.go_previous()
+        elif self._spc == 'KEY_ESCAPE':
             self._clean_all()
             state.go_previous()
 
     def _handle_inp(self, state):
+        # query is gathered until KEY_ENTER
+        if state.mode == 'search':
+            return
+
         if self._handle_possible_action(state, self._inp):
             self._clean_inp()
             return
@@ -137,9 +170,9 @@ class InputManager:
     def _handle_inp_enum(self, state):
         possible_options_keys = self._possible_options_keys(state)
 
-        # no matching inp- clean needed
+        # no matching short- try with prefix of option's name
         if not possible_options_keys:
-            self._clean_inp()
+            self._handle_inp_enum_prefix(state)
             return
 
         # if there is more than one possible options- more input is needed
@@ -152,6 +185,22 @@ class InputManager:
         self._clean_all()
 
 
+    def _handle_inp_enum_prefix(self, state):
+        matching = state.current.options.startswith(self._inp)
+
+        # no matching inp- clean needed
+        if not matching:
+            self._clean_inp()
+            return
+
+        # if there is more than one possible options- more input is needed
+        if len(matching) != 1:
+            return
+
+        state.current.value = matching[0]
+        state.go_previous()
+        self._clean_all()
+
     def _handle_inp_property(self, state):
         pass
         # raise RuntimeError('todo')
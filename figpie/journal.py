@@ -0,0 +1,153 @@
+#encoding=utf-8
+from __future__ import absolute_import
+
+import json
+import os
+import time
+import warnings
+
+from . import events
+from . import serial
+from . import spec
+from .properties import WrongTypeException, WrongValueException
+
+
+'''
+Crash safe persistence of property values: full snapshot (see figpie.serial)
+plus an append only journal of changes made since.
+
+Every notification of changes (a single write, a batch or a transaction
+commit) is appended to the journal (path + '.journal') as one line: a json
+list of [path, value] pairs. Lines are flushed right away and synced to
+disk every sync_every lines or sync_interval seconds (and on sync/close).
+After compact_after lines the journal is folded into a new snapshot,
+written to a temporary file and renamed over the old one, and emptied.
+
+Only values are journaled (as in serial.load_into); appended and removed
+cells are not. Values the tree rejects on restore are skipped with
+a RuntimeWarning.
+'''
+class Journal(object):
+
+    SUFFIX = '.journal'
+
+    def __init__(self, tree, path, sync_every=64, sync_interval=1.0,
+            compact_after=10000):
+        self._tree = tree
+        self._path = path
+        self._sync_every = sync_every
+        self._sync_interval = sync_interval
+        self._compact_after = compact_after
+        self._lines, end = self._restore()
+        self._stream = open(self.journal_path, 'a')
+        # drop what a crash left after the last complete line
+        self._stream.truncate(end)
+        self._unsynced = 0
+        self._synced_at = time.time()
+        self._subscription = tree.subscribe(self._record)
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def journal_path(self):
+        return self._path + self.SUFFIX
+
+    ''' Number of lines in the journal '''
+    def __len__(self):
+        return self._lines
+
+    ''' Sets values of the tree from the snapshot and the journal '''
+    def restore(self):
+        self._restore()
+
+    ''' Restores values; returns number and total size of journal lines '''
+    def _restore(self):
+        lines = end = 0
+        with events.batch():
+            if os.path.exists(self._path):
+                with open(self._path) as stream:
+                    serial.load_into(self._tree, stream)
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path, 'rb') as stream:
+                    for changes, size in _read(stream):
+                        self._apply(changes)
+                        lines += 1
+                        end += size
+        return lines, end
+
+    def _apply(self, changes):
+        for path, value in changes:
+            try:
+                prop = self._tree._resolve_property(path)
+            except KeyError:
+                continue
+            if not prop.writeable:
+                continue
+            # eg. the tree's checks changed since the value was journaled
+            try:
+                prop.value = value
+            except (WrongTypeException, WrongValueException) as e:
+                warnings.warn('skipped {}: {}'.format(path, e), RuntimeWarning)
+
+    def _record(self, changes):
+        pairs = [[list(event.path), spec.plain(event.new)]
+                for event in changes if event.kind == events.VALUE]
+        if not pairs:
+            return
+        self._stream.write(json.dumps(pairs))
+        self._stream.write('\n')
+        self._stream.flush()
+        self._lines += 1
+        self._unsynced += 1
+        if self._lines >= self._compact_after:
+            self.compact()
+        elif (self._unsynced >= self._sync_every
+                or time.time() - self._synced_at >= self._sync_interval):
+            self.sync()
+
+    ''' Forces journaled changes to disk '''
+    def sync(self):
+        self._stream.flush()
+        os.fsync(self._stream.fileno())
+        self._unsynced = 0
+        self._synced_at = time.time()
+
+    ''' Writes the whole tree as new snapshot and empties the journal '''
+    def compact(self):
+        temporary = self._path + '.tmp'
+        with open(temporary, 'w') as stream:
+            serial.dump(self._tree, stream)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.rename(temporary, self._path)
+        # a crash before truncating only replays values already in snapshot
+        self._stream.close()
+        self._stream = open(self.journal_path, 'w')
+        self.sync()
+        self._lines = 0
+
+    ''' Stops journaling; compacts if asked to '''
+    def close(self, compact=False):
+        if self._stream.closed:
+            return
+        self._subscription.cancel()
+        if compact:
+            self.compact()
+        else:
+            self.sync()
+        self._stream.close()
+
+
+''' Yields lists of changes with sizes of their lines; stops at incomplete
+line (left by a crash) '''
+def _read(stream):
+    for line in stream:
+        if not line.endswith('\n'):
+            return
+        try:
+            changes = json.loads(line)
+        except ValueError:
+            return
+        yield changes, len(line)
@@ -2,9 +2,11 @@
 from __future__ import absolute_import
 from __future__ import print_function
 
+import os
 import sys
 import re
 import atexit
+import warnings
 
 from collections import OrderedDict, defaultdict, deque
 from operator import getitem
@@ -15,14 +17,24 @@ from .printer import Printer
 from .input import InputManager
 from .shorts import ShortMapper
 from .actions import ActionManager
+from .history import History
+from .journal import Journal
 
 from . import debug as deb
+from . import events
 from . import properties as props
+from . import serial
 
 
 class Menu(object):
 
-    def __init__(self, container, debug=False):
+    ''' Seconds quit waits for running actions before saving '''
+    QUIT_TIMEOUT = 5.0
+
+    ''' path: file values are loaded from (if it exists) and saved to on quit
+    (see figpie.serial); with journal every change is also appended to
+    a journal next to it as it is made (see figpie.journal.Journal) '''
+    def __init__(self, container, debug=False, path=None, journal=False):
         self._t = Terminal()
 
         if debug:
@@ -32,6 +44,14 @@ class Menu(object):
 
         self._actions = ActionManager(self._debug)
         self._state = State(container, self._actions, self._debug)
+        self._path = path
+        self._journal = None
+        if path is not None and journal:
+            self._journal = Journal(self._state._container, path)
+        elif path is not None and os.path.exists(path):
+            with open(path) as stream:
+                serial.load_into(self._state._container, stream)
+        self._history = History(self._state._container)
         self._init_actions()
         self._printer = Printer(self._t, self._debug)
         self._input = InputManager(self._t, self._debug)
@@ -47,6 +67,37 @@ class Menu(object):
                 lambda: not self._state.in_root)
         self._actions.add('h', go_previous_act)
 
+        # search
+        search_act = props.Action(
+                'search',
+                lambda: self._state.start_search(),
+                lambda: not self._state.searching)
+        self._actions.add('/', search_act)
+        fuzzy_act = props.Action(
+                'fuzzy',
+                lambda: self._state.start_search(fuzzy=True),
+                lambda: not self._state.searching)
+        self._actions.add('?', fuzzy_act)
+
+        # undo / redo
+        undo_act = props.Action(
+                'undo',
+                lambda: self._history.undo(),
+                lambda: self._history.can_undo)
+        self._actions.add('U', undo_act)
+        redo_act = props.Action(
+                'redo',
+                lambda: self._history.redo(),
+                lambda: self._history.can_redo)
+        self._actions.add('R', redo_act)
+
+        # cancel action running in the background
+        cancel_act = props.Action(
+                'cancel',
+                lambda: self._state.cancel_job(),
+                lambda: bool(self._state.jobs))
+        self._actions.add('C', cancel_act)
+
         # quit
         quit_act = props.Action('quit', self.quit)
         self._actions.add('Q', quit_act)
@@ -91,19 +142,38 @@ class Menu(object):
 #         self._actions.add('KEY_ENTER', accept_act)
 #         self._actions.add('accept', accept_act)
 
+    def save(self):
+        if self._journal is not None:
+            self._journal.compact()
+        elif self._path is not None:
+            # written aside and renamed, so a crash leaves the old file
+            temporary = self._path + '.tmp'
+            with open(temporary, 'w') as stream:
+                serial.dump(self._state._container, stream)
+                stream.flush()
+                os.fsync(stream.fileno())
+            os.rename(temporary, self._path)
+
     def quit(self):
         self._debug.msg('quitting...')
+        running = self._state.close(self.QUIT_TIMEOUT)
+        if running:
+            warnings.warn('saving while {} still running'.format(
+                    ', '.join(job.name for job in running)), RuntimeWarning)
+        self.save()
         sys.exit()
 
     def run(self):
         with self._t.fullscreen():
             while(True):
+                self._state.collect_jobs()
+                events.flush()
                 self._printer(self._state, self._input)
                 try:
                     self._input(self._state)
                 except (KeyError, props.WrongTypeException,
                         props.WrongValueException,
-                        props.WrongNameException) as e:
+                        props.WrongNameException, RuntimeWarning) as e:
                     self._state.add_warning(str(e))
 
 
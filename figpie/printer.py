@@ -23,11 +23,15 @@ class Printer:
         self._loc_cache = {}
         self._debug = debug
 
+    ''' Number of matches shown while searching '''
+    MATCHES = 10
+
     def __call__(self, state, input_handler):
         self._clear()
         self._print_header(state)
-        self._print_current(state)
-        self._print_footer(input_handler.input_value, state.warnings)
+        self._print_current(state, input_handler.input_value)
+        self._print_footer(input_handler.input_value, state.warnings,
+                jobs=state.jobs)
 
     ''' Marks (highlights) short(cut) in a given name'''
     def _mark_short_in_name(self, name, short, f=None):
@@ -49,12 +53,12 @@ class Printer:
         return self._t.get_location()
 
     ''' Prints a footer. '''
-    def _print_footer(self, input_value, warnings, prefix_msg=''):
+    def _print_footer(self, input_value, warnings, prefix_msg='', jobs=()):
         th = self._t.height
         prompt = '{} >>> {}'.format(prefix_msg, input_value)
         msgs = {
                 th: prompt,
-                th-1: ' ',
+                th-1: self._jobs_line(jobs),
                 th-2: '_'*self._t.width,
                 th-3: warnings
                 }
@@ -68,11 +72,22 @@ class Printer:
                     self._loc_cache['prompt'] = x, y
 
 
-    def _print_current(self, state):
+    ''' Returns line showing running actions (with seconds they run) '''
+    def _jobs_line(self, jobs):
+        if not jobs:
+            return ' '
+        running = ', '.join('{} ({:.0f}s){}'.format(
+                job.name, job.elapsed, ' cancelling' if job.cancelled else '')
+                for job in jobs)
+        return self._t.bold('running: ') + running
+
+    def _print_current(self, state, input_value=''):
         if state.mode in ('container', 'enum'):
             self._print_options(state)
         elif state.mode in ('property',):
             self._print_edit(state)
+        elif state.mode in ('search',):
+            self._print_matches(state, input_value)
         elif state.mode in ('action',):
             pass
         else:
@@ -100,6 +115,12 @@ class Printer:
             #         formatter = self._t.dim
             #     self._print_option(cell, short, formatter)
 
+    def _print_matches(self, state, query):
+        with self._t.location(0, 2):
+            print(self._t.center(' ~~~< search >~~~ '))
+            for path in state.find(query)[:self.MATCHES]:
+                print(self._t.center('/'.join(path)))
+
     ''' Returns styled string for given cell's attribute.
     Returns empty string if attrname is not found in _displaied_attrs dict.
     '''
@@ -107,7 +128,10 @@ class Printer:
         if not self._displaied_attrs[attrname] or not hasattr(cell, attrname):
             return ''
 
-        attr_val = getattr(cell, attrname)
+        if attrname == 'value' and isinstance(cell, props.PropertyArray):
+            attr_val = cell.summary
+        else:
+            attr_val = getattr(cell, attrname)
         filled_str = str_template.format(attr_val)
         styled_str = self._style(cell, attrname)(filled_str)
         return styled_str
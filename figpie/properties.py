@@ -1,10 +1,29 @@
 #encoding=utf-8
+from __future__ import absolute_import
 
+import array
+import bisect
 import inspect
+import itertools
 import re
-from collections import OrderedDict, Iterable
+import threading
+import time
+import warnings
+import weakref
+from collections import OrderedDict, Iterable, namedtuple
 from copy import copy, deepcopy
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import concurrency as conc
+from . import events
+from . import hooks
+from . import snapshot as snap
+from . import transaction as txn
+
 
 class WrongNameException(Exception):
     pass
@@ -25,16 +44,48 @@ class WrongValueException(Exception):
     pass
 
 
+''' Per thread stack (reads) of sets collecting properties read while
+a ReactiveLambda is being computed (see Property.value) '''
+_tracked = threading.local()
+
+''' Caches of property classes by value type are kept in the classes
+themselves (not inherited, see _class_cache), so they go away with the
+classes (eg. generated by figpie.schema):
+_converters - converters of typed properties (see PropertyInt._convert)
+_trusted_types - whether values need no conversion nor checks (see
+Property._trusted); created when the first instance of a class is, so
+instances look it up as a plain attribute
+'''
+_NO_CACHE = {}
+
+
+''' Returns cache (dict) of given name owned by cls, creating it '''
+def _class_cache(cls, name):
+    cache = cls.__dict__.get(name)
+    if cache is None:
+        cache = {}
+        setattr(cls, name, cache)
+    return cache
+
+
 class Cell(object):
 
     TYPE = 'cell'
 
+    # cells are slotted so that big trees stay small; derivative classes that
+    # do not declare __slots__ get a regular __dict__ back
+    __slots__ = ('_name', '_parent', '_observers')
+
     def __init__(self, name):
         if not isinstance(name, basestring):
             raise WrongNameException("Wrong argument type (name: string)")
         if not name:
             raise WrongNameException("Wrong argument value (name: not empty)")
+        if isinstance(name, str):
+            name = intern(name)
         self._name = name
+        self._parent = None
+        self._observers = None
         object.__init__(self)
 
     @property
@@ -57,6 +108,22 @@ class Cell(object):
     def name(self):
         return self._name
 
+    ''' Container this cell was last appended to (or None) '''
+    @property
+    def parent(self):
+        return self._parent
+
+    ''' Calls callback with a list of figpie.events.ChangeEvent on changes
+    of this cell or (for containers) of cells below it. pattern (fnmatch
+    style, eg. 'lvl2/*prop') filters paths relative to this cell. Queued
+    events wait for figpie.events.flush(). Returns Subscription.
+    '''
+    def subscribe(self, callback, pattern=None, queued=False):
+        if not callable(callback):
+            raise WrongTypeException('given callback <{}> is not callable!'
+                    .format(callback))
+        return events.subscribe(self, callback, pattern, queued)
+
     def __str__(self):
         return "<Cell({})>".format(self.name)
 
@@ -72,6 +139,8 @@ class Action(Cell):
 
     TYPE = 'action'
 
+    __slots__ = ('_action_f', '_is_active_f')
+
     def __init__(self, name, action_f, is_active_f=None):
         Cell.__init__(self, name)
         if not callable(action_f):
@@ -105,20 +174,67 @@ class Action(Cell):
             return self._action_f()
 
 
+''' Placeholder for a not yet created cell of a lazy container; creator is
+the name of creator method (or anything _create_pending of the container
+understands, eg. offset of a record in figpie.binary) '''
+class _PendingCell(object):
+
+    __slots__ = ('name', 'creator', 'position')
+
+    def __init__(self, name, creator, position):
+        self.name = name
+        self.creator = creator
+        self.position = position
+
+
 class CellContainer(Cell):
 
     CONTAINED_TYPE = Cell
     EXACT_TYPE = False
     TYPE = 'container'
 
+    ''' If True, cells from creators are created on first access; the name
+    of a created cell has to match it's creator's name
+    (eg. _create_abc_prop has to return cell named 'abc')
+    '''
+    LAZY = False
+
     ''' Patrern used for auto generating cells '''
     PATTERN = re.compile('_create_(\w+)_prop$', re.IGNORECASE)
 
+    ''' Separator of cell names in paths (see get/set) '''
+    SEPARATOR = '/'
+
+    ''' Structure generation of the subtree, bumped on every structure change
+    in it (append, removal, union's mode change); resolved paths are cached
+    per generation. Generations are drawn from one counter, so they are
+    unique.
+    '''
+    _generation = 0
+    _generations = itertools.count(1)
+    _paths = None
+    _paths_generation = -1
+
+    ''' Epochs in which cells were appended or removed while snapshots were
+    alive (see figpie.snapshot) '''
+    _born = None
+    _dead = None
+
+    ''' Cached digest of the subtree (see figpie.diff), dropped on changes '''
+    _digest = None
+
+    ''' Lock of a guarded subtree (see figpie.concurrency) '''
+    _lock = None
+
     def __init__(self, name, cells=None):
         Cell.__init__(self, name)
 
         self._cells = []
-        if cells is None:
+        self._index = {}
+        if cells is None and self.LAZY:
+            cells = []
+            self._add_pending_cells()
+        elif cells is None:
             cells = self._create_cells()
 
         elif not isinstance(cells, Iterable):
@@ -128,22 +244,72 @@ class CellContainer(Cell):
         for cell in cells:
             self.append(cell)
 
-    ''' Returns  list of (part_name, full_name) function names that matches
-    PATTERN.
+    ''' Returns  list of (full_name, part_name) function names that matches
+    PATTERN. Computed once per class and kept in it's own _creators.
     '''
-    def _get_creators(self):
-        methods = [name
-                for (name, method)
-                in inspect.getmembers(self.__class__, predicate=inspect.ismethod)]
-
-        matches = [self.PATTERN.match(method) for method in methods]
-        return [(match.group(), match.group(1)) for match in matches if match]
+    @classmethod
+    def _get_creators(cls):
+        creators = cls.__dict__.get('_creators')
+        if creators is None:
+            methods = [name
+                    for (name, method)
+                    in inspect.getmembers(cls, predicate=inspect.ismethod)]
+
+            matches = [cls.PATTERN.match(method) for method in methods]
+            creators = [(match.group(), match.group(1))
+                    for match in matches if match]
+            cls._creators = creators
+        return creators
 
     ''' Generates cells from methods in the class. '''
     def _create_cells(self):
         return [ Cell.__getattribute__(self, creator_name)()
                 for creator_name, _ in self._get_creators() ]
 
+    ''' Adds placeholders for cells from creators (see LAZY) '''
+    def _add_pending_cells(self):
+        for creator_name, name in self._get_creators():
+            if name in self._index:
+                raise WrongNameException('cell with name {} already exists!'
+                        .format(name))
+            pending = _PendingCell(name, creator_name, len(self._cells))
+            self._cells.append(pending)
+            self._index[name] = pending
+        self._structure_changed()
+
+    ''' Creates cell in place of a placeholder '''
+    def _materialise(self, pending):
+        if not conc._count:
+            return self._put_created(pending)
+        with conc.creating:
+            # other thread could create it (or remove it) first
+            current = self._index.get(pending.name)
+            if current is not pending:
+                return current
+            return self._put_created(pending)
+
+    def _put_created(self, pending):
+        cell = self._create_pending(pending)
+        if not self._is_proper_type(cell):
+            raise WrongTypeException('cell should be of type {} ({} given)'
+                    .format(self.CONTAINED_TYPE, type(cell)))
+        elif cell.name != pending.name:
+            raise WrongNameException('creator {} returned cell named {}!'
+                    .format(pending.creator, cell.name))
+        self._cells[pending.position] = cell
+        self._index[pending.name] = cell
+        cell._parent = self
+        return cell
+
+    ''' Returns new cell for a placeholder '''
+    def _create_pending(self, pending):
+        return Cell.__getattribute__(self, pending.creator)()
+
+    def _materialise_all(self):
+        for cell in self._cells:
+            if type(cell) is _PendingCell:
+                self._materialise(cell)
+
     ''' Helper method if needed for dervative classes '''
     def _append_from_creators(self):
         # separate append so as to check correctness of cells
@@ -157,15 +323,24 @@ class CellContainer(Cell):
     def __len__(self):
         return len(self._cells)
 
+    ''' Returns cell with given name or None if there is no such cell '''
+    def _lookup(self, name):
+        try:
+            cell = Cell.__getattribute__(self, '_index').get(name)
+        except AttributeError:
+            return None
+        if type(cell) is _PendingCell:
+            cell = self._materialise(cell)
+        return cell
+
     def __getitem__(self, name):
         if name.startswith('*'):
-            name = name.replace('*','',1)
+            name = name[1:]
             private_access = True
         else:
             private_access = False
 
-        allCells = Cell.__getattribute__(self, '_cells')
-        cell = next((c for c in allCells if c.name==name), None)
+        cell = self._lookup(name)
 
         if isinstance(cell, Property) and not private_access:
             return cell.value
@@ -175,13 +350,12 @@ class CellContainer(Cell):
 
     def __setitem__(self, name, value):
         if name.startswith('*'):
-            name = name.replace('*','',1)
+            name = name[1:]
             private_access = True
         else:
             private_access = False
 
-        allCells = Cell.__getattribute__(self, '_cells')
-        cell = next((c for c in allCells if c.name==name), None)
+        cell = self._lookup(name)
 
         if private_access:
             raise NotImplementedError('cannot change instance for key')
@@ -192,38 +366,30 @@ class CellContainer(Cell):
         else:
             raise KeyError('prop with name {} not found'.format(name))
 
-        # self.__getattr__(name).value = value
-
-    # def __getitem__(self, name):
-    #     for cell in Cell.__getattribute__(self, '_cells'):
-    #         if cell.name == name:
-    #             return cell
-    #     raise KeyError('name {} not found'.format(name))
-
     def __getattr__(self, name):
         return self.__getitem__(name)
 
-
-
     def __setattr__(self, name, value):
-        if name in self.__dict__:
-            # print 'invoked 1 on {}, {}'.format(name,value)
+        # private attributes never refer to cells, which also keeps them safe
+        # to set before the index exists
+        if (name in self.__dict__ or name.startswith('_')
+                or self._lookup(name) is None):
             Cell.__setattr__(self, name, value)
-        elif hasattr(self, '_cells') and name in self.keys():
-            # print 'invoked 2 on {}, {}'.format(name,value)
-            self.__setitem__(name, value)
         else:
-            # print 'invoked 3 on {}, {}'.format(name,value)
-            Cell.__setattr__(self, name, value)
+            self.__setitem__(name, value)
 
     def keys(self):
         return [cell.name for cell in self._cells]
 
     def values(self):
+        self._materialise_all()
         return copy(self._cells)
 
     def contains(self, name):
-        return name in self.keys()
+        try:
+            return name in Cell.__getattribute__(self, '_index')
+        except AttributeError:
+            return False
 
     def _is_proper_type(self, cell):
         if self.EXACT_TYPE:
@@ -235,16 +401,238 @@ class CellContainer(Cell):
         if not self._is_proper_type(cell):
             raise WrongTypeException('cell should be of type {} ({} given)'
                     .format(self.CONTAINED_TYPE, type(cell)))
-        elif self.contains(cell.name):
-            raise WrongNameException('cell with name {} already exists!'
-                    .format(cell.name))
-        else:
-            self._cells.append(cell)
+        with conc.writing(self):
+            if self.contains(cell.name):
+                raise WrongNameException('cell with name {} already exists!'
+                        .format(cell.name))
+            self._put_cells((cell,))
+            cell._parent = self
+            if snap._live or self._born or self._dead:
+                snap.born(self, cell)
+            self._touch()
+            self._structure_changed()
+            events.emit(events.APPEND, self, None, cell)
+
+    ''' Appends cells from any iterable (eg. a generator); types and names
+    are checked in one pass, before anything is appended '''
+    def extend(self, cells):
+        with conc.writing(self):
+            self._extend(cells)
+
+    def _extend(self, cells):
+        index = self._index
+        names = set()
+        checked = []
+        for cell in cells:
+            if not self._is_proper_type(cell):
+                raise WrongTypeException('cell should be of type {} ({} given)'
+                        .format(self.CONTAINED_TYPE, type(cell)))
+            name = cell.name
+            if name in index or name in names:
+                raise WrongNameException('cell with name {} already exists!'
+                        .format(name))
+            names.add(name)
+            checked.append(cell)
+
+        self._put_cells(checked)
+        for cell in checked:
+            cell._parent = self
+        if snap._live or self._born or self._dead:
+            for cell in checked:
+                snap.born(self, cell)
+        self._touch()
+        self._structure_changed()
+        if events._count:
+            with events.batch():
+                for cell in checked:
+                    events.emit(events.APPEND, self, None, cell)
+
+    ''' Stores already checked cells (see Union._put_cells) '''
+    def _put_cells(self, cells):
+        index = self._index
+        for cell in cells:
+            index[cell.name] = cell
+        self._cells.extend(cells)
+
+    ''' Creates container from cells (any iterable) without checking them
+    one append at a time. The container holds just given cells, so the
+    class's __init__ is skipped (eg. classes compiled by figpie.schema
+    take only a name and clone their own cells).
+    '''
+    @classmethod
+    def from_cells(cls, name, cells):
+        container = cls.__new__(cls)
+        CellContainer.__init__(container, name, [])
+        container.extend(cells)
+        return container
+
+    ''' Creates container from a mapping of names to cells or values (see
+    from_iterable) '''
+    @classmethod
+    def from_mapping(cls, name, mapping):
+        return cls.from_iterable(name, mapping.iteritems())
+
+    ''' Creates container from (name, cell or value) pairs; values become
+    properties of matching type (PropertyBool, PropertyInt, PropertyFloat,
+    PropertyString, Property for others) and mappings nested containers
+    '''
+    @classmethod
+    def from_iterable(cls, name, items):
+        return cls.from_cells(name, (_cell_for(cell_name, value)
+                for cell_name, value in items))
+
+    ''' Removes cell with given name; returns removed cell '''
+    def remove(self, name):
+        with conc.writing(self):
+            return self._remove(name)
+
+    def _remove(self, name):
+        cell = self._lookup(name)
+        if cell is None:
+            raise KeyError('name {} not found'.format(name))
+        # positions of placeholders are read by readers creating cells
+        with conc.creating:
+            position = self._cells.index(cell)
+            del self._cells[position]
+            del self._index[name]
+            for pending in self._cells[position:]:
+                if type(pending) is _PendingCell:
+                    pending.position -= 1
+        cell._parent = None
+        if snap._live or self._born or self._dead:
+            snap.died(self, cell, position)
+        self._touch()
+        self._structure_changed()
+        events.emit(events.REMOVE, self, cell, None)
+        return cell
 
     def __iter__(self):
         for cell in self._cells:
+            if type(cell) is _PendingCell:
+                cell = self._materialise(cell)
             yield cell
 
+    ''' Drops cached digests of this container and it's ancestors '''
+    def _touch(self):
+        node = self
+        while node is not None and node._digest is not None:
+            node._digest = None
+            node = node._parent
+
+    ''' Marks that structure of this subtree changed (invalidates path caches
+    of this container and it's ancestors, other trees keep theirs) '''
+    def _structure_changed(self):
+        # unique (next is atomic), so concurrent changes cannot both end up
+        # with the generation a reader has cached paths for
+        generation = next(CellContainer._generations)
+        node = self
+        while node is not None:
+            node._generation = generation
+            node = node._parent
+
+    ''' Returns cell for given path: a SEPARATOR delimited string or
+    a sequence of names, relative to this container. Names can be prefixed
+    with '*' (as in __getitem__).
+    '''
+    def _resolve(self, path):
+        # paths is kept locally, so a reader that raced with a structure
+        # change only fills a cache which is already dropped
+        generation = self._generation
+        paths = self._paths
+        if self._paths_generation != generation:
+            paths = self._paths = {}
+            self._paths_generation = generation
+
+        if isinstance(path, basestring):
+            names = path.split(self.SEPARATOR) if path else ()
+        else:
+            path = names = tuple(path)
+
+        try:
+            return paths[path]
+        except KeyError:
+            pass
+
+        cell = self
+        for name in names:
+            if name.startswith('*'):
+                name = name[1:]
+            # containers and container-like cells (eg. PropertyArray)
+            lookup = getattr(cell, '_lookup', None)
+            cell = lookup(name) if lookup is not None else None
+            if cell is None:
+                raise KeyError('path {} not found'.format(path))
+
+        # items depend on the array's length, which is not a structure change
+        if not isinstance(cell, _ArrayItem):
+            paths[path] = cell
+        return cell
+
+    def _is_private_path(self, path):
+        if isinstance(path, basestring):
+            return path.rsplit(self.SEPARATOR, 1)[-1].startswith('*')
+        return bool(path) and path[-1].startswith('*')
+
+    ''' Gets cell at given path (see _resolve), or it's value if it is
+    a property and the last name is not prefixed with '*'.
+    '''
+    def get(self, path):
+        cell = self._resolve(path)
+        if isinstance(cell, Property) and not self._is_private_path(path):
+            return cell.value
+        return cell
+
+    ''' Sets value of a property at given path '''
+    def set(self, path, value):
+        self._resolve_property(path).value = value
+
+    ''' Gets list of values (see get) for given paths '''
+    def get_many(self, paths):
+        return [self.get(path) for path in paths]
+
+    ''' Sets values from a dict or a sequence of (path, value) pairs; all of
+    them or none (see Property.assign_many)
+    '''
+    def set_many(self, items):
+        if isinstance(items, dict):
+            items = items.iteritems()
+        Property.assign_many(
+                (self._resolve_property(path), value) for path, value in items)
+
+    def _resolve_property(self, path):
+        if self._is_private_path(path):
+            raise NotImplementedError('cannot change instance for path')
+        cell = self._resolve(path)
+        if not isinstance(cell, Property):
+            raise KeyError('cell at path {} is not a Property'.format(path))
+        return cell
+
+    ''' Returns context manager that makes all property writes inside it
+    atomic; check(staged) can validate staged values together
+    (see figpie.transaction.Transaction)
+    '''
+    def transaction(self, check=None):
+        return txn.Transaction(check)
+
+    ''' Returns context manager in which writers of other threads do not
+    change this subtree (see figpie.concurrency.reading); it locks nothing
+    unless a part of the tree is guarded
+    '''
+    def reading(self):
+        return conc.reading(self)
+
+    ''' Returns read only view of the tree as it is now (see
+    figpie.snapshot.Snapshot); taking it is O(1), writes made later keep
+    the old values of the cells they modify while the view is alive
+    '''
+    def snapshot(self):
+        return snap.Snapshot(self, snap._take())
+
+    ''' Returns figpie.diff.Patch that turns this tree into other one '''
+    def diff(self, other):
+        from .diff import diff
+        return diff(self, other)
+
 
 class StrictCellContainer(CellContainer):
 
@@ -252,12 +640,104 @@ class StrictCellContainer(CellContainer):
     TYPE = 'strict container'
 
 
+''' Immutable, shareable set of options (plain cells) for PropertyEnum.
+
+Besides access by name options can be accessed by position (options[3],
+index(name)) and looked up by prefix of their names.
+'''
+class OptionSet(StrictCellContainer):
+
+    TYPE = 'options'
+
+    ''' Option sets shared between enums, by tuple of option names '''
+    _SHARED = weakref.WeakValueDictionary()
+
+    def __init__(self, names):
+        self._frozen = False
+        StrictCellContainer.__init__(self, 'options',
+                [Cell(name) for name in names])
+        self._names = tuple(cell.name for cell in self._cells)
+        self._positions = {name: i for i, name in enumerate(self._names)}
+        self._sorted = None
+        self._frozen = True
+
+    ''' Returns option set for given names, reusing one if it already exists '''
+    @classmethod
+    def shared(cls, names):
+        names = tuple(names)
+        options = cls._SHARED.get(names)
+        if options is None:
+            options = cls(names)
+            cls._SHARED[names] = options
+        return options
+
+    def append(self, cell):
+        if self._frozen:
+            raise NotWriteableException('{}({}) is immutable!'
+                    .format(self.TYPE, self.name))
+        StrictCellContainer.append(self, cell)
+
+    def extend(self, cells):
+        if self._frozen:
+            raise NotWriteableException('{}({}) is immutable!'
+                    .format(self.TYPE, self.name))
+        StrictCellContainer.extend(self, cells)
+
+    def remove(self, name):
+        raise NotWriteableException('{}({}) is immutable!'
+                .format(self.TYPE, self.name))
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, long)):
+            return self._cells[key]
+        return StrictCellContainer.__getitem__(self, key)
+
+    def keys(self):
+        return list(self._names)
+
+    ''' Returns position of option with given name '''
+    def index(self, name):
+        try:
+            return self._positions[name]
+        except KeyError:
+            raise KeyError('name {} not found'.format(name))
+
+    ''' Returns names of options starting with prefix (in sorted order) '''
+    def startswith(self, prefix):
+        if self._sorted is None:
+            self._sorted = sorted(self._names)
+        names = self._sorted
+        matching = []
+        for i in xrange(bisect.bisect_left(names, prefix), len(names)):
+            if not names[i].startswith(prefix):
+                break
+            matching.append(names[i])
+        return matching
+
+
 class Property(Cell):
 
     TYPE = 'variant'
 
+    __slots__ = ('_r', '_w', '_value', '_dependents', '_history')
+
+    ''' False for classes overriding _assign, which every write has to go
+    through '''
+    _PLAIN_ASSIGN = True
+    _trusted_types = {}
+    ''' Whether writeable is _w, ie. not overridden by the class (set with
+    it's _trusted_types cache) '''
+    _plain_writeable = True
+    _NOT_SET = object()
+
     def __init__(self, name, value, r=True, w=True):
         Cell.__init__(self, name)
+        cls = self.__class__
+        if '_trusted_types' not in cls.__dict__:
+            cls._trusted_types = {}
+            cls._plain_writeable = cls.writeable is Property.writeable
+        self._dependents = None
+        self._history = None
         self._r = r
         self._w = True
         self.value = value
@@ -280,38 +760,193 @@ class Property(Cell):
         # if callable(self._value):
         #     return self._value()
 
+        reads = getattr(_tracked, 'reads', None)
+        if reads:
+            reads[-1].add(self)
         return self._value
 
     @value.setter
     def value(self, value):
-        if not self.writeable:
+        if not (self._w if self._plain_writeable else self.writeable):
             raise NotWriteableException('{}({}) is not writeable!'
                     .format(self.TYPE, self.name))
 
         # if value is None:
         #     raise WrongValueException('Wrong value: cannot be None!')
 
-        if self._additional_value_check(value):
-            self._value = value
+        trusted = self._trusted_types.get(type(value))
+        if trusted is None:
+            trusted = self._trusted(type(value))
+        if not trusted:
+            value = self._checked(value)
+
+        # nothing but the value to update unless some feature is enabled
+        # (see figpie.hooks) or the cell has dependents
+        if hooks.active or self._dependents or not self._PLAIN_ASSIGN:
+            self._write(value)
+            return
+        self._value = value
+        parent = self._parent
+        if parent is not None and parent._digest is not None:
+            parent._touch()
+
+    ''' Assigns checked value, or stages it in active transaction '''
+    def _write(self, value):
+        active = txn.active()
+        if active is None:
+            self._assign(value)
         else:
+            active.stage(self, value)
+
+    ''' Returns value converted to property's type; raises if it's wrong '''
+    def _checked(self, value):
+        value = self._convert(value)
+        if not self._additional_value_check(value):
             raise WrongValueException('Additional value requirements not met!')
+        return value
+
+    def _convert(self, value):
+        return value
 
     def _additional_value_check(self, value):
         return True
 
+    ''' Returns True if values of value_type can be assigned as they are:
+    value_type is exactly _TYPE of a class which neither converts it nor
+    checks it additionally. Computed once per (class, value type).
+    '''
+    @classmethod
+    def _trusted(cls, value_type):
+        cache = _class_cache(cls, '_trusted_types')
+        try:
+            return cache[value_type]
+        except KeyError:
+            pass
+        trusted = (value_type is getattr(cls, '_TYPE', None)
+                and cls._convert.im_func in _PLAIN_CONVERTS
+                and cls._additional_value_check.im_func
+                    is Property._additional_value_check.im_func)
+        cache[value_type] = trusted
+        return trusted
+
+    ''' Assigns values to properties from a sequence of (property, value)
+    pairs: all of them or none. Values of trusted types (see _trusted) skip
+    conversion and checks, so this is the fast path for bulk loaders.
+    '''
+    @staticmethod
+    def assign_many(items):
+        checked = []
+        append = checked.append
+        for prop, value in items:
+            if not (prop._w if prop._plain_writeable else prop.writeable):
+                raise NotWriteableException('{}({}) is not writeable!'
+                        .format(prop.TYPE, prop.name))
+            trusted = prop._trusted_types.get(type(value))
+            if trusted is None:
+                trusted = prop._trusted(type(value))
+            if not trusted:
+                value = prop._checked(value)
+            append((prop, value))
+
+        if not hooks.active:
+            for prop, value in checked:
+                if prop._dependents or not prop._PLAIN_ASSIGN:
+                    prop._assign(value)
+                    continue
+                prop._value = value
+                parent = prop._parent
+                if parent is not None and parent._digest is not None:
+                    parent._touch()
+            return
+
+        active = txn.active()
+        if active is not None:
+            for prop, value in checked:
+                active.stage(prop, value)
+        else:
+            with conc.writing_all(prop for prop, value in checked), \
+                    events.batch():
+                for prop, value in checked:
+                    prop._assign(value)
+
+    ''' Stores already checked value (holding the write lock of a guarded
+    subtree, see figpie.concurrency) '''
+    def _assign(self, value):
+        if conc._count:
+            with conc.writing(self):
+                self._store(value)
+        else:
+            self._store(value)
+
+    def _store(self, value):
+        old = getattr(self, '_value', self._NOT_SET)
+        # the first value (set in __init__) replaces nothing to remember
+        if old is self._NOT_SET:
+            old = None
+        elif snap._live or self._history is not None:
+            snap.record(self, old)
+        self._value = value
+        parent = self._parent
+        if parent is not None and parent._digest is not None:
+            parent._touch()
+        if self._dependents:
+            for dependent in list(self._dependents):
+                dependent.invalidate()
+        events.emit(events.VALUE, self, old, value)
+
+    ''' Registers reactive lambda to invalidate when the value changes '''
+    def _add_dependent(self, dependent):
+        if self._dependents is None:
+            self._dependents = weakref.WeakSet()
+        self._dependents.add(dependent)
+
     def __str__(self):
         return "<{}({}): {}>".format(self.TYPE, self.name, self.value)
 
 
+LambdaCacheInfo = namedtuple('LambdaCacheInfo', ['hits', 'misses'])
+
+
 class Lambda(Property):
+    ''' Read only property which value is computed by a function.
 
-    def __init__(self, name, func, **kwargs):
+    By default func is called on every read. With cached=True the result is
+    kept until invalidate() is called, with ttl (in seconds) it is kept for at
+    most ttl seconds (or until invalidate()).
+    '''
+
+    __slots__ = ('_cached', '_ttl', '_cache', '_expires', '_hits', '_misses')
+
+    _NOT_CACHED = object()
+
+    def __init__(self, name, func, cached=False, ttl=None, **kwargs):
         if not callable(func):
             raise WrongTypeException('given func <{}> is not callable!'.format(func))
+        if ttl is not None and ttl < 0:
+            raise WrongValueException('ttl cannot be negative!')
+
+        self._cached = cached or ttl is not None
+        self._ttl = ttl
+        self._cache = self._NOT_CACHED
+        self._expires = None
+        self._hits = 0
+        self._misses = 0
 
         Property.__init__(self, name, func, **kwargs)
         self._w = False
 
+    ''' Drops cached value, next read calls func again; reactive lambdas
+    that read this one are invalidated too '''
+    def invalidate(self):
+        self._cache = self._NOT_CACHED
+        if self._dependents:
+            for dependent in list(self._dependents):
+                dependent.invalidate()
+
+    ''' Returns (hits, misses) of the value cache '''
+    def cache_info(self):
+        return LambdaCacheInfo(self._hits, self._misses)
+
     @property
     def executable(self):
         return False
@@ -324,51 +959,136 @@ class Lambda(Property):
             raise NotReadableException('{}({}) is not readable!'
                     .format(self.TYPE, self.name))
 
+        reads = getattr(_tracked, 'reads', None)
+        if reads:
+            reads[-1].add(self)
+
+        if not self._cached:
+            self._misses += 1
+            return self._value()
+
+        if (self._cache is not self._NOT_CACHED
+                and (self._expires is None or time.time() < self._expires)):
+            self._hits += 1
+            return self._cache
+
+        self._misses += 1
+        self._cache = self._compute()
+        if self._ttl is not None:
+            self._expires = time.time() + self._ttl
+        return self._cache
+
+    def _compute(self):
         return self._value()
 
 
+class ReactiveLambda(Lambda):
+    ''' Cached lambda that records properties (and other lambdas) read by func
+    and recomputes only after one of them is assigned a new value.
+    '''
+
+    __slots__ = ('_dependencies', '__weakref__')
+
+    def __init__(self, name, func, **kwargs):
+        self._dependencies = frozenset()
+        Lambda.__init__(self, name, func, cached=True, **kwargs)
+
+    ''' Drops cached value, also in lambdas that depend on this one '''
+    def invalidate(self):
+        if self._cache is not self._NOT_CACHED:
+            self._cache = self._NOT_CACHED
+            if self._dependents:
+                for dependent in list(self._dependents):
+                    dependent.invalidate()
+
+    def _compute(self):
+        stack = getattr(_tracked, 'reads', None)
+        if stack is None:
+            stack = _tracked.reads = []
+        stack.append(set())
+        try:
+            value = self._value()
+        finally:
+            reads = frozenset(stack.pop())
+
+        for dependency in self._dependencies - reads:
+            dependency._dependents.discard(self)
+        for dependency in reads - self._dependencies:
+            dependency._add_dependent(self)
+        self._dependencies = reads
+
+        # lambdas that are not cached (or only for a while) change without
+        # invalidating anything, so the value is kept only as long as theirs
+        self._expires = None
+        for dependency in reads:
+            if isinstance(dependency, Lambda):
+                if not dependency._cached:
+                    expires = 0
+                else:
+                    expires = dependency._expires
+                if expires is not None and (self._expires is None
+                        or expires < self._expires):
+                    self._expires = expires
+        return value
+
+    @property
+    def dependencies(self):
+        return self._dependencies
+
+
 class PropertyInt(Property):
 
     TYPE = 'int'
+    __slots__ = ()
     _TYPE = int
     _ACCEPTED_TYPES = (basestring,)
 
     def _convert(self, value):
-        if isinstance(value, self._TYPE):
+        try:
+            converter = self.__class__.__dict__.get(
+                    '_converters', _NO_CACHE)[type(value)]
+        except KeyError:
+            converter = self._compile_converter(type(value))
+
+        if converter is None:
             return value
-        elif isinstance(value, self._ACCEPTED_TYPES):
-            try:
-                return self._TYPE(value)
-            except ValueError as e:
-                raise WrongValueException('type <{}> matches but could not'
-                        'convert value <{}> to type <{}>'
-                        .format(type(value), value, self._TYPE))
+        try:
+            return converter(value)
+        except ValueError as e:
+            raise WrongValueException('type <{}> matches but could not'
+                    'convert value <{}> to type <{}>'
+                    .format(type(value), value, self._TYPE))
+
+    ''' Returns (and remembers) converter for values of given type: None if
+    no conversion is needed, _TYPE for accepted types or a function raising
+    WrongTypeException.
+    '''
+    @classmethod
+    def _compile_converter(cls, value_type):
+        if issubclass(value_type, cls._TYPE):
+            converter = None
+        elif issubclass(value_type, cls._ACCEPTED_TYPES):
+            converter = cls._TYPE
         else:
-            raise WrongTypeException('wrong value type {}, not a TYPE: {}'
-                             'nor accepted type {}!'.format(
-                                 type(value),
-                                 self._TYPE,
-                                 self._ACCEPTED_TYPES))
-
-    @Property.value.setter
-    def value(self, value):
-        if not self.writeable:
-            raise NotWriteableException('is not writeable!'
-                    .format(self.TYPE, self.name))
+            def converter(value):
+                raise WrongTypeException('wrong value type {}, not a TYPE: {}'
+                        'nor accepted type {}!'.format(
+                            type(value),
+                            cls._TYPE,
+                            cls._ACCEPTED_TYPES))
+        _class_cache(cls, '_converters')[value_type] = converter
+        return converter
 
-        # proper value type
-        value = self._convert(value)
 
-        # additional check and final set
-        if self._additional_value_check(value):
-            self._value = value
-        else:
-            raise WrongValueException('additional value requirements not met!')
+''' Conversions that leave values of property's _TYPE as they are (see
+Property._trusted) '''
+_PLAIN_CONVERTS = (Property._convert.im_func, PropertyInt._convert.im_func)
 
 
 class PropertyFloat(PropertyInt):
 
     TYPE = 'float'
+    __slots__ = ()
     _TYPE = float
     _ACCEPTED_TYPES = (float, int, basestring)
 
@@ -376,6 +1096,7 @@ class PropertyFloat(PropertyInt):
 class PropertyString(PropertyInt):
 
     TYPE = 'str'
+    __slots__ = ()
     _TYPE = unicode
     _ACCEPTED_TYPES = (basestring,)
 
@@ -386,19 +1107,27 @@ class PropertyEnum(PropertyString):
 
     TYPE = 'enum'
 
+    __slots__ = ('_options',)
+
     def __init__(self, name, options, value, **kwargs):
 
         if not options:
             raise WrongValueException('options cannot be empty!')
-        else:
-            for i, option in enumerate(options):
-                if isinstance(option, basestring):
-                    options[i] = Cell(option)
+
+        names = []
+        for option in options:
+            if isinstance(option, basestring):
+                names.append(option)
+            elif type(option) is Cell:
+                names.append(option.name)
+            else:
+                raise WrongTypeException('option should be a string or a Cell'
+                        ' ({} given)'.format(type(option)))
 
         if not isinstance(value, basestring):
             raise WrongTypeException('value should be a string type!')
 
-        self._options = StrictCellContainer(name+'\'s container_', options)
+        self._options = OptionSet.shared(names)
 
         if not self._options.contains(value):
             raise WrongValueException('value {} not found in options {}'
@@ -410,9 +1139,15 @@ class PropertyEnum(PropertyString):
     def _additional_value_check(self, value):
         return self._options.contains(value)
 
+    ''' Shared, immutable OptionSet '''
     @property
     def options(self):
-        return copy(self._options)
+        return self._options
+
+    ''' Position of current value in options '''
+    @property
+    def index(self):
+        return self._options.index(self.value)
 
     def __len__(self):
         return len(self._options)
@@ -433,10 +1168,11 @@ class PropertyEnum(PropertyString):
 class PropertyBool(PropertyEnum):
 
     TYPE = 'bool'
+    __slots__ = ()
     _ACCEPTED_TYPES = (bool, basestring)
 
     def __init__(self, name, value, **kwargs):
-        bool_options = [Cell('True'), Cell('False')]
+        bool_options = ['True', 'False']
 
         if value is True:
             value = 'True'
@@ -449,6 +1185,233 @@ class PropertyBool(PropertyEnum):
         return self.value == 'True'
 
 
+class PropertyArray(Property):
+    ''' Property holding many numbers of one type in a contiguous buffer
+    (array.array of given typecode).
+
+    The whole array is converted and checked at once on assignment
+    (optionally against minimum and maximum); slices and single items can be
+    read and assigned with [] and items are reachable as child cells
+    (named by their position) eg. from the Menu.
+    '''
+
+    TYPE = 'array'
+    __slots__ = ('_typecode', '_minimum', '_maximum')
+
+    ''' Supported typecodes of array.array '''
+    INT_TYPECODES = 'bBhHiIlL'
+    FLOAT_TYPECODES = 'fd'
+
+    def __init__(self, name, values, typecode='d', minimum=None, maximum=None,
+            **kwargs):
+        if typecode not in self.INT_TYPECODES + self.FLOAT_TYPECODES:
+            raise WrongTypeException('unsupported typecode {}!'
+                    .format(typecode))
+        self._typecode = typecode
+        self._minimum = minimum
+        self._maximum = maximum
+        Property.__init__(self, name, values, **kwargs)
+
+    @property
+    def typecode(self):
+        return self._typecode
+
+    ''' Returns copy of the buffer (array.array) '''
+    @Property.value.getter
+    def value(self):
+        return array.array(self._typecode, Property.value.fget(self))
+
+    def _convert(self, values):
+        typecode = self._typecode
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            converted = array.array(typecode)
+            converted.fromstring(
+                    values.astype(numpy.dtype(typecode)).tostring())
+            return converted
+        if isinstance(values, basestring):
+            raise WrongTypeException('wrong value type {}, not a sequence!'
+                    .format(type(values)))
+        if not isinstance(values, (list, tuple, array.array)):
+            # iterators (eg. generators) are read once, the fallback below
+            # reads values again
+            try:
+                values = list(values)
+            except TypeError:
+                raise WrongTypeException('wrong value type {}, not '
+                        'a sequence!'.format(type(values)))
+        try:
+            # also copies an array of the same type; floats given for integer
+            # typecodes only warn, so warnings are raised to fall back to
+            # item by item conversion
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', DeprecationWarning)
+                return array.array(typecode, values)
+        except OverflowError:
+            raise WrongValueException('values out of range for typecode {}!'
+                    .format(typecode))
+        except (TypeError, DeprecationWarning):
+            # strings or numbers of other type, converted one by one
+            try:
+                return array.array(typecode,
+                        [self._convert_item(value) for value in values])
+            except TypeError:
+                raise WrongTypeException('wrong value type {}, not '
+                        'a sequence of numbers!'.format(type(values)))
+
+    ''' Converts single item to the array's type '''
+    def _convert_item(self, value):
+        if self._typecode in self.INT_TYPECODES:
+            item_type, accepted_types = int, (basestring, int, long)
+        else:
+            item_type, accepted_types = float, (basestring, int, long, float)
+
+        if not isinstance(value, accepted_types):
+            raise WrongTypeException('wrong value type {}, not a TYPE: {}!'
+                    .format(type(value), item_type))
+        try:
+            item = item_type(value)
+        except ValueError:
+            raise WrongValueException('could not convert value <{}> to '
+                    'type <{}>'.format(value, item_type))
+        try:
+            array.array(self._typecode, [item])
+        except OverflowError:
+            raise WrongValueException('value <{}> out of range for '
+                    'typecode {}!'.format(value, self._typecode))
+        return item
+
+    ''' Checks all values at once (bounds); derivative classes can extend it
+    keeping it vectorised '''
+    def _additional_value_check(self, values):
+        if not values:
+            return True
+        if self._minimum is not None and min(values) < self._minimum:
+            return False
+        if self._maximum is not None and max(values) > self._maximum:
+            return False
+        return True
+
+    def __len__(self):
+        return len(Property.value.fget(self))
+
+    def __getitem__(self, key):
+        return Property.value.fget(self)[key]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            values = array.array(self._typecode, Property.value.fget(self))
+            values[key] = self._convert(value)
+            self.value = values
+        else:
+            self._item(key).value = value
+
+    ''' Returns read only numpy view of the buffer (needs numpy) '''
+    def as_numpy(self):
+        if numpy is None:
+            raise NotImplementedError('numpy is not available')
+        view = numpy.frombuffer(Property.value.fget(self),
+                dtype=numpy.dtype(self._typecode))
+        view.flags.writeable = False
+        return view
+
+    @property
+    def summary(self):
+        return '[{} x {}]'.format(len(self), self._typecode)
+
+    def __str__(self):
+        return "<{}({}): {}>".format(self.TYPE, self.name, self.summary)
+
+    # container-like access to items (see CellContainer)
+
+    def _item(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError('position {} out of range'.format(position))
+        return _ArrayItem(self, position)
+
+    def _lookup(self, name):
+        try:
+            return self._item(int(name))
+        except (ValueError, IndexError):
+            return None
+
+    def keys(self):
+        return [str(position) for position in xrange(len(self))]
+
+    def values(self):
+        return [_ArrayItem(self, position) for position in xrange(len(self))]
+
+    def contains(self, name):
+        return self._lookup(name) is not None
+
+
+''' Single item of PropertyArray, created on demand. '''
+class _ArrayItem(Property):
+
+    __slots__ = ('_array', '_position')
+    _PLAIN_ASSIGN = False
+    _trusted_types = {}
+
+    def __init__(self, array, position):
+        Cell.__init__(self, str(position))
+        self._array = array
+        self._position = position
+        self._parent = array
+        self._dependents = None
+        self._history = None
+        self._r = array._r
+        self._w = array._w
+
+    @property
+    def type(self):
+        return self._array.TYPE + ' item'
+
+    @Property.value.getter
+    def value(self):
+        return self._array[self._position]
+
+    def _convert(self, value):
+        return self._array._convert_item(value)
+
+    def _additional_value_check(self, value):
+        return self._array._additional_value_check(
+                array.array(self._array._typecode, [value]))
+
+    def _assign(self, value):
+        with conc.writing(self):
+            values = self._array._value
+            old = values[self._position]
+            if snap._live or self._array._history is not None:
+                snap.record(self._array, values, copy=True)
+            values[self._position] = value
+            parent = self._array._parent
+            if parent is not None and parent._digest is not None:
+                parent._touch()
+            dependents = self._array._dependents
+            if dependents:
+                for dependent in list(dependents):
+                    dependent.invalidate()
+            events.emit(events.VALUE, self, old, value)
+
+
+''' Mode of a Union; switching it changes the union's structure. '''
+class _UnionMode(PropertyEnum):
+
+    __slots__ = ('_union',)
+    _PLAIN_ASSIGN = False
+
+    def _assign(self, value):
+        # value and view are switched under one lock (see Union._activate);
+        # observers are notified once both are switched
+        with conc.writing(self), events.batch():
+            PropertyEnum._assign(self, value)
+            union = getattr(self, '_union', None)
+            if union is not None:
+                union._activate()
+                union._structure_changed()
+
+
 class Union(CellContainer):
 
     TYPE = 'union'
@@ -462,10 +1425,32 @@ class Union(CellContainer):
         if modes_map == None:
             modes_map = self._create_map()
 
+        for mode, cells in modes_map.iteritems():
+            if isinstance(cells, Cell):
+                modes_map[mode] = [cells]
+            elif not cells:
+                modes_map[mode] = []
+            for cell in modes_map[mode]:
+                    cell._parent = self
+
         modes = [Cell(s) for s in modes_map.keys()]
-        self._mode = PropertyEnum('mode', modes, modes_map.keys()[0])
         self._map = modes_map
-
+        self._views = {}
+        self._mode = _UnionMode('mode', modes, modes_map.keys()[0])
+        self._mode._union = self
+        self._mode._parent = self
+        self._activate()
+
+
+    ''' Creates union with given cells in it's current mode: the only mode,
+    named by mode, or the first one of modes created by the class '''
+    @classmethod
+    def from_cells(cls, name, cells, mode='default'):
+        union = cls.__new__(cls)
+        Union.__init__(union, name,
+                None if cls._get_creators() else {mode: []})
+        union.extend(cells)
+        return union
 
     ''' Generates map of modes -> properties from methods in the class. '''
     def _create_map(self):
@@ -477,22 +1462,31 @@ class Union(CellContainer):
     def mode(self):
         return self._mode.value
 
+    ''' Returns (cells, index) view of given mode, built once per mode
+    (and again after a removal from that mode, see also _put_cells).
+    '''
+    def _view(self, mode):
+        view = self._views.get(mode)
+        if view is None:
+            cells = self._map[mode] + [self._mode]
+            index = {}
+            for cell in cells:
+                index.setdefault(cell.name, cell)
+            view = self._views[mode] = (cells, index)
+        return view
+
+    ''' Switches cells and index to the view of the current mode. '''
+    def _activate(self):
+        # single assignment, so the view is never seen half-switched
+        self._active = self._view(self.mode)
+
     @property
     def _cells(self):
-        cells = self._map[self.mode]
-        if isinstance(cells, Cell):
-            cells = [cells]
-            self._map[self.mode] = cells
+        return self._active[0]
 
-        cells_copy = copy(cells)
-
-        if not cells_copy:
-            cells_copy = []
-        elif not isinstance(cells_copy, list):
-            cells_copy = [cells_copy]
-
-        cells_copy.append(self._mode)
-        return cells_copy
+    @property
+    def _index(self):
+        return self._active[1]
 
     def __str__(self):
         return "<Union[{}]({}: {})>".format(
@@ -531,22 +1525,61 @@ class Union(CellContainer):
     #     else:
     #         return isinstance(cell, self.CONTAINED_TYPE)
 
-    def append(self, cell):
-        if not self._is_proper_type(cell):
-            raise WrongTypeException('cell should be of type {} ({} given)'
-                    .format(self.CONTAINED_TYPE, type(cell)))
-        elif self.contains(cell.name):
-            raise WrongNameException('cell with name {} already exists!'
-                    .format(cell.name))
+    ''' Appends checked cells to the current mode; it's view is updated in
+    place (cells go before the mode property), so appending one cell at a
+    time does not rebuild it '''
+    def _put_cells(self, cells):
+        mode = self.mode
+        view_cells, index = self._view(mode)
+        self._map[mode].extend(cells)
+        for cell in cells:
+            index[cell.name] = cell
+        view_cells[-1:-1] = cells
+
+    ''' Removes cell with given name from the current mode '''
+    def _remove(self, name):
+        cells = self._map[self.mode]
+        for position, cell in enumerate(cells):
+            if cell.name == name:
+                break
         else:
-            self._map[self._mode].append(cell)
-            # self._cells.append(cell)
+            raise KeyError('name {} not found'.format(name))
+        del cells[position]
+        del self._views[self.mode]
+        self._activate()
+        cell._parent = None
+        if snap._live or self._born or self._dead:
+            snap.died(self, cell, position, self.mode)
+        self._touch()
+        self._structure_changed()
+        events.emit(events.REMOVE, self, cell, None)
+        return cell
 
     # def __iter__(self):
     #     for cell in self._cells:
     #         yield cell
 
 
+''' Returns given cell (checking it's name) or a property holding value '''
+def _cell_for(name, value):
+    if isinstance(value, Cell):
+        if value.name != name:
+            raise WrongNameException('cell named {} given for name {}!'
+                    .format(value.name, name))
+        return value
+    elif isinstance(value, bool):
+        return PropertyBool(name, value)
+    elif isinstance(value, int):
+        return PropertyInt(name, value)
+    elif isinstance(value, float):
+        return PropertyFloat(name, value)
+    elif isinstance(value, basestring):
+        return PropertyString(name, value)
+    elif isinstance(value, dict):
+        return CellContainer.from_mapping(name, value)
+    return Property(name, value)
+
+
 if __name__ == '__main__':
     cell = Cell('name')
     print cell.name
@@ -0,0 +1,196 @@
+#encoding=utf-8
+from __future__ import absolute_import
+
+import re
+from copy import copy
+from collections import OrderedDict
+from itertools import izip
+
+from . import spec
+from .properties import (Cell, CellContainer, OptionSet, Lambda,
+        ReactiveLambda, Property, PropertyArray, Union,
+        WrongNameException, WrongTypeException)
+
+
+'''
+Compiles a schema into a CellContainer subclass.
+
+A schema is a prototype container (a tree built once, the usual way) or
+it's description (see figpie.spec). Names are checked and indexed once, when
+compiling; an instance of the compiled class is made by cloning the
+prototype's cells slot by slot (and attribute by attribute for classes
+with a __dict__), without conversions, checks and creators. Nested
+containers are compiled into their own classes. A compiled class derives
+from the class of it's prototype, so it keeps it's methods and contained
+type, and gets an accessor for every cell name that is an identifier and
+does not hide an attribute of that class.
+
+Cloned cells share everything immutable with the prototype (names, enum
+options, functions of lambdas and actions); mutable values (arrays, lists,
+dicts and sets held by variant properties) are copied.
+'''
+
+_IDENTIFIER = re.compile(r'[A-Za-z]\w*$')
+
+
+def compile_schema(schema, name=None):
+    if isinstance(schema, dict):
+        schema = spec.decode(schema)
+    if (not isinstance(schema, CellContainer)
+            or isinstance(schema, (Union, OptionSet))):
+        raise WrongTypeException('schema should be a container or it\'s '
+                'description ({} given)'.format(type(schema)))
+    return _compile(schema, name)
+
+
+def _compile(prototype, class_name=None):
+    base = type(prototype)
+    cells = list(prototype)
+    names = tuple(cell.name for cell in cells)
+    if len(set(names)) != len(names):
+        raise WrongNameException('duplicate names in {}'.format(names))
+    for cell in cells:
+        if not prototype._is_proper_type(cell):
+            raise WrongTypeException('cell should be of type {} ({} given)'
+                    .format(prototype.CONTAINED_TYPE, type(cell)))
+
+    attributes = {
+        '_NAME': prototype.name,
+        '_NAMES': names,
+        '_TEMPLATE': tuple((_cloner(cell), cell) for cell in cells),
+        '_SETTABLE': frozenset(cell.name for cell in cells
+                if isinstance(cell, Property)),
+        '__init__': _init,
+        '__setattr__': _setter(base),
+    }
+    for cell_name in names:
+        if (isinstance(cell_name, str) and _IDENTIFIER.match(cell_name)
+                and not hasattr(base, cell_name)):
+            attributes[cell_name] = property(_accessor(cell_name))
+
+    if class_name is None:
+        class_name = 'Compiled' + str(re.sub(r'\W', '_',
+                prototype.name.title()))
+    return type(class_name, (base,), attributes)
+
+
+''' Creates container with clones of the prototype's cells '''
+def _init(self, name=None):
+    Cell.__init__(self, self._NAME if name is None else name)
+    cells = [clone(cell) for clone, cell in self._TEMPLATE]
+    for cell in cells:
+        cell._parent = self
+    self._cells = cells
+    self._index = dict(izip(self._NAMES, cells))
+
+
+def _setter(base):
+    def setattr_(self, name, value):
+        if name in self._SETTABLE:
+            cell = self._index.get(name)
+            if isinstance(cell, Property):
+                cell.value = value
+                return
+        base.__setattr__(self, name, value)
+    return setattr_
+
+
+def _accessor(name):
+    def get(self):
+        cell = self._index[name]
+        if isinstance(cell, Property):
+            return cell.value
+        return cell
+    return get
+
+
+''' Returns function that clones given prototype cell '''
+def _cloner(cell):
+    if isinstance(cell, Union):
+        modes = [(mode, [(_cloner(child), child) for child in cells])
+                for mode, cells in cell._map.iteritems()]
+        return lambda prototype: _clone_union(prototype, modes)
+    elif isinstance(cell, OptionSet):
+        raise WrongTypeException('{}({}) cannot be compiled'
+                .format(cell.TYPE, cell.name))
+    elif isinstance(cell, CellContainer):
+        compiled = _compile(cell)
+        return lambda prototype: compiled()
+
+    slots = _slots(type(cell))
+    if isinstance(cell, PropertyArray):
+        reset = _reset_array
+    elif isinstance(cell, ReactiveLambda):
+        reset = _reset_reactive
+    elif isinstance(cell, Lambda):
+        reset = _reset_lambda
+    elif isinstance(cell, Property):
+        reset = _reset_value
+    else:
+        reset = None
+    return lambda prototype: _clone(prototype, slots, reset)
+
+
+def _slots(cls):
+    slots = []
+    for klass in cls.__mro__:
+        for slot in klass.__dict__.get('__slots__', ()):
+            if slot not in ('__weakref__', '__dict__', '_parent',
+                    '_observers', '_dependents', '_history'):
+                slots.append(slot)
+    return tuple(slots)
+
+
+def _clone(prototype, slots, reset):
+    cell = object.__new__(type(prototype))
+    for slot in slots:
+        try:
+            setattr(cell, slot, getattr(prototype, slot))
+        except AttributeError:
+            pass
+    if hasattr(prototype, '__dict__'):
+        cell.__dict__.update((name, copy(value)
+                if isinstance(value, _MUTABLE) else value)
+                for name, value in prototype.__dict__.iteritems())
+    cell._parent = None
+    cell._observers = None
+    if isinstance(cell, Property):
+        cell._dependents = None
+        cell._history = None
+    if reset is not None:
+        reset(cell)
+    return cell
+
+
+_MUTABLE = (list, dict, set, bytearray)
+
+
+def _reset_value(cell):
+    if isinstance(cell._value, _MUTABLE):
+        cell._value = copy(cell._value)
+
+
+def _reset_array(cell):
+    cell._value = cell._value[:]
+
+
+def _reset_lambda(cell):
+    cell._cache = Lambda._NOT_CACHED
+    cell._expires = None
+    cell._hits = 0
+    cell._misses = 0
+
+
+def _reset_reactive(cell):
+    _reset_lambda(cell)
+    cell._dependencies = frozenset()
+
+
+def _clone_union(prototype, modes):
+    union = object.__new__(type(prototype))
+    Union.__init__(union, prototype.name, OrderedDict(
+            (mode, [clone(child) for clone, child in cells])
+            for mode, cells in modes))
+    if union.mode != prototype.mode:
+        union._mode._assign(prototype.mode)
+    return union
@@ -0,0 +1,325 @@
+#encoding=utf-8
+from __future__ import absolute_import
+
+import bisect
+import heapq
+import re
+from collections import Counter, defaultdict
+
+from . import events
+from .properties import (CellContainer, Lambda, Property, PropertyArray,
+        _UnionMode)
+
+
+_TOKEN = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+''' Splits name into lower case tokens (runs of letters and digits) '''
+def tokens(name):
+    return _TOKEN.findall(name.lower())
+
+
+'''
+Index of all cells of a tree by name and by name tokens.
+
+Paths (tuples of names relative to the root) are indexed when the index is
+created (which creates all cells of lazy containers) and kept up to date
+with appends, removals and union mode changes (cells of inactive modes are
+not indexed).
+'''
+class NameIndex(object):
+
+    def __init__(self, root):
+        self._root = root
+        self._names = defaultdict(set)
+        self._tokens = defaultdict(set)
+        self._sorted = None
+        self._count = 0
+        for child in root:
+            self._add(child, (child.name,))
+        self._subscription = root.subscribe(self._update)
+
+    ''' Number of indexed paths '''
+    def __len__(self):
+        return self._count
+
+    ''' Stops following changes of the tree '''
+    def close(self):
+        self._subscription.cancel()
+
+    ''' Returns sorted paths of cells with given name '''
+    def find(self, name):
+        return sorted(self._names.get(name, ()))
+
+    ''' Returns paths of cells which name tokens start with all tokens of
+    the query; exact names first, then shorter paths '''
+    def search(self, query):
+        words = tokens(query)
+        if not words:
+            return []
+        found = None
+        for word in words:
+            paths = set()
+            for token in self._prefixed(word):
+                paths.update(self._tokens.get(token, ()))
+            found = paths if found is None else found & paths
+            if not found:
+                return []
+        query = query.lower()
+        return sorted(found, key=lambda path:
+                (path[-1].lower() != query, len(path), path))
+
+    def _prefixed(self, word):
+        if self._sorted is None:
+            self._sorted = sorted(self._tokens)
+        start = bisect.bisect_left(self._sorted, word)
+        for token in self._sorted[start:]:
+            if not token.startswith(word):
+                break
+            yield token
+
+    ''' Indexes cell at path and cells below it '''
+    def _add(self, cell, path):
+        self._walk(cell, path, True)
+
+    def _discard(self, cell, path):
+        self._walk(cell, path, False)
+
+    def _walk(self, cell, path, add):
+        stack = [(cell, path)]
+        while stack:
+            cell, path = stack.pop()
+            self._set(cell.name, path, add)
+            if isinstance(cell, CellContainer):
+                stack.extend((child, path + (child.name,)) for child in cell)
+
+    def _set(self, name, path, add):
+        if add:
+            paths = self._names[name]
+            if path in paths:
+                return
+            paths.add(path)
+            self._count += 1
+            for token in set(tokens(name)):
+                if token not in self._tokens:
+                    self._sorted = None
+                self._tokens[token].add(path)
+        elif _drop(self._names, name, path):
+            self._count -= 1
+            for token in set(tokens(name)):
+                _drop(self._tokens, token, path)
+                if token not in self._tokens:
+                    self._sorted = None
+
+    def _update(self, changes):
+        for event in changes:
+            if event.kind == events.APPEND:
+                self._add(event.new, event.path + (event.new.name,))
+            elif event.kind == events.REMOVE:
+                self._discard(event.old, event.path + (event.old.name,))
+            elif isinstance(event.cell, _UnionMode):
+                union, path = event.cell.parent, event.path[:-1]
+                for cell in union._map.get(event.old, ()):
+                    self._discard(cell, path + (cell.name,))
+                for cell in union._map.get(event.new, ()):
+                    self._add(cell, path + (cell.name,))
+
+
+''' Returns set of trigrams of words padded with spaces (so that words
+shorter than three letters have trigrams too and word ends weigh more) '''
+def trigrams(words):
+    grams = set()
+    for word in words:
+        word = ' {} '.format(word)
+        grams.update(word[i:i+3] for i in xrange(len(word) - 2))
+    return grams
+
+
+'''
+Fuzzy index of all cells of a tree by name, type and value.
+
+Words of names and of rendered values (first VALUE_LENGTH characters, Lambdas
+and arrays are not rendered) are kept with paths of their cells; the words
+themselves are indexed by trigrams, so a query word finds similar words
+(typos, unfinished words) first and their cells after that. Every query word
+has to be matched; query words equal to a type (eg. 'int', 'enum') only
+filter cells by type. Like NameIndex it is built once and follows changes of
+the tree (values too).
+'''
+class FuzzyIndex(object):
+
+    VALUE_LENGTH = 64
+
+    ''' Lowest similarity of a matching word '''
+    THRESHOLD = 0.4
+
+    ''' Weight of matches in values (matches in names weigh 1) '''
+    VALUE_WEIGHT = 0.5
+
+    def __init__(self, root):
+        self._root = root
+        self._grams = defaultdict(set)
+        self._names = defaultdict(set)
+        self._values = defaultdict(set)
+        self._types = defaultdict(set)
+        self._docs = {}
+        for child in root:
+            self._add(child, (child.name,))
+        self._subscription = root.subscribe(self._update)
+
+    ''' Number of indexed paths '''
+    def __len__(self):
+        return len(self._docs)
+
+    ''' Stops following changes of the tree '''
+    def close(self):
+        self._subscription.cancel()
+
+    '''
+    Returns up to limit paths of cells matching the query, best first:
+    most similar words (names weigh more than values), then exact names,
+    then shorter paths.
+    '''
+    def search(self, query, limit=10):
+        words = tokens(query)
+        types = [word for word in words if word in self._types]
+        words = [word for word in words if word not in types]
+
+        found = None
+        for word in types:
+            paths = self._types[word]
+            found = set(paths) if found is None else found & paths
+        if not words:
+            if not found:
+                return []
+            return heapq.nsmallest(limit, found, key=lambda p: (len(p), p))
+
+        scores = None
+        for word in words:
+            best = self._matches(word)
+            if scores is None:
+                scores = best
+            else:
+                scores = dict((path, scores[path] + best[path])
+                        for path in scores.viewkeys() & best.viewkeys())
+            if not scores:
+                return []
+        if found is not None:
+            scores = dict((path, scores[path])
+                    for path in scores.viewkeys() & found)
+
+        query = query.lower()
+        ranked = ((-score, path[-1].lower() != query, len(path), path)
+                for path, score in scores.iteritems())
+        return [key[-1] for key in heapq.nsmallest(limit, ranked)]
+
+    ''' Returns {path: score} of cells with words similar to given one '''
+    def _matches(self, word):
+        grams = trigrams((word,))
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._grams.get(gram, ()))
+
+        similar = []
+        for other, count in shared.iteritems():
+            # dice coefficient (a word of n letters has n trigrams),
+            # unfinished words count as at least half matched
+            score = 2.0 * count / (len(grams) + len(other))
+            if other.startswith(word):
+                score = max(score, 0.5 + 0.5 * len(word) / len(other))
+            if score < self.THRESHOLD:
+                continue
+            if other in self._names:
+                similar.append((score, self._names[other]))
+            if other in self._values:
+                similar.append((score * self.VALUE_WEIGHT,
+                        self._values[other]))
+
+        # better matches are applied last, overwriting worse ones
+        best = {}
+        similar.sort(key=lambda match: match[0])
+        for score, paths in similar:
+            best.update(dict.fromkeys(paths, score))
+        return best
+
+    def _add(self, cell, path):
+        stack = [(cell, path)]
+        while stack:
+            cell, path = stack.pop()
+            self._index(cell, path)
+            if isinstance(cell, CellContainer):
+                stack.extend((child, path + (child.name,)) for child in cell)
+
+    def _discard(self, cell, path):
+        stack = [(cell, path)]
+        while stack:
+            cell, path = stack.pop()
+            self._unindex(path)
+            if isinstance(cell, CellContainer):
+                stack.extend((child, path + (child.name,)) for child in cell)
+
+    def _index(self, cell, path):
+        if path in self._docs:
+            self._unindex(path)
+        names = frozenset(tokens(cell.name))
+        values = frozenset(tokens(self._render(cell))) - names
+        kind = cell.type.lower()
+        self._docs[path] = (names, values, kind)
+        self._types[kind].add(path)
+        for words, mapping in ((names, self._names), (values, self._values)):
+            for word in words:
+                if word not in self._names and word not in self._values:
+                    for gram in trigrams((word,)):
+                        self._grams[gram].add(word)
+                mapping[word].add(path)
+
+    def _unindex(self, path):
+        doc = self._docs.pop(path, None)
+        if doc is None:
+            return
+        names, values, kind = doc
+        _drop(self._types, kind, path)
+        for words, mapping in ((names, self._names), (values, self._values)):
+            for word in words:
+                _drop(mapping, word, path)
+                if word not in self._names and word not in self._values:
+                    for gram in trigrams((word,)):
+                        _drop(self._grams, gram, word)
+
+    def _render(self, cell):
+        if (not isinstance(cell, Property) or isinstance(cell, Lambda)
+                or isinstance(cell, PropertyArray) or not cell.readable):
+            return ''
+        value = cell.value
+        if not isinstance(value, basestring):
+            value = str(value)
+        return value[:self.VALUE_LENGTH]
+
+    def _update(self, changes):
+        for event in changes:
+            if event.kind == events.APPEND:
+                self._add(event.new, event.path + (event.new.name,))
+            elif event.kind == events.REMOVE:
+                self._discard(event.old, event.path + (event.old.name,))
+            else:
+                if isinstance(event.cell, _UnionMode):
+                    union, path = event.cell.parent, event.path[:-1]
+                    for cell in union._map.get(event.old, ()):
+                        self._discard(cell, path + (cell.name,))
+                    for cell in union._map.get(event.new, ()):
+                        self._add(cell, path + (cell.name,))
+                # items of arrays are not indexed
+                if event.path in self._docs:
+                    self._index(event.cell, event.path)
+
+
+''' Removes path from paths under key (dropping empty key); returns False if
+it was not there '''
+def _drop(mapping, key, path):
+    paths = mapping.get(key)
+    if paths is None or path not in paths:
+        return False
+    paths.discard(path)
+    if not paths:
+        del mapping[key]
+    return True
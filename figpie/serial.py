@@ -0,0 +1,221 @@
+#encoding=utf-8
+from __future__ import absolute_import
+
+import json
+import warnings
+from collections import OrderedDict
+
+from . import events
+from . import spec
+from .properties import (Action, CellContainer, Lambda, Property, Union,
+        WrongTypeException, WrongValueException)
+
+
+'''
+Text format of trees (JSON Lines), written and read one cell at a time.
+
+First line is the header {"figpie": VERSION}. Every following line is
+a JSON object describing one cell (see figpie.spec.describe), in the order
+of a depth first walk. Instead of their cells, containers have "size" (the
+number of cell lines that follow for them) and unions "modes": a list of
+[mode, size] pairs, their cells follow mode after mode. Actions and lambdas
+are written as {"type": "function", "name": ...} and skipped on load.
+
+Example:
+    {"figpie": 1}
+    {"type": "container", "name": "root", "size": 2}
+    {"type": "int", "name": "a", "value": 1}
+    {"type": "union", "name": "u", "mode": "x", "modes": [["x", 1], ["y", 0]]}
+    {"type": "str", "name": "x1", "value": "text"}
+'''
+
+VERSION = 1
+
+''' Type of lines of cells that hold functions '''
+FUNCTION = 'function'
+
+
+''' Yields lines (without line ends) describing the tree '''
+def iterdump(tree):
+    yield json.dumps({'figpie': VERSION})
+    for record in _records(tree):
+        yield json.dumps(record, separators=(', ', ': '))
+
+
+def _records(cell):
+    if isinstance(cell, (Action, Lambda)):
+        yield OrderedDict([('type', FUNCTION), ('name', cell.name)])
+        return
+
+    record = spec.describe(cell)
+    if isinstance(cell, Union):
+        record['modes'] = [[mode, len(cells)]
+                for mode, cells in cell._map.iteritems()]
+        yield record
+        for cells in cell._map.itervalues():
+            for child in cells:
+                for child_record in _records(child):
+                    yield child_record
+    elif isinstance(cell, CellContainer):
+        record['size'] = len(cell)
+        yield record
+        for child in cell:
+            for child_record in _records(child):
+                yield child_record
+    else:
+        yield record
+
+
+''' Writes the tree to a text stream '''
+def dump(tree, stream):
+    for line in iterdump(tree):
+        stream.write(line)
+        stream.write('\n')
+
+
+def dumps(tree):
+    return ''.join(line + '\n' for line in iterdump(tree))
+
+
+''' Creates tree from lines (eg. a text stream) '''
+def load(lines):
+    return _Loader(None).run(lines)
+
+
+def loads(text):
+    return load(text.splitlines())
+
+
+''' Sets values of existing properties of the tree from lines (eg. a text
+stream), as one batch of changes. Cells that are missing in the tree (or
+of different type) and not writeable properties are skipped, so are
+values the tree rejects (with a RuntimeWarning); union modes are set after
+their cells.
+'''
+def load_into(tree, lines):
+    with events.batch():
+        _Loader(tree).run(lines)
+
+
+'''
+Reads lines keeping a stack of open containers ([record, container, mode
+index, cells left in the mode]); creates cells, or (if given a tree) finds
+them in it.
+'''
+class _Loader(object):
+
+    def __init__(self, tree):
+        self._tree = tree
+
+    def run(self, lines):
+        root = None
+        stack = []
+        header = False
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not header:
+                if record.get('figpie') != VERSION:
+                    raise WrongValueException('not a figpie {} stream'
+                            .format(VERSION))
+                header = True
+                continue
+
+            if stack:
+                cell = self._child(stack[-1], record)
+                stack[-1][3] -= 1
+            else:
+                if root is not None:
+                    raise WrongValueException('more than one root')
+                cell = root = self._root(record)
+
+            if record['type'] == Union.TYPE:
+                stack.append([record, cell, 0, record['modes'][0][1]
+                        if record['modes'] else 0])
+            elif 'size' in record:
+                stack.append([record, cell, None, record['size']])
+            self._close(stack)
+
+        if stack or not header:
+            raise WrongValueException('unexpected end of stream')
+        return root
+
+    def _root(self, record):
+        if self._tree is None:
+            return self._create(record)
+        return self._match(self._tree, record)
+
+    def _child(self, frame, record):
+        parent_record, parent, mode_index = frame[:3]
+        if self._tree is None:
+            cell = self._create(record)
+            if cell is not None:
+                if mode_index is not None:
+                    # switched once per mode, not for every cell
+                    mode = parent_record['modes'][mode_index][0]
+                    if parent.mode != mode:
+                        parent.mode = mode
+                parent.append(cell)
+            return cell
+
+        if parent is None:
+            return None
+        if mode_index is not None:
+            mode = parent_record['modes'][mode_index][0]
+            cells = parent._map.get(mode, ())
+            existing = next(
+                    (cell for cell in cells if cell.name == record['name']),
+                    None)
+        else:
+            existing = parent._lookup(record['name'])
+        return None if existing is None else self._match(existing, record)
+
+    def _create(self, record):
+        kind = record['type']
+        if kind == FUNCTION:
+            return None
+        elif kind == Union.TYPE:
+            return Union(record['name'], OrderedDict(
+                    (mode, []) for mode, size in record['modes']))
+        return spec.decode(record)
+
+    ''' Returns existing cell if it matches the record (setting it's value) '''
+    def _match(self, cell, record):
+        kind = record['type']
+        if kind == FUNCTION or isinstance(cell, (Action, Lambda)):
+            return None
+        elif kind == Union.TYPE:
+            return cell if isinstance(cell, Union) else None
+        elif 'size' in record:
+            return cell if isinstance(cell, CellContainer) else None
+        elif isinstance(cell, Property) and 'value' in record:
+            if cell.writeable and spec.kind(cell) == kind:
+                _assign(cell, 'value', record['value'])
+        return cell
+
+    ''' Pops containers that got all their cells '''
+    def _close(self, stack):
+        while stack:
+            frame = stack[-1]
+            record, cell, mode_index = frame[:3]
+            if frame[3] > 0:
+                return
+            if mode_index is not None:
+                modes = record['modes']
+                if mode_index + 1 < len(modes):
+                    frame[2] += 1
+                    frame[3] = modes[frame[2]][1]
+                    continue
+                if cell is not None and cell.mode != record['mode']:
+                    _assign(cell, 'mode', record['mode'])
+            stack.pop()
+
+
+''' Sets attribute of a cell; a rejected value is skipped with a warning '''
+def _assign(cell, attribute, value):
+    try:
+        setattr(cell, attribute, value)
+    except (WrongTypeException, WrongValueException) as e:
+        warnings.warn('skipped {} of {}: {}'.format(attribute, cell.name, e),
+                RuntimeWarning)
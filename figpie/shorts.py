@@ -29,46 +29,41 @@ class ShortMapper:
     banned is a list of shorts that should not be used.
     '''
     def __call__(self, names, mapped_short=None, generator=None, banned=None):
-        current_name = names[0]
         if not mapped_short:
             mapped_short = OrderedDict()
-        used = mapped_short.keys()
+        used = set(mapped_short.keys())
         if banned is not None:
-            used += banned
-        possible = [ch for ch in current_name if ch not in used]
-
-        if not possible:
-            possible_upper = [ch.upper() for ch in current_name
-                    if ch.upper() not in used]
-
-            if not possible_upper:
-                if generator is None:
-                    def gen():
-                        i = 0
-                        while True:
-                            yield '{}'.format(i)
-                            i += 1
-                    generator = gen()
-
-                # while for the case when there were already numbers
-                # (eg. there was a cell with name "1something")
-                short = next(generator)
-                while short in used:
+            used.update(banned)
+
+        # iterative (not recursive) so that long lists of names are fine
+        for current_name in names:
+            possible = [ch for ch in current_name if ch not in used]
+
+            if not possible:
+                possible_upper = [ch.upper() for ch in current_name
+                        if ch.upper() not in used]
+
+                if not possible_upper:
+                    if generator is None:
+                        def gen():
+                            i = 0
+                            while True:
+                                yield '{}'.format(i)
+                                i += 1
+                        generator = gen()
+
+                    # while for the case when there were already numbers
+                    # (eg. there was a cell with name "1something")
                     short = next(generator)
+                    while short in used:
+                        short = next(generator)
+                else:
+                    short = possible_upper[0]
             else:
-                short = possible_upper[0]
-        else:
-            short = possible[0]
+                short = possible[0]
 
-        names = names[1:]
-        mapped_short[short] = current_name
-
-        if names:
-            mapped_short = self.__call__(
-                    names=names,
-                    mapped_short=mapped_short,
-                    generator=generator,
-                    banned=banned)
+            mapped_short[short] = current_name
+            used.add(short)
 
         return mapped_short
 
@@ -87,7 +82,7 @@ class ShortFinder:
             # r'^{}(\S+)$'
 
     def __call__(self, shorts, sequence):
-        regex_str = self.REGEXP['prefixed'].format(sequence)
+        regex_str = self.REGEXP['prefixed'].format(re.escape(sequence))
 
         return [s for s in shorts if re.match(regex_str, s)]
 
@@ -0,0 +1,314 @@
+#encoding=utf-8
+from __future__ import absolute_import
+
+import bisect
+import weakref
+from copy import copy as _copy
+
+from . import hooks
+
+
+'''
+Snapshots of cell trees (see CellContainer.snapshot).
+
+Taking a snapshot only remembers the current epoch. Cells are not copied:
+while any snapshot is alive a property keeps the value it had before the
+first write of every epoch (_history: list of (epoch, old value)) and
+a container remembers the epoch in which a cell was appended to it (_born)
+or removed from it (_dead, along with the cell and it's position).
+A snapshot reads the tree as it was at its epoch from those records, so
+memory grows only with what was modified after it was taken. Records no
+longer needed by any live snapshot are dropped on the next write, all of
+them once the last snapshot is released.
+'''
+
+''' Current epoch; every snapshot ends one '''
+_epoch = 0
+
+''' Epochs of live snapshots by weak reference to their token '''
+_live = {}
+
+''' Properties and containers holding records; a plain set, as slotted
+properties cannot be weakly referenced, emptied with the records once the
+last snapshot is released '''
+_recorded = set()
+
+
+class _Token(object):
+    pass
+
+
+def _release(ref):
+    if _live.pop(ref, None) is not None:
+        hooks.disable()
+        if not _live:
+            _clear()
+
+
+''' Drops all records (no snapshot needs them any more) '''
+def _clear():
+    for holder in list(_recorded):
+        if hasattr(holder, '_history'):
+            holder._history = None
+        else:
+            holder._born = holder._dead = None
+    _recorded.clear()
+
+
+''' Starts a new snapshot; returns token that keeps it alive '''
+def _take():
+    global _epoch
+    token = _Token()
+    token.ref = weakref.ref(token, _release)
+    token.epoch = _epoch
+    _live[token.ref] = _epoch
+    _epoch += 1
+    hooks.enable()
+    return token
+
+
+''' Remembers old value of a property (called before each assignment while
+snapshots are alive or history is still kept); mutable values changed in
+place are copied (once per epoch) '''
+def record(cell, old, copy=False):
+    history = cell._history
+    if not _live:
+        cell._history = None
+        return
+
+    if history is not None and history[-1][0] == _epoch:
+        return
+    if copy:
+        old = _copy(old)
+    if history is None:
+        cell._history = [(_epoch, old)]
+        _recorded.add(cell)
+        return
+
+    # record covers epochs from the previous record's one up to its own;
+    # keep only those covering some live snapshot
+    live = sorted(_live.itervalues())
+    kept = []
+    start = -1
+    for record_epoch, value in history + [(_epoch, old)]:
+        i = bisect.bisect_left(live, start)
+        if i < len(live) and live[i] < record_epoch:
+            kept.append((record_epoch, value))
+        start = record_epoch
+    cell._history = kept or None
+
+
+''' Remembers epoch in which cell was appended to container (called on
+appends while snapshots are alive or records are still kept) '''
+def born(container, cell):
+    if not _prune(container):
+        return
+    if container._born is None:
+        container._born = {}
+        _recorded.add(container)
+    container._born[cell] = _epoch
+
+
+''' Remembers cell removed from container (from position in list of cells
+of given mode for unions); called like born '''
+def died(container, cell, position, mode=None):
+    if not _prune(container):
+        return
+    if container._dead is None:
+        container._dead = []
+        _recorded.add(container)
+    container._dead.append((_epoch, mode, position, cell))
+
+
+''' Drops container's records of appends and removals no live snapshot
+needs; returns False if no snapshot is alive '''
+def _prune(container):
+    if not _live:
+        container._born = container._dead = None
+        return False
+
+    oldest = min(_live.itervalues())
+    # cells appended up to the oldest snapshot are in all of them, cells
+    # removed since are out of none
+    born = container._born
+    if born:
+        for cell, epoch in born.items():
+            if epoch <= oldest:
+                del born[cell]
+    dead = container._dead
+    if dead:
+        container._dead = [record for record in dead if record[0] > oldest]
+    return True
+
+
+''' Returns raw value of a property as of given epoch '''
+def value_at(cell, epoch):
+    history = cell._history
+    if history:
+        for record_epoch, old in history:
+            if record_epoch > epoch:
+                return old
+    return cell._value
+
+
+''' Returns True if cell (not removed since) was in container at given
+epoch '''
+def existed(container, cell, epoch):
+    born = container._born
+    return born is None or born.get(cell, -1) <= epoch
+
+
+'''
+Read only view of a container as it was when the snapshot was taken.
+
+Properties read through it give their values from that moment (Lambdas are
+computed, as they have no stored value), containers give nested views.
+'''
+class Snapshot(object):
+
+    def __init__(self, container, token):
+        self._container = container
+        self._token = token
+        self._epoch = token.epoch
+
+    @property
+    def name(self):
+        return self._container.name
+
+    @property
+    def epoch(self):
+        return self._epoch
+
+    ''' Releases the snapshot (the view cannot be used after that) '''
+    def close(self):
+        if self._token is not None:
+            _release(self._token.ref)
+            self._token = None
+
+    def _check_open(self):
+        if self._token is None:
+            raise RuntimeError('snapshot is closed')
+
+    def _cells(self):
+        from .properties import Union
+        container = self._container
+        tail = []
+        if isinstance(container, Union):
+            mode = value_at(container._mode, self._epoch)
+            cells = list(container._map[mode])
+            tail.append(container._mode)
+        else:
+            mode = None
+            container._materialise_all()
+            cells = list(container._cells)
+        # removals are undone latest first, so positions match again
+        for epoch, dead_mode, position, cell in reversed(container._dead or ()):
+            if epoch > self._epoch and dead_mode == mode:
+                cells.insert(position, cell)
+        return [cell for cell in cells
+                if existed(container, cell, self._epoch)] + tail
+
+    def _child(self, name):
+        from .properties import Union
+        container = self._container
+        if isinstance(container, Union):
+            if name == container._mode.name:
+                return container._mode
+            mode = value_at(container._mode, self._epoch)
+            cell = container._view(mode)[1].get(name)
+        else:
+            cell = container._lookup(name)
+        if cell is not None and existed(container, cell, self._epoch):
+            return cell
+        if container._dead:
+            for cell in self._cells():
+                if cell.name == name:
+                    return cell
+        raise KeyError('name {} not found'.format(name))
+
+    ''' Wraps cell as of snapshot's epoch '''
+    def _wrap(self, cell):
+        from .properties import CellContainer, Property, Lambda
+        if isinstance(cell, CellContainer):
+            return Snapshot(cell, self._token)
+        elif isinstance(cell, Lambda):
+            return cell.value
+        elif isinstance(cell, Property):
+            return value_at(cell, self._epoch)
+        return cell
+
+    def keys(self):
+        self._check_open()
+        return [cell.name for cell in self._cells()]
+
+    def values(self):
+        self._check_open()
+        return [self._wrap(cell) for cell in self._cells()]
+
+    def items(self):
+        return zip(self.keys(), self.values())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def contains(self, name):
+        try:
+            self._child(name)
+        except KeyError:
+            return False
+        return True
+
+    def __getitem__(self, name):
+        self._check_open()
+        return self._wrap(self._child(name))
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self.__getitem__(name)
+
+    ''' Gets value (or nested view) at given path (see CellContainer.get) '''
+    def get(self, path):
+        from .properties import PropertyArray
+        self._check_open()
+        if isinstance(path, basestring):
+            names = path.split(self._container.SEPARATOR) if path else ()
+        else:
+            names = tuple(path)
+        view = self
+        for i, name in enumerate(names):
+            if name.startswith('*'):
+                name = name[1:]
+            if not isinstance(view, Snapshot):
+                raise KeyError('path {} not found'.format(path))
+            cell = view._child(name)
+            if isinstance(cell, PropertyArray) and i + 1 < len(names):
+                return view._item(cell, names, i + 1, path)
+            view = view._wrap(cell)
+        return view
+
+    def _item(self, array, names, i, path):
+        values = value_at(array, self._epoch)
+        if i + 1 != len(names):
+            raise KeyError('path {} not found'.format(path))
+        try:
+            return values[int(names[i].lstrip('*'))]
+        except (ValueError, IndexError):
+            raise KeyError('path {} not found'.format(path))
+
+    def get_many(self, paths):
+        return [self.get(path) for path in paths]
+
+    def __setitem__(self, name, value):
+        self.set(name, value)
+
+    def set(self, path, value):
+        from .properties import NotWriteableException
+        raise NotWriteableException('snapshot of {} is read only!'
+                .format(self.name))
+
+    def __str__(self):
+        return "<Snapshot[{}]({})>".format(self._epoch, self.name)
@@ -0,0 +1,129 @@
+#encoding=utf-8
+from __future__ import absolute_import
+
+import array
+from collections import OrderedDict
+
+from .properties import (Cell, CellContainer, StrictCellContainer, OptionSet,
+        Action, Lambda, Property, PropertyInt, PropertyFloat, PropertyString,
+        PropertyEnum, PropertyBool, PropertyArray, Union, WrongTypeException,
+        WrongValueException)
+
+
+'''
+Plain (json friendly) description of cells.
+
+Every cell is described by a dict with it's 'type' (TYPE of the cell) and
+'name'; properties add 'value' (and 'r'/'w' when not readable/writeable),
+enums their 'options', arrays 'typecode', 'minimum' and 'maximum',
+containers their 'cells' and unions their 'mode' and 'modes' (list of
+[mode, cells] pairs). Subclasses are described as their base cells, cells
+that hold functions (Action, Lambda) cannot be described.
+'''
+
+_PROPERTIES = {
+    Property.TYPE: Property,
+    PropertyInt.TYPE: PropertyInt,
+    PropertyFloat.TYPE: PropertyFloat,
+    PropertyString.TYPE: PropertyString,
+}
+
+_CONTAINERS = {
+    CellContainer.TYPE: CellContainer,
+    StrictCellContainer.TYPE: StrictCellContainer,
+}
+
+
+''' Returns plain value (arrays as lists) '''
+def plain(value):
+    if isinstance(value, array.array):
+        return value.tolist()
+    return value
+
+
+''' Returns description of the cell (and it's subtree) '''
+def encode(cell):
+    spec = describe(cell)
+    if isinstance(cell, Union):
+        spec['modes'] = [[mode, [encode(child) for child in cells]]
+                for mode, cells in cell._map.iteritems()]
+    elif isinstance(cell, CellContainer):
+        spec['cells'] = [encode(child) for child in cell]
+    return spec
+
+
+''' Returns description of the cell without it's subtree ('cells' and
+'modes' are left out) '''
+def describe(cell):
+    if isinstance(cell, (Action, Lambda, OptionSet)):
+        raise WrongTypeException('{}({}) cannot be encoded'
+                .format(cell.TYPE, cell.name))
+
+    spec = OrderedDict([('type', kind(cell)), ('name', cell.name)])
+    if isinstance(cell, Union):
+        spec['mode'] = cell.mode
+    elif isinstance(cell, Property):
+        spec['value'] = plain(cell._value)
+        if isinstance(cell, PropertyBool):
+            pass
+        elif isinstance(cell, PropertyEnum):
+            spec['options'] = cell._options.keys()
+        elif isinstance(cell, PropertyArray):
+            spec['typecode'] = cell._typecode
+            spec['minimum'] = cell._minimum
+            spec['maximum'] = cell._maximum
+        if not cell._r:
+            spec['r'] = False
+        if not cell._w:
+            spec['w'] = False
+    return spec
+
+
+''' Returns type under which the cell is described (TYPE of it's base
+class) '''
+def kind(cell):
+    if isinstance(cell, Union):
+        return Union.TYPE
+    elif isinstance(cell, StrictCellContainer):
+        return StrictCellContainer.TYPE
+    elif isinstance(cell, CellContainer):
+        return CellContainer.TYPE
+    elif isinstance(cell, PropertyBool):
+        return PropertyBool.TYPE
+    elif isinstance(cell, PropertyEnum):
+        return PropertyEnum.TYPE
+    elif isinstance(cell, PropertyArray):
+        return PropertyArray.TYPE
+    elif isinstance(cell, Property):
+        return next(prop.TYPE for prop in type(cell).__mro__
+                if prop.TYPE in _PROPERTIES)
+    return Cell.TYPE
+
+
+''' Creates cell (and it's subtree) from description '''
+def decode(spec):
+    kind = spec.get('type')
+    name = spec['name']
+    flags = {key: spec[key] for key in ('r', 'w') if key in spec}
+
+    if kind == Cell.TYPE:
+        return Cell(name)
+    elif kind in _CONTAINERS:
+        return _CONTAINERS[kind](name, [decode(child)
+                for child in spec.get('cells', ())])
+    elif kind == Union.TYPE:
+        union = Union(name, OrderedDict(
+                (mode, [decode(child) for child in cells])
+                for mode, cells in spec['modes']))
+        union.mode = spec['mode']
+        return union
+    elif kind in _PROPERTIES:
+        return _PROPERTIES[kind](name, spec['value'], **flags)
+    elif kind == PropertyEnum.TYPE:
+        return PropertyEnum(name, spec['options'], spec['value'], **flags)
+    elif kind == PropertyBool.TYPE:
+        return PropertyBool(name, spec['value'], **flags)
+    elif kind == PropertyArray.TYPE:
+        return PropertyArray(name, spec['value'], spec['typecode'],
+                spec.get('minimum'), spec.get('maximum'), **flags)
+    raise WrongValueException('unknown cell type {}'.format(kind))
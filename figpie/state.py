@@ -8,9 +8,12 @@ from collections import OrderedDict, defaultdict, deque
 from operator import getitem
 from blessed import Terminal
 
+from . import concurrency as conc
 from . import properties as props
 from . import style
+from .search import FuzzyIndex, NameIndex
 from .shorts import ShortMapper
+from .workers import Workers
 
 
 class State(object):
@@ -30,6 +33,12 @@ class State(object):
         self._actions = actions
         self._debug = debug
         self._warnings = deque(maxlen=3)
+        self._index = None
+        self._fuzzy_index = None
+        self._searching = False
+        self._fuzzy = False
+        self._workers = Workers()
+        self._guarded = False
 
     @property
     def path(self):
@@ -38,22 +47,24 @@ class State(object):
     ''' Gets current cell'''
     @property
     def current(self):
-        # becouse last one can be a cell, we need to make sure we get the item,
-        # not it's value due to CellContainer's 'get', so we get it
-        # with _ added (check CellContainer.__getitem__)
-        return reduce(getitem,
-                ('*'+pos for pos in self._pos[1:]),
-                self._container)
+        # path is resolved to the cell itself (not it's value), resolution is
+        # cached by the container
+        return self._container._resolve(self._pos[1:])
 
     ''' Gets current cell's parent'''
     @property
     def parent(self):
-        return reduce(getitem, self._pos[1:-1], self._container)
+        return self._container._resolve(self._pos[1:-1])
 
     @property
     def mode(self):
-        if isinstance(self.current, props.PropertyEnum):
+        if self._searching:
+            return 'search'
+        elif isinstance(self.current, props.PropertyEnum):
             return 'enum'
+        elif isinstance(self.current, props.PropertyArray):
+            # items are edited one by one, as cells of a container
+            return 'container'
         elif isinstance(self.current, props.Property):
             return 'property'
         elif isinstance(self.current, props.CellContainer):
@@ -74,12 +85,57 @@ class State(object):
     ''' Go to next cell (child) with matching name '''
     def go_next(self, name):
         try:
-            new_cell = self.current[name]
+            new_cell = self._container._resolve(self._pos[1:] + [name])
         except KeyError:
             raise RuntimeWarning('wrong child name: {}'.format(name))
         else:
             self._pos.append(name)
 
+    ''' Go to cell at given path (sequence of names from the root) '''
+    def jump(self, path):
+        path = list(path)
+        try:
+            self._container._resolve(path)
+        except KeyError:
+            raise RuntimeWarning('wrong path: {}'.format('/'.join(path)))
+        else:
+            self._pos = [self._container.name] + path
+
+    ''' Index of all names in the tree, built on first use (see
+    figpie.search.NameIndex) '''
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = NameIndex(self._container)
+        return self._index
+
+    ''' Trigram index of names, types and values, built on first use (see
+    figpie.search.FuzzyIndex) '''
+    @property
+    def fuzzy_index(self):
+        if self._fuzzy_index is None:
+            self._fuzzy_index = FuzzyIndex(self._container)
+        return self._fuzzy_index
+
+    @property
+    def searching(self):
+        return self._searching
+
+    ''' Switches to search mode (input is a query, see find); fuzzy search
+    matches also types and values, with typos '''
+    def start_search(self, fuzzy=False):
+        self._searching = True
+        self._fuzzy = fuzzy
+
+    def stop_search(self):
+        self._searching = False
+
+    ''' Returns paths of cells matching the query (best first) '''
+    def find(self, query):
+        if self._fuzzy:
+            return self.fuzzy_index.search(query)
+        return self.index.search(query)
+
     ''' Go to previous cell (parent) '''
     def go_previous(self):
         if self.in_root:
@@ -123,6 +179,55 @@ class State(object):
     def add_warning(self, warning):
         self._warnings.append(warning)
 
+    ''' Running actions (figpie.workers.Job), oldest first '''
+    @property
+    def jobs(self):
+        return [job for job in self._workers.jobs if not job.done]
+
+    ''' Runs action in the background (see figpie.workers.Workers); it's
+    result is reported as a warning by collect_jobs. The tree is guarded
+    (see figpie.concurrency) before the first action runs, so writes of
+    actions and of the menu are serialised. '''
+    def run_action(self, action):
+        if not action:
+            raise RuntimeWarning('{} is not active'.format(action.name))
+        if not self._guarded and conc.lock_of(self._container) is None:
+            try:
+                conc.guard(self._container)
+                self._guarded = True
+            except props.WrongValueException:
+                # parts of the tree are guarded by it's owner
+                pass
+        return self._workers.submit(action)
+
+    ''' Cancels the newest running action '''
+    def cancel_job(self):
+        job = self._workers.cancel()
+        if job is None:
+            raise RuntimeWarning('nothing to cancel')
+        self.add_warning('cancelling {}...'.format(job.name))
+
+    ''' Adds warnings with results of actions finished in the background '''
+    def collect_jobs(self):
+        for job in self._workers.collect():
+            if job.error is not None:
+                self.add_warning('{} failed: {}'.format(job.name, job.error))
+            elif job.skipped:
+                self.add_warning('{} cancelled'.format(job.name))
+            elif job.result is not None:
+                self.add_warning('{}: {}'.format(job.name, job.result))
+            else:
+                self.add_warning('{} done'.format(job.name))
+
+    ''' Cancels actions and waits up to timeout seconds for running ones
+    (see figpie.workers.Workers.close); returns jobs still running '''
+    def close(self, timeout=None):
+        running = self._workers.close(timeout)
+        if self._guarded and not running:
+            conc.unguard(self._container)
+            self._guarded = False
+        return running
+
     # @property
     # def _current_loc(self):
     #     return self._t.get_location()
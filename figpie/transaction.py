@@ -0,0 +1,93 @@
+#encoding=utf-8
+from __future__ import absolute_import
+
+import threading
+from collections import OrderedDict
+
+from . import concurrency as conc
+from . import hooks
+from . import events
+
+
+_local = threading.local()
+
+
+''' Returns transaction active in current thread (or None) '''
+def active():
+    return getattr(_local, 'transaction', None)
+
+
+'''
+Collects writes to properties and commits them all at once.
+
+Used as a context manager (see CellContainer.transaction). While it is active
+every property assignment in the thread is converted and checked right away
+but only staged; readers keep seeing committed values. On a clean exit all
+staged values are checked again, together with the optional check function
+(which gets an OrderedDict property -> new value), and then assigned in one
+events.batch. If the block raises or a check fails nothing is assigned.
+
+Transactions entered while another one is active join it and are committed
+with the outermost one.
+'''
+class Transaction(object):
+
+    def __init__(self, check=None):
+        self._checks = [check] if check is not None else []
+        self._staged = OrderedDict()
+        self._outer = None
+
+    def __enter__(self):
+        outer = active()
+        if outer is not None:
+            outer._checks.extend(self._checks)
+            self._outer = outer
+            return outer
+        _local.transaction = self
+        hooks.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._outer is not None:
+            return False
+
+        _local.transaction = None
+        hooks.disable()
+        if exc_type is not None:
+            self.rollback()
+            return False
+        self.commit()
+        return False
+
+    @property
+    def staged(self):
+        return OrderedDict(self._staged)
+
+    ''' Stages already checked value of a property '''
+    def stage(self, prop, value):
+        # the latest write wins but keeps the position of the first one
+        self._staged[prop] = value
+
+    def rollback(self):
+        self._staged.clear()
+
+    def commit(self):
+        staged, self._staged = self._staged, OrderedDict()
+
+        # local import: properties import this module
+        from .properties import WrongValueException
+        for prop, value in staged.iteritems():
+            if prop._trusted(type(value)):
+                continue
+            if not prop._additional_value_check(value):
+                raise WrongValueException('{}({}): additional value '
+                        'requirements not met!'.format(prop.TYPE, prop.name))
+        for check in self._checks:
+            if check(staged) is False:
+                raise WrongValueException('transaction check failed!')
+
+        # observers get all changes of the transaction at once, readers of
+        # guarded subtrees see none or all of them
+        with conc.writing_all(staged), events.batch():
+            for prop, value in staged.iteritems():
+                prop._assign(value)
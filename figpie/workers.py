@@ -0,0 +1,153 @@
+#encoding=utf-8
+from __future__ import absolute_import
+
+import threading
+import time
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+
+_local = threading.local()
+
+
+''' Returns True if the job run by current thread was cancelled; long
+actions can check it to stop early (threads cannot be stopped from
+outside) '''
+def cancelled():
+    job = getattr(_local, 'job', None)
+    return job is not None and job.cancelled
+
+
+'''
+Action submitted to Workers.
+
+When it is done it has either a result (returned by the action) or an error
+(exception it raised). A job cancelled before it started is not run at all
+(it is skipped). Done jobs are ready to be collected.
+'''
+class Job(object):
+
+    def __init__(self, action):
+        self._action = action
+        self._started = time.time()
+        self._cancelled = False
+        self._skipped = False
+        self._done = False
+        self.result = None
+        self.error = None
+
+    @property
+    def name(self):
+        return self._action.name
+
+    ''' Seconds since the job was submitted '''
+    @property
+    def elapsed(self):
+        return time.time() - self._started
+
+    @property
+    def done(self):
+        return self._done
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    ''' True if the job was cancelled before it's action started '''
+    @property
+    def skipped(self):
+        return self._skipped
+
+    def cancel(self):
+        self._cancelled = True
+
+    def _run(self):
+        if self._cancelled:
+            self._skipped = True
+            return
+        _local.job = self
+        try:
+            self.result = self._action()
+        except Exception as e:
+            self.error = e
+        finally:
+            _local.job = None
+
+
+'''
+Runs Actions on a pool of threads, so that slow ones do not block the menu.
+
+Threads are started with the first job. Jobs are submitted and collected
+(see collect) by one thread; actions run in the pool's threads, so trees
+they change have to be guarded (see figpie.concurrency; State.run_action
+guards the menu's tree).
+'''
+class Workers(object):
+
+    SIZE = 4
+
+    def __init__(self, size=SIZE):
+        self._size = size
+        self._pool = None
+        self._jobs = []
+        self._finished = deque()
+
+    ''' Jobs submitted and not collected yet, oldest first '''
+    @property
+    def jobs(self):
+        return list(self._jobs)
+
+    ''' Starts action in the pool; returns it's Job '''
+    def submit(self, action):
+        if self._pool is None:
+            self._pool = ThreadPool(self._size)
+        job = Job(action)
+        self._jobs.append(job)
+        self._pool.apply_async(self._run, (job,))
+        return job
+
+    ''' Cancels the newest running job; returns it (or None) '''
+    def cancel(self):
+        for job in reversed(self._jobs):
+            if not job.done and not job.cancelled:
+                job.cancel()
+                return job
+        return None
+
+    ''' Returns jobs finished since the last call, in order of finishing '''
+    def collect(self):
+        finished = []
+        while self._finished:
+            job = self._finished.popleft()
+            self._jobs.remove(job)
+            finished.append(job)
+        return finished
+
+    ''' Cancels all jobs and stops the threads once they are done; waits for
+    running actions up to timeout seconds (None: does not wait). Returns jobs
+    still running.
+    '''
+    def close(self, timeout=None):
+        for job in self._jobs:
+            job.cancel()
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return []
+        pool.close()
+        if timeout is not None:
+            deadline = time.time() + timeout
+            while (any(not job.done for job in self._jobs)
+                    and time.time() < deadline):
+                time.sleep(0.01)
+        running = [job for job in self._jobs if not job.done]
+        if timeout is not None and not running:
+            pool.join()
+        return running
+
+    def _run(self, job):
+        try:
+            job._run()
+        finally:
+            # collectable once done
+            self._finished.append(job)
+            job._done = True
@@ -0,0 +1,135 @@
+#encoding=utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ddt import ddt, data
+
+import figpie as fp
+from figpie import binary
+from figpie import spec
+from figpie.properties import _PendingCell
+from tests.trees import make_union
+
+
+def make_tree():
+    union = make_union('b', b=[fp.PropertyInt('b1', 2),
+            fp.CellContainer('b2', [])])
+    return fp.CellContainer('root', [
+        fp.PropertyString('str', u'zażółć'),
+        fp.Lambda('lambda', lambda: 1),
+        fp.Property('variant', [1, u'a']),
+        fp.CellContainer('lvl1', [
+            fp.PropertyInt('int', -5, w=False),
+            fp.PropertyFloat('float', 1.5),
+            fp.PropertyEnum('enum', ['x', 'y', 'z'], 'y'),
+            fp.PropertyBool('bool', False),
+            fp.PropertyArray('array', [1, 2, 3], 'i', minimum=0),
+            fp.StrictCellContainer('strict', [fp.Cell('c')]),
+            union]),
+        fp.Cell(u'ćell')])
+
+
+def pending(container):
+    return [type(cell) is _PendingCell for cell in container._cells]
+
+
+@ddt
+class TestBinary(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'tree.bin')
+        self.tree = make_tree()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        binary.save(self.tree, self.path)
+        loaded = binary.load(self.path)
+        self.tree.remove('lambda')
+        self.assertEqual(spec.encode(loaded), spec.encode(self.tree))
+        self.assertFalse(loaded.get('lvl1/*int').writeable)
+        self.assertIsInstance(loaded.get('lvl1/strict'), fp.StrictCellContainer)
+
+    def test_save_over_loaded(self):
+        binary.save(self.tree, self.path)
+        loaded = binary.load(self.path)
+        loaded.set('lvl1/union/b1', 5)
+        binary.save(loaded, self.path)
+        self.assertEqual(loaded.get('lvl1/float'), 1.5)
+        self.assertEqual(binary.load(self.path).get('lvl1/union/b1'), 5)
+        self.assertEqual(os.listdir(self.directory), ['tree.bin'])
+
+    def test_bytes(self):
+        loaded = binary.loads(binary.dumps(self.tree))
+        self.assertEqual(loaded.get('lvl1/union/b1'), 2)
+
+    def test_lazy(self):
+        loaded = binary.loads(binary.dumps(self.tree))
+        self.assertEqual(loaded.keys(), ['str', 'variant', 'lvl1', u'ćell'])
+        self.assertEqual(pending(loaded), [True] * 4)
+        self.assertEqual(loaded.str, u'zażółć')
+        self.assertEqual(pending(loaded), [False, True, True, True])
+        lvl1 = loaded['lvl1']
+        self.assertEqual(pending(lvl1), [True] * 7)
+        self.assertEqual(list(loaded.get('lvl1/array')), [1, 2, 3])
+        self.assertEqual(pending(lvl1).count(False), 1)
+
+    def test_loaded_tree_is_usable(self):
+        loaded = binary.loads(binary.dumps(self.tree))
+        loaded.set('lvl1/enum', 'z')
+        loaded.lvl1.append(fp.PropertyInt('new', 1))
+        loaded.remove('variant')
+        self.assertEqual(loaded.get_many(['lvl1/enum', 'lvl1/new']), ['z', 1])
+        state = fp.State(loaded, fp.actions.ActionManager())
+        state.go_next('lvl1')
+        self.assertEqual(state.current.name, 'lvl1')
+
+    def test_open_is_lazy_for_big_trees(self):
+        count = 20000
+        tree = fp.CellContainer('root', [
+            fp.CellContainer('lvl{}'.format(i), [fp.PropertyInt('int', i)])
+            for i in xrange(count)])
+        binary.save(tree, self.path)
+        loaded = binary.load(self.path)
+        self.assertEqual(len(loaded), count)
+        self.assertEqual(loaded.get('lvl777/int'), 777)
+        self.assertTrue(loaded.contains('lvl0'))
+        self.assertFalse(loaded.contains('lvl{}'.format(count)))
+        # looked up without placeholders of all the other cells
+        self.assertNotIn('_cells', loaded.__dict__)
+        lvl777 = loaded['lvl777']
+        self.assertEqual(pending(loaded).count(False), 1)
+        self.assertIs(loaded['lvl777'], lvl777)
+        self.assertIs(lvl777.parent, loaded)
+
+    def test_changes_before_listing(self):
+        loaded = binary.loads(binary.dumps(self.tree))
+        lvl1 = loaded.lvl1
+        lvl1.float = 2.5
+        loaded.remove('variant')
+        loaded.append(fp.PropertyInt('new', 1))
+        self.assertEqual(loaded.keys(), ['str', 'lvl1', u'ćell', 'new'])
+        self.assertIs(loaded.lvl1, lvl1)
+        self.assertEqual(loaded.get('lvl1/float'), 2.5)
+        self.assertRaises(KeyError, loaded.get, 'missing')
+
+    @data(
+        '',
+        'FGPB' + '\0' * 30,
+        'XXXX' + '\0' * 30,
+    )
+    def test_broken(self, data):
+        self.assertRaises(fp.WrongValueException, binary.loads, data)
+
+    def test_functions_root(self):
+        self.assertRaises(fp.WrongValueException, binary.dumps,
+                fp.Lambda('lambda', lambda: 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+#encoding=utf-8
+
+import time
+import timeit
+import unittest
+from collections import OrderedDict
+
+from ddt import ddt, data
+
+import figpie as fp
+from figpie import schema
+from figpie import serial
+
+
+@ddt
+class TestBulk(unittest.TestCase):
+
+    def test_from_cells_generator(self):
+        cc = fp.CellContainer.from_cells('root',
+                (fp.PropertyInt('p{}'.format(i), i) for i in xrange(10)))
+        self.assertEqual(cc.keys(), ['p{}'.format(i) for i in xrange(10)])
+        self.assertEqual(cc.p3, 3)
+        self.assertIs(cc.get('*p3').parent, cc)
+
+    def test_union_from_cells(self):
+        union = fp.Union.from_cells('union', [fp.Cell('a'), fp.Cell('b')])
+        self.assertEqual(union.keys(), ['a', 'b', 'mode'])
+        self.assertEqual(union.mode, 'default')
+        union = fp.Union.from_mapping('union', {'int': 1})
+        self.assertEqual(union.int, 1)
+
+    def test_union_with_creators_from_cells(self):
+        class Modes(fp.Union):
+            def _create_x_props(self):
+                return [fp.PropertyInt('x1', 1)]
+
+        union = Modes.from_cells('union', [fp.Cell('x2')])
+        self.assertEqual(union.mode, 'x')
+        self.assertEqual(union.keys(), ['x1', 'x2', 'mode'])
+
+    def test_compiled_from_cells(self):
+        Root = schema.compile_schema(fp.CellContainer('root', [
+            fp.PropertyInt('int', 1)]))
+        root = Root.from_iterable('other', [('int', 2), ('str', 'a')])
+        self.assertIsInstance(root, Root)
+        self.assertEqual(root.name, 'other')
+        self.assertEqual(root.keys(), ['int', 'str'])
+        root.int = 3
+        self.assertEqual(root.get('int'), 3)
+        self.assertEqual(Root().int, 1)
+
+    def test_from_mapping(self):
+        cc = fp.CellContainer.from_mapping('root', OrderedDict([
+            ('bool', True),
+            ('int', 1),
+            ('float', 1.5),
+            ('str', 'a'),
+            ('list', [1, 2]),
+            ('cell', fp.Cell('cell')),
+            ('nested', {'int': 2}),
+        ]))
+        self.assertEqual([type(cell) for cell in cc], [fp.PropertyBool,
+                fp.PropertyInt, fp.PropertyFloat, fp.PropertyString,
+                fp.Property, fp.Cell, fp.CellContainer])
+        self.assertEqual(cc.get('nested/int'), 2)
+
+    def test_from_iterable(self):
+        cc = fp.StrictCellContainer.from_iterable('root',
+                (('c{}'.format(i), fp.Cell('c{}'.format(i)))
+                for i in xrange(3)))
+        self.assertIsInstance(cc, fp.StrictCellContainer)
+        self.assertEqual(len(cc), 3)
+
+    @data(
+        lambda: [fp.Cell('a'), fp.Cell('b'), fp.Cell('a')],
+        lambda: [fp.Cell('a'), fp.Cell('existing')],
+    )
+    def test_duplicates(self, factory):
+        cc = fp.CellContainer('root', [fp.Cell('existing')])
+        self.assertRaises(fp.WrongNameException, cc.extend, factory())
+        self.assertEqual(cc.keys(), ['existing'])
+        self.assertFalse(cc.contains('a'))
+
+    def test_wrong_type(self):
+        cc = fp.StrictCellContainer('root', [])
+        self.assertRaises(fp.WrongTypeException, cc.extend,
+                [fp.Cell('a'), fp.PropertyInt('b', 1)])
+        self.assertEqual(len(cc), 0)
+
+    def test_wrong_name_for_cell(self):
+        self.assertRaises(fp.WrongNameException,
+                fp.CellContainer.from_mapping, 'root', {'a': fp.Cell('b')})
+
+    def test_extend_is_one_notification(self):
+        cc = fp.CellContainer('root', [])
+        received = []
+        subscription = cc.subscribe(received.append)
+        cc.extend([fp.Cell('a'), fp.Cell('b')])
+        subscription.cancel()
+        self.assertEqual(len(received), 1)
+        self.assertEqual([event.new.name for event in received[0]], ['a', 'b'])
+
+    def test_option_set_frozen(self):
+        options = fp.OptionSet(['a'])
+        self.assertRaises(fp.NotWriteableException, options.extend,
+                [fp.Cell('b')])
+
+    def test_union_extend(self):
+        union = fp.Union('union', {'a': [fp.Cell('a1')]})
+        union.extend([fp.Cell('a2'), fp.Cell('a3')])
+        self.assertEqual(union.keys(), ['a1', 'a2', 'a3', 'mode'])
+
+    def test_union_extend_checks_first(self):
+        union = fp.Union('union', OrderedDict([('a', [fp.Cell('a1')]),
+                ('b', [])]))
+        self.assertRaises(fp.WrongNameException, union.extend,
+                [fp.Cell('a2'), fp.Cell('a1')])
+        self.assertRaises(fp.WrongNameException, union.extend,
+                [fp.Cell('mode')])
+        self.assertEqual(union.keys(), ['a1', 'mode'])
+        union.extend([fp.Cell('a2')])
+        union.mode = 'b'
+        union.append(fp.Cell('b1'))
+        union.mode = 'a'
+        self.assertEqual(union.keys(), ['a1', 'a2', 'mode'])
+        self.assertEqual(union.a2.name, 'a2')
+        self.assertEqual(union._map['b'][0].parent, union)
+
+
+class TestBulkScaling(unittest.TestCase):
+
+    # run as a script for the full benchmark (up to 10**6 children)
+    SIZES = (10 ** 4, 10 ** 5)
+    # saving and loading (in figpie.serial) takes much longer per cell
+    UNION_SIZES = (10 ** 3, 10 ** 4)
+
+    def measure(self, count):
+        cells = [fp.Cell('c{}'.format(i)) for i in xrange(count)]
+        start = time.time()
+        fp.CellContainer.from_cells('root', iter(cells))
+        return time.time() - start
+
+    def measure_union(self, count):
+        cells = [fp.Cell('c{}'.format(i)) for i in xrange(count)]
+        start = time.time()
+        union = fp.Union.from_cells('union', iter(cells))
+        text = serial.dumps(fp.CellContainer('root', [union]))
+        serial.loads(text)
+        return time.time() - start
+
+    def assertLinear(self, measure, sizes):
+        small, big = sizes
+        measure(small)
+        ratio = measure(big) / max(measure(small), 1e-6)
+        # 10 times more children, well below the 100 of quadratic scaling
+        self.assertLess(ratio, 10 * 3)
+
+    def test_linear(self):
+        self.assertLinear(self.measure, self.SIZES)
+
+    def test_union_linear(self):
+        self.assertLinear(self.measure_union, self.UNION_SIZES)
+
+
+class TestBulkAssignSpeed(unittest.TestCase):
+
+    COUNT = 2 * 10 ** 4
+
+    # best of a few runs, timings of single runs are too noisy to compare
+    def best(self, f):
+        return min(timeit.repeat(f, number=1, repeat=5))
+
+    def measure(self, count):
+        props = [fp.PropertyInt('p{}'.format(i), 0) for i in xrange(10)]
+        fp.CellContainer('root', props)
+        items = [(props[i % 10], i) for i in xrange(count)]
+
+        def setter():
+            for prop, value in items:
+                prop.value = value
+        return (self.best(setter),
+                self.best(lambda: fp.Property.assign_many(items)))
+
+    def test_assign_many_beats_setter(self):
+        setter, bulk = self.measure(self.COUNT)
+        self.assertLess(bulk, setter)
+
+
+if __name__ == '__main__':
+    scaling = TestBulkScaling('test_linear')
+    for count in (10 ** 4, 10 ** 5, 10 ** 6):
+        elapsed = scaling.measure(count)
+        print('{:>8} children: {:.3f}s ({:.2f}us per child)'.format(
+                count, elapsed, elapsed * 1e6 / count))
+    for count in (10 ** 3, 10 ** 4, 10 ** 5):
+        elapsed = scaling.measure_union(count)
+        print('{:>8} union cells (saved and loaded): {:.3f}s'.format(
+                count, elapsed))
+    for count in (10 ** 5, 10 ** 6):
+        setter, bulk = TestBulkAssignSpeed(
+                'test_assign_many_beats_setter').measure(count)
+        print('{:>8} values: setter {:.3f}s, assign_many {:.3f}s'.format(
+                count, setter, bulk))
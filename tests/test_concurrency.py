@@ -0,0 +1,286 @@
+#encoding=utf-8
+
+import threading
+import time
+import unittest
+
+from ddt import ddt, data
+
+import figpie as fp
+from figpie import concurrency
+from tests.trees import make_union
+
+
+def make_tree():
+    union = make_union(a=[fp.PropertyInt('a1', 1), fp.PropertyInt('a2', 2)],
+            b=[fp.PropertyInt('b1', 3)])
+    return fp.CellContainer('root', [
+        fp.CellContainer('lvl1', [fp.PropertyInt('int', 0), union]),
+        fp.CellContainer('other', [fp.PropertyInt('int', 0)])])
+
+
+def start(target, *args):
+    thread = threading.Thread(target=target, args=args)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+@ddt
+class TestRWLock(unittest.TestCase):
+
+    def setUp(self):
+        self.lock = fp.RWLock()
+
+    def test_readers_share(self):
+        inside = threading.Semaphore(0)
+        leave = threading.Event()
+
+        def read():
+            with self.lock.read:
+                inside.release()
+                leave.wait()
+
+        threads = [start(read) for _ in range(3)]
+        for _ in threads:
+            self.assertTrue(inside.acquire())
+        leave.set()
+        for thread in threads:
+            thread.join()
+
+    def test_writer_waits_for_readers(self):
+        written = threading.Event()
+
+        def write():
+            with self.lock.write:
+                written.set()
+
+        with self.lock.read:
+            thread = start(write)
+            self.assertFalse(written.wait(0.05))
+        thread.join()
+        self.assertTrue(written.is_set())
+
+    def test_reentrant(self):
+        with self.lock.write:
+            with self.lock.write:
+                with self.lock.read:
+                    pass
+        with self.lock.read:
+            with self.lock.read:
+                pass
+        # released completely
+        with self.lock.write:
+            pass
+
+    def test_write_while_reading_raises(self):
+        with self.lock.read:
+            self.assertRaises(RuntimeError, self.lock.acquire_write)
+
+
+@ddt
+class TestGuard(unittest.TestCase):
+
+    def setUp(self):
+        self.root = make_tree()
+        self.guarded = []
+
+    def tearDown(self):
+        for container in self.guarded:
+            fp.unguard(container)
+        self.assertEqual(concurrency._count, 0)
+
+    def guard(self, container):
+        lock = fp.guard(container)
+        self.guarded.append(container)
+        return lock
+
+    @data(
+        lambda root: root,
+        lambda root: root.lvl1,
+        lambda root: root.lvl1.union,
+    )
+    def test_nested_raises(self, other):
+        self.guard(self.root.lvl1)
+        self.assertRaises(fp.WrongValueException,
+                lambda: fp.guard(other(self.root)))
+
+    def test_unguard_raises(self):
+        self.assertRaises(fp.WrongValueException,
+                lambda: fp.unguard(self.root))
+
+    def test_lock_of(self):
+        lock = self.guard(self.root.lvl1)
+        self.assertIs(concurrency.lock_of(self.root.get('lvl1/union/*a1')),
+                lock)
+        self.assertIsNone(concurrency.lock_of(self.root.get('other/*int')))
+
+    def test_writers_serialised_per_subtree(self):
+        self.guard(self.root.lvl1)
+        self.guard(self.root.other)
+        done = []
+
+        def write(path):
+            self.root.set(path, 1)
+            done.append(path)
+
+        with self.root.lvl1.reading():
+            start(write, 'other/int').join()
+            thread = start(write, 'lvl1/int')
+            thread.join(0.05)
+            self.assertEqual(done, ['other/int'])
+        thread.join()
+        self.assertEqual(done, ['other/int', 'lvl1/int'])
+
+    def test_reading_above_guarded(self):
+        self.guard(self.root.lvl1)
+        self.guard(self.root.other)
+        done = threading.Event()
+
+        def write():
+            self.root.other.int = 5
+            done.set()
+
+        with self.root.reading():
+            start(write)
+            self.assertFalse(done.wait(0.05))
+        self.assertTrue(done.wait(1))
+
+    def test_union_not_torn(self):
+        self.guard(self.root.lvl1)
+        union = self.root.lvl1.union
+        expected = {'a': ['a1', 'a2', 'mode'], 'b': ['b1', 'mode']}
+        torn = []
+        stop = threading.Event()
+
+        def read():
+            while not stop.is_set():
+                with union.reading():
+                    mode, keys = union.mode, union.keys()
+                if expected[mode] != keys:
+                    torn.append((mode, keys))
+
+        readers = [start(read) for _ in range(3)]
+        for i in range(200):
+            union['mode'] = 'ab'[i % 2]
+        stop.set()
+        for reader in readers:
+            reader.join()
+        self.assertEqual(torn, [])
+
+    @data('transaction', 'set_many', 'history')
+    def test_many_writes_not_torn(self, how):
+        self.guard(self.root.lvl1)
+        self.guard(self.root.other)
+        paths = ['lvl1/int', 'other/int']
+        history = fp.History(self.root)
+        self.root.set_many([(path, 1) for path in paths])
+        mixed = []
+        stop = threading.Event()
+
+        def read():
+            while not stop.is_set():
+                with self.root.reading():
+                    pair = self.root.get_many(paths)
+                if pair[0] != pair[1]:
+                    mixed.append(pair)
+
+        readers = [start(read) for _ in range(3)]
+        for i in range(200):
+            if how == 'transaction':
+                with self.root.transaction():
+                    for path in paths:
+                        self.root.set(path, i)
+            elif how == 'set_many':
+                self.root.set_many([(path, i) for path in paths])
+            elif i % 2:
+                history.undo()
+            else:
+                history.redo()
+        stop.set()
+        for reader in readers:
+            reader.join()
+        history.close()
+        self.assertEqual(mixed, [])
+
+    def test_lazy_cells_created_once(self):
+        class Lazy(fp.CellContainer):
+            LAZY = True
+
+            def _create_abc_prop(self):
+                time.sleep(0.01)
+                return fp.PropertyInt('abc', 1)
+
+        lazy = Lazy('lazy')
+        self.root.lvl1.append(lazy)
+        self.guard(self.root.lvl1)
+        cells = []
+        threads = [start(lambda: cells.append(lazy.get('*abc')))
+                for _ in range(3)]
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(map(id, cells))), 1)
+        self.assertIs(cells[0], lazy.get('*abc'))
+
+
+class TestTrackedReads(unittest.TestCase):
+
+    def test_reads_of_other_threads_not_tracked(self):
+        root = make_tree()
+        computing = threading.Event()
+        read = threading.Event()
+
+        def func():
+            computing.set()
+            read.wait()
+            return root.lvl1.int
+
+        lam = fp.ReactiveLambda('lam', func)
+        thread = start(lambda: lam.value)
+        computing.wait()
+        root.other.int
+        read.set()
+        thread.join()
+        self.assertEqual(lam.dependencies,
+                frozenset([root.get('lvl1/*int')]))
+
+
+''' Reads per second of reader threads while a writer edits the tree '''
+def measure(readers, guarded, seconds=1.0):
+    root = make_tree()
+    if guarded:
+        fp.guard(root.lvl1)
+    stop = threading.Event()
+    counts = []
+
+    def read():
+        count = 0
+        while not stop.is_set():
+            root.get('lvl1/int')
+            with root.lvl1.reading():
+                root.get('lvl1/union/mode')
+            count += 2
+        counts.append(count)
+
+    def write():
+        i = 0
+        while not stop.is_set():
+            root.lvl1.int = i
+            root.lvl1.union['mode'] = 'ab'[i % 2]
+            i += 1
+
+    threads = [start(read) for _ in range(readers)] + [start(write)]
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    if guarded:
+        fp.unguard(root.lvl1)
+    return sum(counts) / seconds
+
+
+if __name__ == '__main__':
+    for readers in (1, 2, 4, 8):
+        for guarded in (False, True):
+            print('{} readers, guarded: {!s:5} {:>10.0f} reads/s'.format(
+                    readers, guarded, measure(readers, guarded)))
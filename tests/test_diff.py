@@ -0,0 +1,171 @@
+#encoding=utf-8
+
+import json
+import unittest
+
+from ddt import ddt, data, unpack
+
+import figpie as fp
+from figpie import spec
+from figpie.diff import digest
+from tests import trees
+
+
+def make_tree():
+    return trees.make_tree([
+        fp.PropertyInt('int', 1),
+        fp.PropertyFloat('float', 1.5),
+        fp.PropertyEnum('enum', ['x', 'y', 'z'], 'x'),
+        fp.PropertyBool('bool', True),
+        fp.PropertyArray('array', [1, 2, 3], 'i')],
+        extra=[fp.CellContainer('other', [fp.PropertyInt('int', 1)])])
+
+
+@ddt
+class TestDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.a = make_tree()
+        self.b = make_tree()
+
+    def check(self, expected):
+        patch = self.a.diff(self.b)
+        self.assertEqual(patch.to_list(), expected)
+        patch.apply(self.a)
+        self.assertEqual(spec.encode(self.a), spec.encode(self.b))
+        self.assertFalse(self.a.diff(self.b))
+        return patch
+
+    def test_equal(self):
+        self.assertEqual(len(fp.diff(self.a, self.b)), 0)
+
+    @data(
+        ('str', u'b'),
+        ('lvl1/int', 5),
+        ('lvl1/float', -1.0),
+        ('lvl1/enum', 'z'),
+        ('lvl1/bool', 'False'),
+        ('lvl1/array', [3, 2, 1]),
+        ('lvl1/union/a1', -2),
+    )
+    @unpack
+    def test_set(self, path, value):
+        self.b.set(path, value)
+        self.check([['set', path.split('/'), value]])
+
+    def test_union_mode(self):
+        self.b.set('lvl1/union/mode', 'b')
+        self.b.set('lvl1/union/b1', 5)
+        self.check([
+            ['set', ['lvl1', 'union', 'mode'], 'b'],
+            ['set', ['lvl1', 'union', 'b1'], 5]])
+
+    def test_add_remove(self):
+        self.b.lvl1.append(fp.CellContainer('new', [fp.PropertyInt('x', 1)]))
+        self.b.remove('other')
+        self.check([
+            ['remove', ['other']],
+            ['add', ['lvl1', 'new'], spec.encode(self.b.lvl1.new)]])
+
+    def test_replace_incompatible(self):
+        self.b.lvl1.remove('enum')
+        self.b.lvl1.append(fp.PropertyEnum('enum', ['x', 'w'], 'x'))
+        self.check([
+            ['remove', ['lvl1', 'enum']],
+            ['add', ['lvl1', 'enum'], spec.encode(self.b.get('lvl1/*enum'))]])
+
+    def test_unchanged_subtrees_skipped(self):
+        self.a.diff(self.b)
+        self.b.set('lvl1/int', 2)
+        self.assertIsNotNone(self.b.other._digest)
+        self.assertIsNone(self.b.lvl1._digest)
+        self.assertIsNone(self.b._digest)
+        self.assertEqual(len(self.a.diff(self.b)), 1)
+
+    def test_array_item_invalidates(self):
+        fp.diff(self.a, self.b)
+        self.b.get('lvl1/*array')[0] = 7
+        self.assertEqual(self.a.diff(self.b).to_list(),
+                [['set', ['lvl1', 'array'], [7, 2, 3]]])
+
+    def test_hash_collisions(self):
+        self.a.set('lvl1/int', -1)
+        self.b.set('lvl1/int', -2)
+        self.assertEqual(len(self.a.diff(self.b)), 1)
+
+    def test_digest_is_not_hash(self):
+        # hash(-1) == hash(-2), so hashes of digests could collide
+        self.a.lvl1.append(fp.CellContainer('c', [fp.PropertyInt('x', -1)]))
+        self.b.lvl1.append(fp.CellContainer('c', [fp.PropertyInt('x', -2)]))
+        self.assertEqual(len(digest(self.a)), 20)
+        self.assertNotEqual(digest(self.a.lvl1.c), digest(self.b.lvl1.c))
+        self.check([['set', ['lvl1', 'c', 'x'], -2]])
+
+    def test_different_types(self):
+        union = fp.Union('root', {'a': [fp.PropertyInt('a1', 1)]})
+        patch = fp.diff(self.a, union)
+        self.assertEqual(patch.to_list(),
+                [['replace', [], spec.encode(union)]])
+        self.assertRaises(fp.WrongValueException, patch.apply, self.a)
+
+    def test_apply_is_atomic(self):
+        patch = fp.Patch([
+            ['set', ['str'], 'b'],
+            ['set', ['lvl1', 'int'], 'not a number']])
+        self.assertRaises(fp.WrongValueException, patch.apply, self.a)
+        self.assertEqual(self.a.str, 'a')
+        patch = fp.Patch([
+            ['set', ['str'], 'b'],
+            ['remove', ['other']],
+            ['set', ['missing'], 1]])
+        self.assertRaises(KeyError, patch.apply, self.a)
+        self.assertEqual(self.a.str, 'a')
+        self.assertTrue(self.a.contains('other'))
+
+    def test_serialisable(self):
+        self.b.set('lvl1/float', 2.5)
+        self.b.lvl1.append(fp.PropertyArray('new', [1.5], 'd'))
+        patch = fp.Patch.from_list(json.loads(
+                json.dumps(self.a.diff(self.b).to_list())))
+        patch.apply(self.a)
+        self.assertFalse(self.a.diff(self.b))
+
+    def test_apply_is_one_notification(self):
+        received = []
+        self.a.subscribe(received.append)
+        self.b.set('str', 'b')
+        self.b.set('lvl1/int', 3)
+        self.a.diff(self.b).apply(self.a)
+        self.assertEqual(len(received), 1)
+
+
+@ddt
+class TestSpec(unittest.TestCase):
+
+    def test_round_trip(self):
+        tree = make_tree()
+        tree.lvl1.union.mode = 'b'
+        encoded = spec.encode(tree)
+        decoded = spec.decode(json.loads(json.dumps(encoded)))
+        self.assertEqual(spec.encode(decoded), encoded)
+        self.assertEqual(decoded.lvl1.union.mode, 'b')
+
+    def test_flags(self):
+        prop = spec.decode(spec.encode(fp.PropertyInt('int', 1, w=False)))
+        self.assertFalse(prop.writeable)
+        self.assertTrue(prop.readable)
+
+    @data(
+        fp.Lambda('lambda', lambda: 1),
+        fp.Action('action', lambda: 1),
+    )
+    def test_functions_not_encoded(self, cell):
+        self.assertRaises(fp.WrongTypeException, spec.encode, cell)
+
+    def test_unknown_type(self):
+        self.assertRaises(fp.WrongValueException, spec.decode,
+                {'type': 'unknown', 'name': 'x'})
+
+
+if __name__ == '__main__':
+    unittest.main()
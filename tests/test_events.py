@@ -0,0 +1,138 @@
+#encoding=utf-8
+
+import sys
+import unittest
+
+import figpie as fp
+from figpie import events
+from tests.trees import make_tree
+
+
+class TestEvents(unittest.TestCase):
+
+    def setUp(self):
+        self.root = make_tree([
+            fp.PropertyInt('int', 1),
+            fp.PropertyFloat('float', 1.5)])
+        self.lvl1 = self.root.lvl1
+        self.union = self.lvl1.union
+        self.received = []
+        self.subscriptions = []
+
+    def tearDown(self):
+        for subscription in self.subscriptions:
+            subscription.cancel()
+        events.flush()
+
+    def subscribe(self, cell, **kwargs):
+        subscription = cell.subscribe(self.received.append, **kwargs)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def changes(self):
+        return [[(e.kind, '/'.join(e.path), e.old, e.new) for e in received]
+                for received in self.received]
+
+    def test_cell(self):
+        self.subscribe(self.root.get('lvl1/*int'))
+        self.root.set('lvl1/int', 2)
+        self.root.set('lvl1/float', 2)
+        self.assertEqual(self.changes(), [[('value', '', 1, 2)]])
+
+    def test_subtree(self):
+        self.subscribe(self.lvl1)
+        self.root.set('str', 'b')
+        self.root.set('lvl1/int', 2)
+        self.root.set('lvl1/union/a1', 3)
+        self.assertEqual(self.changes(), [
+            [('value', 'int', 1, 2)],
+            [('value', 'union/a1', 1, 3)]])
+
+    def test_pattern(self):
+        self.subscribe(self.root, pattern='lvl1/union/*')
+        self.root.set('lvl1/int', 2)
+        self.root.set('lvl1/union/mode', 'b')
+        self.assertEqual(self.changes(), [
+            [('value', 'lvl1/union/mode', 'a', 'b')]])
+
+    def test_union_switched_before_notification(self):
+        seen = []
+        self.subscriptions.append(self.union.get('*mode').subscribe(
+                lambda changes: seen.append(
+                    (self.union.keys(), self.root.get('lvl1/union/b1')))))
+        self.union.mode = 'b'
+        self.assertEqual(seen, [(['b1', 'mode'], 2)])
+
+    def test_shared_cell(self):
+        cell = self.root.get('lvl1/*int')
+        other = fp.CellContainer('other', [cell])
+        self.subscribe(other)
+        other.int = 2
+        self.assertEqual(self.root.get('lvl1/int'), 2)
+        self.assertEqual(self.changes(), [[('value', 'int', 1, 2)]])
+
+    def test_append(self):
+        self.subscribe(self.root)
+        cell = fp.Cell('new')
+        self.lvl1.append(cell)
+        self.assertEqual(len(self.received), 1)
+        event = self.received[0][0]
+        self.assertEqual((event.kind, event.cell, event.path, event.new),
+                ('append', self.lvl1, ('lvl1',), cell))
+        self.assertIs(cell.parent, self.lvl1)
+
+    def test_remove(self):
+        self.subscribe(self.root)
+        with events.batch():
+            self.lvl1.remove('int')
+            self.lvl1.remove('float')
+        self.assertEqual([(e.kind, e.path, e.old.name, e.new)
+                for e in self.received[0]], [
+            ('remove', ('lvl1',), 'int', None),
+            ('remove', ('lvl1',), 'float', None)])
+
+    def test_transaction_coalesced(self):
+        self.subscribe(self.root)
+        with self.root.transaction():
+            self.root.set('lvl1/int', 2)
+            self.root.set('lvl1/int', 3)
+            self.root.set('str', 'b')
+        self.assertEqual(self.changes(), [[
+            ('value', 'lvl1/int', 1, 3),
+            ('value', 'str', 'a', 'b')]])
+
+    def test_batch_drops_noop(self):
+        self.subscribe(self.root)
+        with events.batch():
+            self.root.set('lvl1/int', 2)
+            self.root.set('lvl1/int', 1)
+            self.root.set('lvl1/float', 2.5)
+        self.assertEqual(self.changes(), [[('value', 'lvl1/float', 1.5, 2.5)]])
+
+    def test_queued(self):
+        self.subscribe(self.root, queued=True)
+        self.root.set('lvl1/int', 2)
+        self.root.set('lvl1/int', 3)
+        self.root.set('str', 'b')
+        self.assertEqual(self.received, [])
+        events.flush()
+        self.assertEqual(self.changes(), [[
+            ('value', 'lvl1/int', 1, 3),
+            ('value', 'str', 'a', 'b')]])
+        events.flush()
+        self.assertEqual(len(self.received), 1)
+
+    def test_cancel(self):
+        subscription = self.subscribe(self.root)
+        subscription.cancel()
+        self.root.set('lvl1/int', 2)
+        self.assertEqual(self.received, [])
+        self.assertFalse(subscription.active)
+
+    def test_not_callable(self):
+        self.assertRaises(fp.WrongTypeException,
+                lambda: self.root.subscribe(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
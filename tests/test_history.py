@@ -0,0 +1,138 @@
+#encoding=utf-8
+
+import unittest
+import warnings
+
+from ddt import ddt, data
+
+import figpie as fp
+from tests.trees import make_tree
+
+
+@ddt
+class TestHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.root = make_tree([
+            fp.PropertyInt('int', 1),
+            fp.PropertyEnum('enum', ['x', 'y', 'z'], 'x'),
+            fp.PropertyArray('array', [1, 2, 3], 'i')])
+        self.lvl1 = self.root.lvl1
+        self.union = self.lvl1.union
+        self.history = fp.History(self.root)
+
+    def tearDown(self):
+        self.history.close()
+
+    def test_undo_redo(self):
+        self.root.lvl1.int = 2
+        self.root.lvl1.enum = 'y'
+        self.assertTrue(self.history.undo())
+        self.assertEqual(self.root.lvl1.enum, 'x')
+        self.assertTrue(self.history.undo())
+        self.assertEqual(self.root.lvl1.int, 1)
+        self.assertFalse(self.history.undo())
+        self.assertTrue(self.history.redo())
+        self.assertTrue(self.history.redo())
+        self.assertFalse(self.history.redo())
+        self.assertEqual(self.root.get_many(['lvl1/int', 'lvl1/enum']),
+                [2, 'y'])
+
+    def test_new_change_clears_redo(self):
+        self.root.lvl1.int = 2
+        self.history.undo()
+        self.assertTrue(self.history.can_redo)
+        self.root.str = 'b'
+        self.assertFalse(self.history.can_redo)
+        self.assertEqual(len(self.history), 1)
+
+    def test_undo_is_not_recorded(self):
+        self.root.lvl1.int = 2
+        self.history.undo()
+        self.assertFalse(self.history.can_undo)
+
+    @data('transaction', 'set_many')
+    def test_bulk_is_one_step(self, how):
+        if how == 'transaction':
+            with self.root.transaction():
+                self.root.str = 'b'
+                self.root.lvl1.int = 2
+                self.root.lvl1.int = 3
+        else:
+            self.root.set_many({'str': 'b', 'lvl1/int': 3})
+        self.assertEqual(len(self.history), 1)
+        self.history.undo()
+        self.assertEqual(self.root.get_many(['str', 'lvl1/int']), ['a', 1])
+        self.history.redo()
+        self.assertEqual(self.root.get_many(['str', 'lvl1/int']), ['b', 3])
+
+    def test_union_mode(self):
+        with self.root.transaction():
+            self.union.a1 = 5
+            self.union.mode = 'b'
+        self.root.set('lvl1/union/b1', 6)
+        self.history.undo()
+        self.assertEqual(self.union.get('*b1').value, 2)
+        self.history.undo()
+        self.assertEqual(self.union.mode, 'a')
+        self.assertEqual(self.union.get('*a1').value, 1)
+        self.history.redo()
+        self.history.redo()
+        self.assertEqual(self.union.mode, 'b')
+        self.assertEqual(self.union.get('*b1').value, 6)
+
+    def test_unresolvable_path_is_skipped(self):
+        self.union.mode = 'b'
+        with self.root.transaction():
+            self.root.set('lvl1/union/b1', 6)
+            self.root.lvl1.int = 2
+        self.history.close()
+        self.union.mode = 'a'
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.assertTrue(self.history.undo())
+        self.assertEqual(len(caught), 1)
+        self.assertEqual(self.root.lvl1.int, 1)
+        self.assertTrue(self.history.can_redo)
+        self.assertEqual(len(self.history), 1)
+
+    def test_array(self):
+        array = self.root.lvl1.get('*array')
+        array[0] = 5
+        array.value = [7, 8]
+        array[1] = 9
+        self.history.undo()
+        self.assertEqual(list(array.value), [7, 8])
+        self.history.undo()
+        self.assertEqual(list(array.value), [5, 2, 3])
+        self.history.undo()
+        self.assertEqual(list(array.value), [1, 2, 3])
+        self.history.redo()
+        self.history.redo()
+        self.assertEqual(list(array.value), [7, 8])
+
+    def test_budget(self):
+        self.history.close()
+        self.history = fp.History(self.root, budget=2000)
+        for value in xrange(1000):
+            self.root.lvl1.int = value
+        self.assertLessEqual(self.history.size, self.history.budget)
+        self.assertLess(len(self.history), 1000)
+        self.assertGreater(len(self.history), 0)
+        self.history.undo()
+        self.assertEqual(self.root.lvl1.int, 998)
+
+    def test_deltas_share_paths(self):
+        self.root.lvl1.int = 2
+        self.root.lvl1.int = 3
+        (_, first), (_, second) = self.history._undo
+        self.assertIs(first[0][0], second[0][0])
+
+    def test_close(self):
+        self.history.close()
+        self.root.lvl1.int = 2
+        self.assertFalse(self.history.can_undo)
+
+
+if __name__ == '__main__':
+    unittest.main()
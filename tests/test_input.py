@@ -0,0 +1,90 @@
+#encoding=utf-8
+
+import sys
+import threading
+import unittest
+
+from ddt import ddt, data, unpack
+
+import figpie as fp
+from figpie.actions import ActionManager
+from figpie.debug import DummyDebug
+from figpie.input import InputManager
+from figpie.state import State
+
+
+@ddt
+class TestInputManager(unittest.TestCase):
+
+    def setUp(self):
+        self.enum = fp.PropertyEnum('zone',
+                ['Europe/Warsaw', 'Europe/Berlin', 'Asia/Tokyo', 'Asia'],
+                'Europe/Berlin')
+        self.actions = ActionManager()
+        self.release = threading.Event()
+        self.state = State([self.enum, fp.Cell('other'),
+                fp.Action('run', lambda: self.release.wait(1))], self.actions)
+        self.state.go_next('zone')
+        self.input = InputManager(None, DummyDebug())
+
+    def type(self, text, spc=''):
+        self.input._inp = text
+        self.input._spc = spc
+        self.input._handle_spc(self.state)
+        self.input._handle_inp(self.state)
+
+    @unpack
+    @data(
+        ('Europe/W', 'Europe/Warsaw'),
+        ('Asia/', 'Asia/Tokyo'),
+    )
+    def test_enum_prefix(self, text, value):
+        self.type(text)
+        self.assertEqual(self.enum.value, value)
+        self.assertTrue(self.state.in_root)
+
+    def test_enum_prefix_ambiguous(self):
+        self.type('Europe/')
+        self.assertEqual(self.enum.value, 'Europe/Berlin')
+        self.assertEqual(self.input.input_value, 'Europe/')
+
+    def test_enum_whole_name(self):
+        self.type('Asi')
+        self.assertEqual(self.input.input_value, 'Asi')
+        self.type('Asia', 'KEY_ENTER')
+        self.assertEqual(self.enum.value, 'Asia')
+        self.assertTrue(self.state.in_root)
+
+    def test_enum_no_match(self):
+        self.type('xyz')
+        self.assertEqual(self.input.input_value, '')
+
+    def test_search(self):
+        self.state.go_previous()
+        self.state.start_search()
+        self.type('zo')
+        self.assertEqual(self.input.input_value, 'zo')
+        self.type('zo', 'KEY_ENTER')
+        self.assertFalse(self.state.searching)
+        self.assertEqual(self.state.mode, 'enum')
+        self.assertEqual(self.state.path[1:], ['zone'])
+
+    def test_action_runs_in_background(self):
+        self.state.go_previous()
+        self.state.go_next('run')
+        self.assertEqual(self.state.mode, 'action')
+        self.type('', 'KEY_ENTER')
+        self.assertTrue(self.state.in_root)
+        self.assertEqual([job.name for job in self.state.jobs], ['run'])
+        self.release.set()
+        self.state.close()
+
+    def test_search_nothing_found(self):
+        self.state.start_search()
+        self.type('xyz', 'KEY_ENTER')
+        self.assertFalse(self.state.searching)
+        self.assertTrue(self.state.warnings)
+
+
+if __name__ == '__main__':
+    unittest.main()
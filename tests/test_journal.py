@@ -0,0 +1,126 @@
+#encoding=utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+
+import figpie as fp
+from figpie import serial
+from figpie.journal import Journal
+from tests import trees
+
+
+def make_tree():
+    return trees.make_tree([
+        fp.PropertyInt('int', 1),
+        fp.PropertyArray('array', [1, 2, 3], 'i')])
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'config')
+        self.tree = make_tree()
+        self.journal = Journal(self.tree, self.path)
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.directory)
+
+    def restored(self):
+        tree = make_tree()
+        Journal(tree, self.path).close()
+        return tree
+
+    def change(self):
+        self.tree.str = 'b'
+        with self.tree.transaction():
+            self.tree.set('lvl1/union/a1', 3)
+            self.tree.set('lvl1/union/mode', 'b')
+        self.tree.set('lvl1/union/b1', 4)
+        self.tree.get('lvl1/*array')[2] = 7
+
+    def check(self, tree):
+        self.assertEqual(tree.get_many(['str', 'lvl1/union/mode',
+                'lvl1/union/b1']), ['b', 'b', 4])
+        self.assertEqual(list(tree.get('lvl1/array')), [1, 2, 7])
+        tree.lvl1.union.mode = 'a'
+        self.assertEqual(tree.lvl1.union.a1, 3)
+
+    def test_restore_from_journal(self):
+        self.change()
+        self.assertEqual(len(self.journal), 4)
+        self.assertFalse(os.path.exists(self.path))
+        self.check(self.restored())
+
+    def test_restore_after_compaction(self):
+        self.change()
+        self.journal.compact()
+        self.assertEqual(len(self.journal), 0)
+        self.assertEqual(os.path.getsize(self.journal.journal_path), 0)
+        self.tree.lvl1.int = 5
+        tree = self.restored()
+        self.check(tree)
+        self.assertEqual(tree.lvl1.int, 5)
+
+    def test_compact_after(self):
+        self.journal.close()
+        self.journal = Journal(self.tree, self.path, compact_after=10)
+        for value in xrange(25):
+            self.tree.lvl1.int = value
+        self.assertEqual(len(self.journal), 5)
+        self.assertEqual(self.restored().lvl1.int, 24)
+
+    def test_write_cost_does_not_depend_on_tree(self):
+        self.tree.lvl1.append(fp.CellContainer('big', [
+            fp.PropertyInt('int{}'.format(i), i) for i in xrange(1000)]))
+        self.tree.lvl1.int = 2
+        self.assertLess(os.path.getsize(self.journal.journal_path), 64)
+
+    def test_torn_line(self):
+        self.change()
+        self.journal.close()
+        with open(self.journal.journal_path, 'a') as stream:
+            stream.write('[[["str"], "c"]')
+        self.journal = Journal(self.tree, self.path)
+        self.tree.lvl1.int = 9
+        tree = self.restored()
+        self.check(tree)
+        self.assertEqual(tree.get_many(['str', 'lvl1/int']), ['b', 9])
+
+    def test_unknown_paths_skipped(self):
+        self.tree.lvl1.int = 2
+        self.journal.close()
+        tree = fp.CellContainer('root', [fp.PropertyString('str', 'x')])
+        Journal(tree, self.path).close()
+        self.assertEqual(tree.str, 'x')
+
+    def test_rejected_values_skipped(self):
+        self.tree.str = 'b'
+        self.tree.lvl1.int = 2
+        self.journal.close()
+        tree = make_tree()
+        tree.remove('str')
+        tree.append(fp.PropertyInt('str', 1))
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            Journal(tree, self.path).close()
+        self.assertEqual(len(caught), 1)
+        self.assertEqual(tree.get_many(['str', 'lvl1/int']), [1, 2])
+
+    def test_menu(self):
+        self.journal.close()
+        menu = fp.Menu(self.tree, path=self.path, journal=True)
+        self.tree.lvl1.int = 6
+        self.assertEqual(self.restored().lvl1.int, 6)
+        menu.save()
+        self.assertEqual(len(menu._journal), 0)
+        self.assertEqual(self.restored().lvl1.int, 6)
+        menu._journal.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
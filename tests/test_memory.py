@@ -0,0 +1,78 @@
+#encoding=utf-8
+
+import sys
+import unittest
+
+from ddt import ddt, data
+
+import figpie as fp
+
+
+''' Rough per-instance footprint: object itself plus its __dict__ (if any) '''
+def footprint(cells):
+    total = 0
+    for cell in cells:
+        total += sys.getsizeof(cell)
+        if hasattr(cell, '__dict__'):
+            total += sys.getsizeof(cell.__dict__)
+    return total
+
+
+@ddt
+class TestMemory(unittest.TestCase):
+
+    COUNT = 100000
+
+    # budget per cell, well under the ~350 bytes a dict-based cell takes
+    MAX_BYTES_PER_CELL = 128
+
+    @data(
+        lambda i: fp.Cell('cell'),
+        lambda i: fp.Property('prop', i),
+        lambda i: fp.PropertyInt('int', i),
+        lambda i: fp.PropertyFloat('float', float(i)),
+        lambda i: fp.PropertyString('str', u'value'),
+        lambda i: fp.PropertyBool('bool', i % 2 == 0),
+        lambda i: fp.PropertyEnum('enum', ['a', 'b', 'c'], 'b'),
+    )
+    def test_no_instance_dict(self, factory):
+        self.assertFalse(hasattr(factory(1), '__dict__'))
+
+    def test_properties_footprint(self):
+        cells = [fp.PropertyInt('int', i) for i in xrange(self.COUNT)]
+        per_cell = footprint(cells) / float(self.COUNT)
+        self.assertLess(per_cell, self.MAX_BYTES_PER_CELL)
+
+    def test_enums_footprint(self):
+        cells = [fp.PropertyEnum('enum', ['a', 'b', 'c'], 'c')
+                for i in xrange(self.COUNT)]
+        per_cell = footprint(cells) / float(self.COUNT)
+        self.assertLess(per_cell, self.MAX_BYTES_PER_CELL)
+
+    def test_array_footprint(self):
+        arr = fp.PropertyArray('array', xrange(self.COUNT), 'd')
+        per_value = sys.getsizeof(arr._value) / float(self.COUNT)
+        self.assertLess(per_value, 9)
+
+    def test_enums_share_options(self):
+        e1 = fp.PropertyEnum('e1', ['a', 'b'], 'a')
+        e2 = fp.PropertyEnum('e2', [fp.Cell('a'), fp.Cell('b')], 'b')
+        self.assertIs(e1._options, e2._options)
+
+    def test_bools_share_options(self):
+        b1 = fp.PropertyBool('b1', True)
+        b2 = fp.PropertyBool('b2', False)
+        self.assertIs(b1._options, b2._options)
+
+    def test_names_interned(self):
+        name = ''.join(['some', ' ', 'name'])
+        self.assertIs(fp.Cell(name).name, fp.Cell('some name').name)
+
+    def test_options_immutable(self):
+        enum = fp.PropertyEnum('enum', ['a', 'b'], 'a')
+        self.assertRaises(fp.NotWriteableException,
+                lambda: enum._options.append(fp.Cell('c')))
+
+
+if __name__ == '__main__':
+    unittest.main()
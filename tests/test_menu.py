@@ -1,11 +1,17 @@
 #encoding=utf-8
 
+import os
+import shutil
 import sys
+import tempfile
+import threading
 import unittest
+import warnings
 
 from ddt import ddt, data, unpack
 
 import figpie as fp
+from figpie import serial
 
 
 @ddt
@@ -42,5 +48,53 @@ class TestMenu(unittest.TestCase):
     def test_contstructor_raises_type(self, container):
         self.assertRaises(fp.WrongTypeException, lambda: fp.Menu(container))
 
+    @unpack
+    @data(
+        ('/', False),
+        ('?', True),
+    )
+    def test_search_keys(self, key, fuzzy):
+        self.menu._input._inp = key
+        self.menu._input._handle_inp(self.menu._state)
+        self.assertTrue(self.menu._state.searching)
+        self.assertEqual(self.menu._state._fuzzy, fuzzy)
+        self.assertEqual(self.menu._input.input_value, '')
+
+    def test_quit_waits_for_actions(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'config.jsonl')
+            menu = fp.Menu(self.container, path=path)
+            started = threading.Event()
+
+            def slow():
+                started.set()
+                threading.Event().wait(0.1)
+                self.container.set('lvl1/lvl2/2p2', 'action')
+
+            menu._state.run_action(fp.Action('slow', slow))
+            started.wait(1)
+            self.assertRaises(SystemExit, menu.quit)
+            with open(path) as stream:
+                self.assertEqual(serial.load(stream).get('lvl1/lvl2/2p2'),
+                        'action')
+            self.assertIsNone(self.container._lock)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_quit_warns_about_running_actions(self):
+        started, release = threading.Event(), threading.Event()
+        self.menu.QUIT_TIMEOUT = 0.05
+        self.menu._state.run_action(fp.Action('stuck',
+                lambda: started.set() or release.wait(1)))
+        started.wait(1)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.assertRaises(SystemExit, self.menu.quit)
+        self.assertIn('stuck', str(caught[0].message))
+        release.set()
+        self.assertEqual(self.menu._state.close(1), [])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -5,6 +5,7 @@ import unittest
 import figpie as fp
 from itertools import product
 from ddt import ddt, data, file_data, unpack
+from tests.trees import make_union
 
 
 @ddt
@@ -309,6 +310,34 @@ class TestCellContainer(unittest.TestCase):
                 self.fail('No exception while adding prop of name {}'
                         .format(cell.name))
 
+    def test_many_cells_keep_order(self):
+        names = ['cell {}'.format(i) for i in range(5000)]
+        cc = fp.CellContainer(self.NAME, [fp.Cell(name) for name in names])
+        self.assertEqual(cc.keys(), names)
+        for name in names[::500]:
+            self.assertTrue(cc.contains(name))
+            self.assertEqual(cc[name].name, name)
+
+    def test_index_follows_append(self):
+        p = fp.Property('p', 1)
+        cc = fp.CellContainer(self.NAME, [fp.Cell('a')])
+        self.assertFalse(cc.contains('p'))
+        cc.append(p)
+        self.assertTrue(cc.contains('p'))
+        self.assertEqual(cc['*p'], p)
+        self.assertEqual(cc.keys(), ['a', 'p'])
+
+    def test_remove(self):
+        p = fp.Property('p', 1)
+        cc = fp.CellContainer(self.NAME, [fp.Cell('a'), p, fp.Cell('b')])
+        self.assertIs(cc.remove('p'), p)
+        self.assertFalse(cc.contains('p'))
+        self.assertIsNone(p.parent)
+        self.assertEqual(cc.keys(), ['a', 'b'])
+        self.assertRaises(KeyError, lambda: cc.remove('p'))
+        cc.append(fp.Cell('p'))
+        self.assertEqual(cc.keys(), ['a', 'b', 'p'])
+
     def test_getattribute_value(self):
         p1 = fp.Property('p1', 1)
         p2 = fp.Property('p2', 2)
@@ -353,6 +382,114 @@ class TestCellContainer(unittest.TestCase):
         self.assertEqual(instance.b, 'False')
 
 
+    def test_derivative_class_creators_computed_once(self):
+
+        class SomeClass(fp.CellContainer):
+
+            def _create_a_prop(self):
+                return fp.PropertyInt('a', 1)
+
+        class OtherClass(SomeClass):
+
+            def _create_b_prop(self):
+                return fp.PropertyInt('b', 2)
+
+        import inspect
+        getmembers = inspect.getmembers
+        calls = []
+        def counting_getmembers(*args, **kwargs):
+            calls.append(args[0])
+            return getmembers(*args, **kwargs)
+
+        inspect.getmembers = counting_getmembers
+        try:
+            for i in range(3):
+                self.assertEqual(SomeClass('some').keys(), ['a'])
+                self.assertEqual(OtherClass('other').keys(), ['a', 'b'])
+        finally:
+            inspect.getmembers = getmembers
+
+        self.assertEqual(calls, [SomeClass, OtherClass])
+
+    def test_derivative_union_with_creators(self):
+
+        class SomeUnion(fp.Union):
+
+            def _create_a_props(self):
+                return [fp.PropertyInt('a1', 1)]
+
+            def _create_b_props(self):
+                return fp.PropertyInt('b1', 2)
+
+        union = SomeUnion('union')
+        self.assertEqual(sorted(union._map.keys()), ['a', 'b'])
+        self.assertEqual(SomeUnion._creators,
+                [('_create_a_props', 'a'), ('_create_b_props', 'b')])
+
+    def test_lazy_derivative_class(self):
+
+        created = []
+
+        class Branch(fp.CellContainer):
+
+            LAZY = True
+
+            def _create_a_prop(self):
+                created.append('a')
+                return fp.PropertyInt('a', 1)
+
+            def _create_b_prop(self):
+                created.append('b')
+                return fp.CellContainer('b', [fp.Cell('b1')])
+
+        branch = Branch('branch')
+        self.assertEqual(created, [])
+        self.assertEqual(branch.keys(), ['a', 'b'])
+        self.assertEqual(len(branch), 2)
+        self.assertTrue(branch.contains('b'))
+        self.assertEqual(created, [])
+
+        self.assertEqual(branch.a, 1)
+        self.assertEqual(created, ['a'])
+        self.assertEqual(branch.a, 1)
+        self.assertEqual(created, ['a'])
+
+        self.assertEqual([cell.name for cell in branch], ['a', 'b'])
+        self.assertEqual(created, ['a', 'b'])
+
+    def test_lazy_remove(self):
+
+        class Branch(fp.CellContainer):
+
+            LAZY = True
+
+            def _create_a_prop(self):
+                return fp.PropertyInt('a', 1)
+
+            def _create_b_prop(self):
+                return fp.PropertyInt('b', 2)
+
+            def _create_c_prop(self):
+                return fp.PropertyInt('c', 3)
+
+        branch = Branch('branch')
+        branch.remove('a')
+        self.assertEqual(branch.keys(), ['b', 'c'])
+        self.assertEqual(branch.c, 3)
+        self.assertEqual([cell.name for cell in branch], ['b', 'c'])
+
+    def test_lazy_derivative_class_wrong_name(self):
+
+        class Branch(fp.CellContainer):
+
+            LAZY = True
+
+            def _create_a_prop(self):
+                return fp.PropertyInt('not a', 1)
+
+        branch = Branch('branch')
+        self.assertRaises(fp.WrongNameException, lambda: branch['a'])
+
     def test_derivative_class_with_property(self):
 
         class SomeClass(fp.CellContainer):
@@ -387,6 +524,82 @@ class TestCellContainer(unittest.TestCase):
 
 
 
+@ddt
+class TestCellContainerPaths(unittest.TestCase):
+
+    def setUp(self):
+        self.union = make_union()
+        self.lvl2 = fp.CellContainer('lvl2', [
+            fp.PropertyFloat('float prop', 5.2),
+            fp.PropertyInt('int prop', 5),
+            self.union])
+        self.lvl1 = fp.CellContainer('lvl1', [fp.Cell('1c1'), self.lvl2])
+        self.root = fp.CellContainer('root', [fp.Cell('rc1'), self.lvl1])
+
+    def test_get(self):
+        self.assertEqual(self.root.get('lvl1/lvl2/float prop'), 5.2)
+        self.assertEqual(self.root.get(['lvl1', 'lvl2', 'int prop']), 5)
+        self.assertEqual(self.root.get('lvl1/lvl2'), self.lvl2)
+        self.assertEqual(self.root.get(''), self.root)
+
+    def test_get_private(self):
+        cell = self.root.get('lvl1/lvl2/*int prop')
+        self.assertEqual(cell, self.lvl2['*int prop'])
+
+    @data('lvl1/lvl3', 'lvl1/1c1/x', 'lvl1/lvl2/float prop/x', 'root')
+    def test_get_missing(self, path):
+        self.assertRaises(KeyError, lambda: self.root.get(path))
+
+    def test_set(self):
+        self.root.set('lvl1/lvl2/int prop', '7')
+        self.assertEqual(self.lvl2['int prop'], 7)
+        self.assertRaises(fp.WrongValueException,
+                lambda: self.root.set('lvl1/lvl2/int prop', 'x'))
+        self.assertRaises(KeyError, lambda: self.root.set('lvl1/1c1', 1))
+        self.assertRaises(NotImplementedError,
+                lambda: self.root.set('lvl1/lvl2/*int prop', 1))
+
+    def test_many(self):
+        paths = ['lvl1/lvl2/float prop', 'lvl1/lvl2/int prop']
+        self.root.set_many(zip(paths, [1.5, 3]))
+        self.assertEqual(self.root.get_many(paths), [1.5, 3])
+        self.root.set_many({paths[1]: 4})
+        self.assertEqual(self.root.get_many(paths), [1.5, 4])
+
+    def test_cache_invalidated_on_append(self):
+        self.assertRaises(KeyError, lambda: self.root.get('lvl1/new'))
+        self.lvl1.append(fp.PropertyInt('new', 3))
+        self.assertEqual(self.root.get('lvl1/new'), 3)
+
+    def test_cache_invalidated_on_remove(self):
+        self.assertEqual(self.root.get('lvl1/lvl2/union/a1'), 1)
+        self.root.get('lvl1/*lvl2').remove('union')
+        self.assertRaises(KeyError,
+                lambda: self.root.get('lvl1/lvl2/union/a1'))
+
+    def test_cache_invalidated_on_mode_change(self):
+        self.assertEqual(self.root.get('lvl1/lvl2/union/a1'), 1)
+        self.root.set('lvl1/lvl2/union/mode', 'b')
+        self.assertEqual(self.root.get('lvl1/lvl2/union/b1'), 2)
+        self.assertRaises(KeyError,
+                lambda: self.root.get('lvl1/lvl2/union/a1'))
+
+    def test_cache_kept_on_other_tree_change(self):
+        self.root.get('lvl1/lvl2/int prop')
+        paths = self.root._paths
+        fp.CellContainer('other', [fp.Cell('c')]).append(fp.Cell('d'))
+        self.assertEqual(self.root.get('lvl1/lvl2/int prop'), 5)
+        self.assertIs(self.root._paths, paths)
+
+    def test_cache_invalidated_on_nested_append(self):
+        self.assertEqual(self.root.get('lvl1/lvl2/union/a1'), 1)
+        self.root.get('lvl1/lvl2/*union').append(fp.PropertyInt('a2', 2))
+        self.assertEqual(self.root.get('lvl1/lvl2/union/a2'), 2)
+        self.lvl2.remove('int prop')
+        self.assertRaises(KeyError,
+                lambda: self.root.get('lvl1/lvl2/int prop'))
+
+
 @ddt
 class TestStrictCellContainer(unittest.TestCase):
 
@@ -469,6 +682,131 @@ class TestLambda(unittest.TestCase):
     def test_lambda_and_prop(self):
         self.assertEqual(self.lam_prop.value, self.prop.value)
 
+    def counting_lambda(self, **kwargs):
+        self.calls = 0
+        def func():
+            self.calls += 1
+            return self.calls
+        return fp.Lambda('name', func, **kwargs)
+
+    def test_not_cached(self):
+        lam = self.counting_lambda()
+        self.assertEqual([lam.value, lam.value], [1, 2])
+        self.assertEqual(lam.cache_info(), (0, 2))
+
+    def test_cached_once(self):
+        lam = self.counting_lambda(cached=True)
+        self.assertEqual([lam.value, lam.value, lam.value], [1, 1, 1])
+        self.assertEqual(lam.cache_info(), fp.LambdaCacheInfo(2, 1))
+
+    def test_cached_invalidate(self):
+        lam = self.counting_lambda(cached=True)
+        self.assertEqual(lam.value, 1)
+        lam.invalidate()
+        self.assertEqual([lam.value, lam.value], [2, 2])
+        self.assertEqual(lam.cache_info(), (1, 2))
+
+    def test_ttl(self):
+        lam = self.counting_lambda(ttl=3600)
+        self.assertEqual([lam.value, lam.value], [1, 1])
+        lam.invalidate()
+        self.assertEqual(lam.value, 2)
+
+    def test_ttl_expired(self):
+        lam = self.counting_lambda(ttl=0)
+        self.assertEqual([lam.value, lam.value], [1, 2])
+        self.assertEqual(lam.cache_info(), (0, 2))
+
+    def test_ttl_negative(self):
+        self.assertRaises(fp.WrongValueException,
+                lambda: fp.Lambda('name', lambda: 1, ttl=-1))
+
+
+
+class TestReactiveLambda(unittest.TestCase):
+
+    def setUp(self):
+        self.a = fp.PropertyInt('a', 1)
+        self.b = fp.PropertyInt('b', 10)
+        self.switch = fp.PropertyBool('switch', True)
+        self.calls = []
+
+        def total():
+            self.calls.append('total')
+            return self.a.value + self.b.value
+        self.total = fp.ReactiveLambda('total', total)
+
+        def pick():
+            self.calls.append('pick')
+            return self.total.value if self.switch else self.a.value
+        self.pick = fp.ReactiveLambda('pick', pick)
+
+    def test_computed_once(self):
+        self.assertEqual([self.total.value, self.total.value], [11, 11])
+        self.assertEqual(self.calls, ['total'])
+        self.assertEqual(self.total.dependencies, set([self.a, self.b]))
+
+    def test_recomputed_after_change(self):
+        self.assertEqual(self.total.value, 11)
+        self.b.value = 20
+        self.assertEqual([self.total.value, self.total.value], [21, 21])
+        self.assertEqual(self.calls, ['total', 'total'])
+
+    def test_not_recomputed_after_unrelated_change(self):
+        other = fp.PropertyInt('other', 0)
+        self.assertEqual(self.total.value, 11)
+        other.value = 1
+        self.assertEqual(self.total.value, 11)
+        self.assertEqual(self.calls, ['total'])
+
+    def test_chained(self):
+        self.assertEqual(self.pick.value, 11)
+        self.a.value = 2
+        self.assertEqual(self.pick.value, 12)
+        self.assertEqual(self.calls, ['pick', 'total', 'pick', 'total'])
+
+    def test_dependencies_follow_branches(self):
+        self.assertEqual(self.pick.value, 11)
+        self.switch.value = 'False'
+        self.assertEqual(self.pick.value, 1)
+        self.assertEqual(self.pick.dependencies, set([self.switch, self.a]))
+
+        del self.calls[:]
+        self.b.value = 30
+        self.assertEqual(self.pick.value, 1)
+        self.assertEqual(self.calls, [])
+
+    def test_not_writeable(self):
+        self.assertRaises(fp.NotWriteableException,
+                lambda: setattr(self.total, 'value', 1))
+
+    def test_depends_on_not_cached_lambda(self):
+        values = [1, 2]
+        source = fp.Lambda('source', lambda: values[-1])
+        double = fp.ReactiveLambda('double', lambda: source.value * 2)
+        self.assertEqual(double.value, 4)
+        values.append(3)
+        self.assertEqual(double.value, 6)
+
+    def test_depends_on_ttl_lambda(self):
+        values = [1, 2]
+        source = fp.Lambda('source', lambda: values[-1], ttl=60)
+        double = fp.ReactiveLambda('double', lambda: source.value * 2)
+        self.assertEqual(double.value, 4)
+        self.assertEqual(double._expires, source._expires)
+        source._expires = double._expires = 0
+        values.append(3)
+        self.assertEqual(double.value, 6)
+
+    def test_depends_on_cached_lambda(self):
+        values = [1, 2]
+        source = fp.Lambda('source', lambda: values[-1], cached=True)
+        double = fp.ReactiveLambda('double', lambda: source.value * 2)
+        self.assertEqual(double.value, 4)
+        values.append(3)
+        self.assertEqual(double.value, 4)
+        source.invalidate()
+        self.assertEqual(double.value, 6)
 
 
 @ddt
@@ -620,6 +958,109 @@ class TestPropertyInt(TestProperty):
             self.assertTrue(isinstance(cell.value, self.TYPE._TYPE))
 
 
+class TestTypedConversion(unittest.TestCase):
+
+    def test_converters_compiled_once(self):
+        prop = fp.PropertyFloat('f', 1.)
+        prop.value = '2.5'
+        converters = fp.PropertyFloat.__dict__['_converters']
+        converter = converters[str]
+        prop.value = 3
+        prop.value = '4'
+        self.assertIs(converters[str], converter)
+        self.assertIs(converters[int], float)
+        # exact type is trusted, never converted
+        self.assertNotIn(float, converters)
+        self.assertEqual(prop.value, 4.)
+
+    def test_caches_go_away_with_class(self):
+        import gc
+        import weakref
+
+        class Generated(fp.PropertyInt):
+            pass
+
+        Generated('g', '1').value = 2
+        ref = weakref.ref(Generated)
+        del Generated
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_converting_subclass_not_trusted(self):
+
+        class Doubled(fp.PropertyInt):
+            def _convert(self, value):
+                return fp.PropertyInt._convert(self, value) * 2
+
+        self.assertFalse(Doubled._trusted(int))
+        self.assertEqual(Doubled('d', 2).value, 4)
+        prop = Doubled('d', 1)
+        fp.Property.assign_many([(prop, 3)])
+        self.assertEqual(prop.value, 6)
+
+    def test_assign_many_checks_writeable(self):
+
+        class Locked(fp.PropertyInt):
+            locked = False
+
+            @property
+            def writeable(self):
+                return not self.locked
+
+        prop = Locked('l', 1)
+        prop.locked = True
+        self.assertRaises(fp.NotWriteableException,
+                lambda: fp.Property.assign_many([(prop, 2)]))
+
+    def test_subclass_has_own_converters(self):
+
+        class PropertyLong(fp.PropertyInt):
+            _TYPE = long
+            _ACCEPTED_TYPES = (basestring, int)
+
+        prop = PropertyLong('l', 1)
+        self.assertIsInstance(prop.value, long)
+        self.assertIsInstance(fp.PropertyInt('i', 1).value, int)
+
+    def test_trusted(self):
+
+        class Positive(fp.PropertyInt):
+            def _additional_value_check(self, value):
+                return value > 0
+
+        self.assertTrue(fp.PropertyInt._trusted(int))
+        self.assertTrue(fp.PropertyFloat._trusted(float))
+        self.assertFalse(fp.PropertyFloat._trusted(int))
+        self.assertFalse(fp.PropertyInt._trusted(bool))
+        self.assertFalse(fp.PropertyEnum._trusted(unicode))
+        self.assertFalse(Positive._trusted(int))
+
+    def test_assign_many(self):
+        ints = [fp.PropertyInt(str(i), 0) for i in range(100)]
+        floats = [fp.PropertyFloat(str(i), 0.) for i in range(100)]
+        fp.Property.assign_many(zip(ints, range(100)))
+        fp.Property.assign_many(zip(floats, ['1.5'] * 100))
+        self.assertEqual([p.value for p in ints], range(100))
+        self.assertEqual([p.value for p in floats], [1.5] * 100)
+
+    def test_assign_many_checks_untrusted(self):
+
+        class Positive(fp.PropertyInt):
+            def _additional_value_check(self, value):
+                return value > 0
+
+        props = [Positive('a', 1), Positive('b', 1)]
+        self.assertRaises(fp.WrongValueException,
+                lambda: fp.Property.assign_many(zip(props, [2, 0])))
+        self.assertEqual([p.value for p in props], [1, 1])
+
+    def test_assign_many_not_writeable(self):
+        props = [fp.PropertyInt('a', 1), fp.PropertyInt('b', 1, w=False)]
+        self.assertRaises(fp.NotWriteableException,
+                lambda: fp.Property.assign_many(zip(props, [2, 2])))
+        self.assertEqual([p.value for p in props], [1, 1])
+
+
 class TestPropertyFloat(TestPropertyInt):
 
     PROPER_VALUES = [-1., 0., 1.1,100., 1000.2, '2', '-4', '3.5', '-1.4']
@@ -770,6 +1211,32 @@ class TestPropertyEnum(unittest.TestCase):
         for val in self.good_vals:
             self.assertTrue(options.contains(val))
 
+    def test_options_shared_not_copied(self):
+        self.assertIs(self.enum.options, self.enum.options)
+        other = fp.PropertyEnum('other', list(self.good_vals), 'b')
+        self.assertIs(other.options, self.enum.options)
+
+    def test_index(self):
+        self.assertEqual(self.enum.index, 0)
+        self.enum.value = 'c'
+        self.assertEqual(self.enum.index, 2)
+        self.assertEqual(self.enum.options.index('b'), 1)
+        self.assertEqual(self.enum.options[1].name, 'b')
+        self.assertEqual(self.enum.options['b'].name, 'b')
+        self.assertRaises(KeyError, lambda: self.enum.options.index('x'))
+
+    def test_many_options(self):
+        names = ['option {}'.format(i) for i in range(10000)]
+        enum = fp.PropertyEnum(self.NAME, names, names[0])
+        enum.value = names[-1]
+        self.assertEqual(enum.index, 9999)
+        self.assertEqual(enum.keys(), names)
+        self.assertEqual(enum.options.startswith('option 999'),
+                ['option 999', 'option 9990', 'option 9991', 'option 9992',
+                 'option 9993', 'option 9994', 'option 9995', 'option 9996',
+                 'option 9997', 'option 9998', 'option 9999'])
+        self.assertEqual(enum.options.startswith('x'), [])
+
     @unittest.skip("not implemented")
     def test_loop_options(self):
         try:
@@ -797,6 +1264,126 @@ class TestPropertyBool(TestProperty):
             self.fail('cannot use {} as init argument for valu! exception:'
                     .format(v, e))
 
+@ddt
+class TestPropertyArray(unittest.TestCase):
+
+    NAME = 'gains'
+    TYPE_NAME = 'array'
+
+    def setUp(self):
+        self.arr = fp.PropertyArray(self.NAME, [1., 2., 3., 4.],
+                minimum=0., maximum=10.)
+
+    def test_type(self):
+        self.assertEqual(self.arr.type, self.TYPE_NAME)
+        self.assertEqual(self.arr.typecode, 'd')
+
+    @unpack
+    @data(
+        ('d', [1, 2.5, '3'], [1., 2.5, 3.]),
+        ('i', (1, 2, '3'), [1, 2, 3]),
+        ('h', xrange(3), [0, 1, 2]),
+        ('d', (v for v in [1, 2, '3']), [1., 2., 3.]),
+        ('d', [], []),
+    )
+    def test_constructor(self, typecode, values, expected):
+        arr = fp.PropertyArray(self.NAME, values, typecode)
+        self.assertEqual(arr.value.tolist(), expected)
+        self.assertEqual(len(arr), len(expected))
+
+    @unpack
+    @data(
+        ('d', 'str', fp.WrongTypeException),
+        ('d', [1, None], fp.WrongTypeException),
+        ('d', (v for v in [1, 2, None]), fp.WrongTypeException),
+        ('d', (v for v in [1, 'x']), fp.WrongValueException),
+        ('d', 5, fp.WrongTypeException),
+        ('d', ['x'], fp.WrongValueException),
+        ('i', [1.5], fp.WrongTypeException),
+        ('i', ['1.5'], fp.WrongValueException),
+        ('b', [1000], fp.WrongValueException),
+        ('c', [1], fp.WrongTypeException),
+    )
+    def test_constructor_wrong(self, typecode, values, exception):
+        self.assertRaises(exception,
+                lambda: fp.PropertyArray(self.NAME, values, typecode))
+
+    def test_bulk_assign(self):
+        self.arr.value = [5.] * 1000
+        self.assertEqual(len(self.arr), 1000)
+        self.assertEqual(self.arr[999], 5.)
+
+    def test_bulk_assign_checked(self):
+        for values in ([1., 11.], [-1.], ['a']):
+            try:
+                self.arr.value = values
+            except (fp.WrongValueException, fp.WrongTypeException):
+                pass
+            else:
+                self.fail('no exception for {}'.format(values))
+        self.assertEqual(self.arr.value.tolist(), [1., 2., 3., 4.])
+
+    def test_value_is_a_copy(self):
+        values = self.arr.value
+        values[0] = 100.
+        self.assertEqual(self.arr[0], 1.)
+
+    def test_slices(self):
+        self.assertEqual(self.arr[1:3].tolist(), [2., 3.])
+        self.arr[1:3] = [7, 8]
+        self.assertEqual(self.arr.value.tolist(), [1., 7., 8., 4.])
+        self.assertRaises(fp.WrongValueException,
+                lambda: self.arr.__setitem__(slice(0, 2), [1., 20.]))
+        self.assertEqual(self.arr.value.tolist(), [1., 7., 8., 4.])
+
+    def test_items(self):
+        self.arr[0] = '9.5'
+        self.arr[-1] = 0
+        self.assertEqual(self.arr.value.tolist(), [9.5, 2., 3., 0.])
+        self.assertRaises(fp.WrongValueException,
+                lambda: self.arr.__setitem__(1, 11))
+        self.assertRaises(IndexError, lambda: self.arr.__setitem__(4, 1))
+
+    def test_items_as_cells(self):
+        root = fp.CellContainer('root', [self.arr])
+        self.assertEqual(self.arr.keys(), ['0', '1', '2', '3'])
+        self.assertEqual(root.get('gains/2'), 3.)
+        root.set('gains/2', '6')
+        self.assertEqual(self.arr[2], 6.)
+        item = root.get('gains/*2')
+        self.assertEqual(item.type, 'array item')
+        self.assertIs(item.parent, self.arr)
+        self.assertRaises(KeyError, lambda: root.get('gains/4'))
+
+    @data(500, -500, 10 ** 30, '500')
+    def test_item_out_of_range(self, value):
+        arr = fp.PropertyArray(self.NAME, [1], 'b')
+        self.assertRaises(fp.WrongValueException,
+                lambda: arr.__setitem__(0, value))
+        self.assertEqual(arr[0], 1)
+
+    def test_items_after_resize(self):
+        root = fp.CellContainer('root', [self.arr])
+        self.assertEqual(root.get('gains/3'), 4.)
+        root.set('gains', [1.])
+        self.assertRaises(KeyError, lambda: root.get('gains/3'))
+        self.assertRaises(KeyError, lambda: root.set('gains/3', 5))
+
+    def test_items_not_writeable(self):
+        arr = fp.PropertyArray(self.NAME, [1, 2], 'i', w=False)
+        self.assertRaises(fp.NotWriteableException,
+                lambda: arr.__setitem__(0, 3))
+
+    @unittest.skipIf(fp.properties.numpy is None, 'numpy not available')
+    def test_numpy(self):
+        numpy = fp.properties.numpy
+        self.arr.value = numpy.arange(3, dtype='int32')
+        self.assertEqual(self.arr.value.tolist(), [0., 1., 2.])
+        view = self.arr.as_numpy()
+        self.assertEqual(view.tolist(), [0., 1., 2.])
+        self.assertFalse(view.flags.writeable)
+
+
 @ddt
 class TestUnion(unittest.TestCase):
 
@@ -886,6 +1473,47 @@ class TestUnion(unittest.TestCase):
                         .format(possible_mode, e))
 
 
+    def test_append(self):
+        union = fp.Union(self.NAME, {'a': [fp.Cell('a1')]})
+        union.append(fp.PropertyInt('a2', 2))
+        self.assertEqual(union.a2, 2)
+        self.assertEqual(union.keys(), ['a1', 'a2', 'mode'])
+        self.assertRaises(fp.WrongNameException,
+                lambda: union.append(fp.Cell('a1')))
+
+    def test_remove(self):
+        union = fp.Union(self.NAME, {
+            'a': [fp.Cell('a1'), fp.Cell('a2')],
+            'b': [fp.Cell('b1')]})
+        union['mode'] = 'a'
+        union.remove('a1')
+        self.assertEqual(union.keys(), ['a2', 'mode'])
+        self.assertRaises(KeyError, lambda: union.remove('b1'))
+        self.assertRaises(KeyError, lambda: union.remove('mode'))
+        union['mode'] = 'b'
+        self.assertEqual(union.keys(), ['b1', 'mode'])
+
+    def test_mode_views(self):
+        union = fp.Union(self.NAME, {
+            'a': [fp.Cell('a1'), fp.Cell('a2')],
+            'b': fp.Cell('b1')})
+        union['mode'] = 'a'
+        view_a = union._cells
+        self.assertIs(view_a, union._cells)
+        self.assertEqual(union.keys(), ['a1', 'a2', 'mode'])
+
+        union['mode'] = 'b'
+        self.assertEqual(union.keys(), ['b1', 'mode'])
+        self.assertTrue(union.contains('b1'))
+        self.assertFalse(union.contains('a1'))
+
+        union['mode'] = 'a'
+        self.assertIs(view_a, union._cells)
+
+        union.append(fp.Cell('a3'))
+        self.assertEqual(union.keys(), ['a1', 'a2', 'a3', 'mode'])
+        self.assertEqual(union['a3'].name, 'a3')
+
     def test_change_childs_value(self):
         v1 = 1
         propInt = fp.PropertyInt('b', v1)
@@ -0,0 +1,141 @@
+#encoding=utf-8
+
+import unittest
+
+from ddt import ddt, data
+
+import figpie as fp
+from figpie import schema
+from figpie import spec
+from tests.trees import make_tree
+
+
+def make_prototype():
+    return make_tree([
+        fp.PropertyInt('int', 1),
+        fp.PropertyFloat('float', 1.5),
+        fp.PropertyEnum('enum', ['x', 'y', 'z'], 'y'),
+        fp.PropertyArray('array', [1, 2, 3], 'i'),
+        fp.StrictCellContainer('strict', [fp.Cell('c')])],
+        mode='b', extra=[
+        fp.Lambda('lambda', lambda: 5, cached=True),
+        fp.Property('variant', {'list': [1]}),
+        fp.Property('list', [1, 2]),
+        fp.Cell('keys'),
+        fp.Cell('with space')])
+
+
+@ddt
+class TestSchema(unittest.TestCase):
+
+    def setUp(self):
+        self.prototype = make_prototype()
+        self.Root = schema.compile_schema(self.prototype)
+
+    def test_same_tree(self):
+        root = self.Root()
+        self.assertIsInstance(root, fp.CellContainer)
+        self.assertEqual(root.name, 'root')
+        self.prototype.remove('lambda')
+        root.remove('lambda')
+        self.assertEqual(spec.encode(root), spec.encode(self.prototype))
+        self.assertIsInstance(root.get('lvl1/strict'), fp.StrictCellContainer)
+
+    def test_instances_are_independent(self):
+        first, second = self.Root(), self.Root('other')
+        first.lvl1.int = 2
+        first.get('lvl1/*array')[0] = 9
+        first.lvl1.union.mode = 'a'
+        self.assertEqual(second.name, 'other')
+        for tree in (second, self.prototype):
+            self.assertEqual(tree.get_many(['lvl1/int', 'lvl1/union/mode']),
+                    [1, 'b'])
+            self.assertEqual(list(tree.get('lvl1/array')), [1, 2, 3])
+        self.assertIs(first.get('lvl1/*int').parent, first.lvl1)
+        self.assertIsNot(first.lvl1, second.lvl1)
+
+    def test_accessors(self):
+        root = self.Root()
+        self.assertIsInstance(type(root).__dict__['str'], property)
+        self.assertNotIn('keys', type(root).__dict__)
+        self.assertEqual(root.str, 'a')
+        root.str = 'b'
+        self.assertEqual(root.get('str'), 'b')
+        self.assertRaises(fp.WrongValueException,
+                lambda: setattr(root.lvl1, 'enum', 'w'))
+        self.assertEqual(root['with space'].name, 'with space')
+        self.assertEqual(root.get('lambda'), 5)
+
+    def test_structure_can_change(self):
+        root = self.Root()
+        root.append(fp.PropertyInt('new', 1))
+        root.remove('str')
+        self.assertEqual(root.new, 1)
+        self.assertRaises(KeyError, lambda: root.str)
+        self.assertEqual(self.Root().str, 'a')
+
+    def test_lambda_cache_not_shared(self):
+        self.assertEqual(self.prototype.get('lambda'), 5)
+        root = self.Root()
+        self.assertEqual(root.get('*lambda').cache_info(), (0, 0))
+
+    def test_from_description(self):
+        Root = schema.compile_schema(spec.encode(fp.CellContainer('root', [
+            fp.PropertyInt('int', 3)])))
+        self.assertEqual(Root.__name__, 'CompiledRoot')
+        self.assertEqual(Root().int, 3)
+
+    @data(
+        lambda: fp.PropertyInt('int', 1),
+        lambda: fp.Union('union', {'a': []}),
+        lambda: fp.OptionSet(['a']),
+    )
+    def test_wrong_schema(self, factory):
+        self.assertRaises(fp.WrongTypeException, schema.compile_schema, factory())
+
+    def test_mutable_values_not_shared(self):
+        first, second = self.Root(), self.Root()
+        first.get('list').append(3)
+        first.get('variant')['new'] = 1
+        for tree in (second, self.prototype):
+            self.assertEqual(tree.get_many(['list', 'variant']),
+                    [[1, 2], {'list': [1]}])
+
+    def test_subclass_attributes_cloned(self):
+        class Limited(fp.PropertyInt):
+            def __init__(self, name, value, limit):
+                self.limit = limit
+                self.seen = []
+                fp.PropertyInt.__init__(self, name, value)
+
+            def _additional_value_check(self, value):
+                return value <= self.limit
+
+        Root = schema.compile_schema(fp.CellContainer('root', [
+            Limited('int', 1, 10)]))
+        first, second = Root(), Root()
+        self.assertEqual(first.get('*int').limit, 10)
+        first.int = 10
+        self.assertRaises(fp.WrongValueException, setattr, first, 'int', 11)
+        first.get('*int').seen.append(1)
+        self.assertEqual(second.get('*int').seen, [])
+
+    def test_prototype_class_kept(self):
+        class Props(fp.StrictCellContainer):
+            CONTAINED_TYPE = fp.PropertyInt
+
+            def total(self):
+                return sum(cell.value for cell in self.values())
+
+        Root = schema.compile_schema(fp.CellContainer('root', [
+            Props('props', [fp.PropertyInt('a', 1), fp.PropertyInt('b', 2)])]))
+        props = Root().props
+        self.assertIsInstance(props, Props)
+        self.assertEqual(props.total(), 3)
+        self.assertRaises(fp.WrongTypeException, props.append,
+                fp.PropertyFloat('c', 3.0))
+        props.append(fp.PropertyInt('c', 3))
+        self.assertEqual(props.total(), 6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+#encoding=utf-8
+
+import unittest
+
+from ddt import ddt, data, unpack
+
+import figpie as fp
+from figpie.search import FuzzyIndex, NameIndex, tokens, trigrams
+from tests.trees import make_union
+
+
+def make_tree():
+    union = make_union(a=[fp.PropertyInt('alpha_rate', 1)],
+            b=[fp.PropertyInt('beta_rate', 2)])
+    return fp.CellContainer('root', [
+        fp.PropertyInt('frame_rate', 25),
+        fp.CellContainer('video', [
+            fp.PropertyInt('frame_rate', 30),
+            fp.PropertyString('codec', 'h264'),
+            union]),
+        fp.CellContainer('audio', [
+            fp.PropertyInt('sample_rate', 44100)])])
+
+
+@ddt
+class TestNameIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.root = make_tree()
+        self.index = NameIndex(self.root)
+
+    def tearDown(self):
+        self.index.close()
+
+    @unpack
+    @data(
+        ('frameRate', ['framerate']),
+        ('frame_rate', ['frame', 'rate']),
+        ('Sample-Rate 2', ['sample', 'rate', '2']),
+        ('__', []),
+    )
+    def test_tokens(self, name, expected):
+        self.assertEqual(tokens(name), expected)
+
+    def test_find(self):
+        self.assertEqual(self.index.find('frame_rate'),
+                [('frame_rate',), ('video', 'frame_rate')])
+        self.assertEqual(self.index.find('missing'), [])
+
+    @unpack
+    @data(
+        ('frame_rate', [('frame_rate',), ('video', 'frame_rate')]),
+        ('rate', [('frame_rate',), ('audio', 'sample_rate'),
+                ('video', 'frame_rate'), ('video', 'union', 'alpha_rate')]),
+        ('ra fr', [('frame_rate',), ('video', 'frame_rate')]),
+        ('cod', [('video', 'codec')]),
+        ('video', [('video',)]),
+        ('beta', []),
+        ('', []),
+    )
+    def test_search(self, query, expected):
+        self.assertEqual(self.index.search(query), expected)
+
+    def test_exact_name_first(self):
+        self.root.audio.append(fp.Cell('rate'))
+        self.assertEqual(self.index.search('rate')[0], ('audio', 'rate'))
+
+    def test_append_remove(self):
+        count = len(self.index)
+        self.root.audio.append(fp.CellContainer('extra',
+                [fp.PropertyInt('gain', 1)]))
+        self.assertEqual(len(self.index), count + 2)
+        self.assertEqual(self.index.search('gain'),
+                [('audio', 'extra', 'gain')])
+
+        self.root.audio.remove('extra')
+        self.assertEqual(len(self.index), count)
+        self.assertEqual(self.index.search('gain'), [])
+        self.assertEqual(self.index.find('extra'), [])
+
+    def test_union_mode(self):
+        self.root.video.union['mode'] = 'b'
+        self.assertEqual(self.index.search('alpha'), [])
+        self.assertEqual(self.index.search('beta'),
+                [('video', 'union', 'beta_rate')])
+
+    def test_close(self):
+        self.index.close()
+        self.root.audio.append(fp.Cell('gain'))
+        self.assertEqual(self.index.search('gain'), [])
+
+
+
+@ddt
+class TestFuzzyIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.root = make_tree()
+        self.index = FuzzyIndex(self.root)
+
+    def tearDown(self):
+        self.index.close()
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams(['ab', 'c']),
+                set([' ab', 'ab ', ' c ']))
+
+    @unpack
+    @data(
+        ('frame_rate', ('frame_rate',)),
+        ('fram rat', ('frame_rate',)),
+        ('frme_rate', ('frame_rate',)),
+        ('sampel', ('audio', 'sample_rate')),
+        ('h264', ('video', 'codec')),
+        ('44100', ('audio', 'sample_rate')),
+        ('audio', ('audio',)),
+    )
+    def test_search(self, query, expected):
+        self.assertEqual(self.index.search(query)[0], expected)
+
+    def test_no_match(self):
+        self.assertEqual(self.index.search('xyz'), [])
+        self.assertEqual(self.index.search(''), [])
+
+    def test_type_filter(self):
+        self.assertEqual(self.index.search('str'), [('video', 'codec')])
+        self.assertEqual(self.index.search('int frame'),
+                [('frame_rate',), ('video', 'frame_rate')])
+        self.assertEqual(self.index.search('str frame'), [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.index.search('rate', limit=2)), 2)
+
+    def test_value_change(self):
+        self.root.video.codec = 'vp9'
+        self.assertEqual(self.index.search('h264'), [])
+        self.assertEqual(self.index.search('vp9'), [('video', 'codec')])
+
+    def test_not_readable(self):
+        self.root.audio.append(fp.PropertyString('secret', 'hunter2', r=False))
+        self.assertEqual(self.index.search('hunter2'), [])
+        self.assertEqual(self.index.search('secret'), [('audio', 'secret')])
+
+    def test_append_remove(self):
+        count = len(self.index)
+        self.root.audio.append(fp.PropertyString('channels', 'stereo'))
+        self.assertEqual(len(self.index), count + 1)
+        self.assertEqual(self.index.search('stero'), [('audio', 'channels')])
+
+        self.root.audio.remove('channels')
+        self.assertEqual(len(self.index), count)
+        self.assertEqual(self.index.search('stereo'), [])
+
+    def test_union_mode(self):
+        self.root.video.union['mode'] = 'b'
+        self.assertEqual(self.index.search('alpha'), [])
+        self.assertEqual(self.index.search('beta_rate')[0],
+                ('video', 'union', 'beta_rate'))
+
+
+if __name__ == '__main__':
+    unittest.main()
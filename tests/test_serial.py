@@ -0,0 +1,131 @@
+#encoding=utf-8
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+from StringIO import StringIO
+
+from ddt import ddt, data
+
+import figpie as fp
+from figpie import serial
+from figpie import spec
+from tests.trees import make_union
+
+
+def make_tree():
+    union = make_union(b=[fp.PropertyInt('b1', 2),
+            fp.CellContainer('b2', [])])
+    return fp.CellContainer('root', [
+        fp.PropertyString('str', u'zażółć'),
+        fp.Lambda('lambda', lambda: 1),
+        fp.CellContainer('lvl1', [
+            fp.PropertyInt('int', 1),
+            fp.PropertyFloat('float', 1.5),
+            fp.PropertyEnum('enum', ['x', 'y', 'z'], 'x'),
+            fp.PropertyBool('bool', True),
+            fp.PropertyArray('array', [1, 2, 3], 'i', minimum=0),
+            fp.StrictCellContainer('empty', []),
+            union]),
+        fp.Cell('cell')])
+
+
+@ddt
+class TestSerial(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = make_tree()
+
+    def test_lines(self):
+        lines = list(serial.iterdump(self.tree))
+        self.assertEqual(json.loads(lines[0]), {'figpie': serial.VERSION})
+        self.assertEqual(json.loads(lines[1]),
+                {'type': 'container', 'name': 'root', 'size': 4})
+        self.assertEqual(json.loads(lines[2])['value'], u'zażółć')
+        self.assertEqual(json.loads(lines[3]),
+                {'type': 'function', 'name': 'lambda'})
+        self.assertEqual(len(lines), 16)
+
+    def test_round_trip(self):
+        self.tree.lvl1.union.mode = 'b'
+        self.tree.lvl1.union.b1 = 5
+        stream = StringIO()
+        serial.dump(self.tree, stream)
+        stream.seek(0)
+        loaded = serial.load(stream)
+        self.assertFalse(loaded.contains('lambda'))
+        self.tree.remove('lambda')
+        self.assertEqual(spec.encode(loaded), spec.encode(self.tree))
+        self.assertEqual(loaded.lvl1.union.mode, 'b')
+
+    def test_load_into(self):
+        saved = make_tree()
+        saved.lvl1.int = 5
+        saved.lvl1.enum = 'z'
+        saved.get('lvl1/*array')[1] = 7
+        saved.lvl1.union.a1 = 3
+        saved.lvl1.union.mode = 'b'
+        saved.lvl1.union.b1 = 4
+        received = []
+        self.tree.subscribe(received.append)
+        serial.load_into(self.tree, serial.dumps(saved).splitlines())
+        self.assertEqual(self.tree.get_many(
+                ['lvl1/int', 'lvl1/enum', 'lvl1/union/mode', 'lvl1/union/b1']),
+                [5, 'z', 'b', 4])
+        self.assertEqual(list(self.tree.get('lvl1/array')), [1, 7, 3])
+        self.assertEqual(len(received), 1)
+        self.tree.lvl1.union.mode = 'a'
+        self.assertEqual(self.tree.lvl1.union.a1, 3)
+
+    def test_load_into_skips_unknown(self):
+        saved = make_tree()
+        saved.lvl1.append(fp.CellContainer('new', [fp.PropertyInt('x', 1)]))
+        saved.lvl1.remove('int')
+        saved.lvl1.append(fp.PropertyString('int', 'text'))
+        saved.lvl1.float = 2.5
+        serial.load_into(self.tree, serial.dumps(saved).splitlines())
+        self.assertFalse(self.tree.lvl1.contains('new'))
+        self.assertEqual(self.tree.lvl1.int, 1)
+        self.assertEqual(self.tree.lvl1.float, 2.5)
+
+    def test_load_into_skips_wrong_values(self):
+        saved = make_tree()
+        saved.lvl1.remove('array')
+        saved.lvl1.append(fp.PropertyArray('array', [-1], 'i'))
+        saved.lvl1.int = 5
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            serial.load_into(self.tree, serial.dumps(saved).splitlines())
+        self.assertEqual(len(caught), 1)
+        self.assertEqual(list(self.tree.get('lvl1/array')), [1, 2, 3])
+        self.assertEqual(self.tree.lvl1.int, 5)
+
+    @data(
+        '',
+        '{"figpie": 0}\n',
+        '{"figpie": 1}\n{"type": "container", "name": "root", "size": 2}\n'
+            '{"type": "cell", "name": "a"}\n',
+    )
+    def test_broken(self, text):
+        self.assertRaises(fp.WrongValueException, serial.loads, text)
+
+    def test_menu_path(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'config.jsonl')
+            menu = fp.Menu(self.tree, path=path)
+            self.tree.lvl1.int = 8
+            menu.save()
+            tree = make_tree()
+            fp.Menu(tree, path=path)
+            self.assertEqual(tree.lvl1.int, 8)
+            self.assertEqual(os.listdir(directory), ['config.jsonl'])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
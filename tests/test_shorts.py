@@ -38,6 +38,12 @@ class TestShortMapper(unittest.TestCase):
         for result, expected in zip(results, expected_results):
             self.assertEqual(result, expected)
 
+    def testMany(self):
+        names = [str(i) for i in range(5000)]
+        results = self.mapper(names)
+        self.assertEqual(len(results), len(names))
+        self.assertEqual(sorted(results.values()), sorted(names))
+
 
 @ddt
 class TestShortFinder(unittest.TestCase):
@@ -49,7 +55,10 @@ class TestShortFinder(unittest.TestCase):
     @unpack
     @data(
         (['a', 'aa', 'ba', 'A', ' a'],'a',['a', 'aa']),
-        (['a', 'aa', 'aaba', 'abaa', 'Aa', ' aa'],'aa',['aa', 'aaba'])
+        (['a', 'aa', 'aaba', 'abaa', 'Aa', ' aa'],'aa',['aa', 'aaba']),
+        (['?', '/', 'a', 'a.b', 'axb'],'?',['?']),
+        (['?', '/', 'a', 'a.b', 'axb'],'a.',['a.b']),
+        (['(', '[a', '*'],'[',['[a'])
     )
     def testBasicFind(self,shorts, sequence, expected_shorts):
         results = self.finder(shorts, sequence)
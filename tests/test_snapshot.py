@@ -0,0 +1,198 @@
+#encoding=utf-8
+
+import gc
+import unittest
+
+from ddt import ddt, data
+
+import figpie as fp
+from figpie import snapshot
+from tests.trees import make_tree
+
+
+@ddt
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.root = make_tree([
+            fp.PropertyInt('int', 1),
+            fp.PropertyEnum('enum', ['x', 'y', 'z'], 'x'),
+            fp.PropertyArray('array', [1, 2, 3], 'i')])
+        self.lvl1 = self.root.lvl1
+        self.union = self.lvl1.union
+
+    def tearDown(self):
+        gc.collect()
+
+    def test_values_after_writes(self):
+        snap = self.root.snapshot()
+        self.root.str = 'b'
+        self.root.lvl1.int = 2
+        self.root.lvl1.int = 3
+        self.root.lvl1.enum = 'z'
+        self.assertEqual(snap.get_many(['str', 'lvl1/int', 'lvl1/enum']),
+                ['a', 1, 'x'])
+        self.assertEqual(self.root.get_many(['str', 'lvl1/int', 'lvl1/enum']),
+                ['b', 3, 'z'])
+
+    def test_nested_views(self):
+        snap = self.root.snapshot()
+        self.root.lvl1.int = 5
+        lvl1 = snap['lvl1']
+        self.assertIsInstance(lvl1, fp.Snapshot)
+        self.assertEqual(lvl1.int, 1)
+        self.assertEqual(snap.get(['lvl1', '*int']), 1)
+
+    def test_several_snapshots(self):
+        snaps = []
+        for value in xrange(5):
+            self.root.lvl1.int = value
+            snaps.append(self.root.snapshot())
+        self.root.lvl1.int = 10
+        self.assertEqual([s.get('lvl1/int') for s in snaps], range(5))
+
+    def test_array(self):
+        snap = self.root.snapshot()
+        array = self.root.lvl1.get('*array')
+        array[0] = 7
+        array[1] = 8
+        self.assertEqual(list(snap.get('lvl1/array')), [1, 2, 3])
+        self.assertEqual(snap.get('lvl1/array/2'), 3)
+        self.assertEqual(list(array.value), [7, 8, 3])
+        self.root.lvl1.array = [4]
+        self.assertEqual(list(snap.get('lvl1/array')), [1, 2, 3])
+
+    def test_append(self):
+        snap = self.root.snapshot()
+        self.root.lvl1.append(fp.PropertyInt('new', 1))
+        self.assertNotIn('new', snap['lvl1'].keys())
+        self.assertFalse(snap['lvl1'].contains('new'))
+        self.assertRaises(KeyError, snap.get, 'lvl1/new')
+        self.assertEqual(self.root.get('lvl1/new'), 1)
+        self.assertEqual(self.root.snapshot().get('lvl1/new'), 1)
+
+    def test_remove(self):
+        snap = self.root.snapshot()
+        removed = self.root.lvl1.remove('int')
+        self.root.lvl1.remove('enum')
+        self.root.lvl1.append(fp.PropertyInt('int', 7))
+        self.assertEqual(snap['lvl1'].keys(), ['int', 'enum', 'array', 'union'])
+        self.assertEqual(snap.get('lvl1/int'), 1)
+        self.assertEqual(snap.get('lvl1/enum'), 'x')
+        self.assertEqual(self.root.snapshot()['lvl1'].keys(),
+                ['array', 'union', 'int'])
+        self.assertEqual(self.root.lvl1.int, 7)
+
+    def test_union_remove(self):
+        snap = self.root.snapshot()
+        self.union.remove('a1')
+        self.assertEqual(snap.get('lvl1/union').keys(), ['a1', 'mode'])
+        self.assertEqual(snap.get('lvl1/union/a1'), 1)
+
+    def test_union(self):
+        snap = self.root.snapshot()
+        self.union.mode = 'b'
+        self.union.append(fp.PropertyInt('b2', 3))
+        view = snap.get('lvl1/union')
+        self.assertEqual(view.keys(), ['a1', 'mode'])
+        self.assertEqual(view.mode, 'a')
+        self.assertEqual(view.a1, 1)
+        self.assertEqual(self.root.snapshot().get('lvl1/union').keys(),
+                ['b1', 'b2', 'mode'])
+
+    def test_transaction(self):
+        snap = self.root.snapshot()
+        with self.root.transaction():
+            self.root.str = 'b'
+            self.root.lvl1.int = 2
+        self.assertEqual(snap.get_many(['str', 'lvl1/int']), ['a', 1])
+
+    @data('str', 'lvl1/int')
+    def test_read_only(self, path):
+        snap = self.root.snapshot()
+        self.assertRaises(fp.NotWriteableException, snap.set, path, 1)
+
+    def test_history_dropped(self):
+        prop = self.root.lvl1.get('*int')
+        snap = self.root.snapshot()
+        self.root.lvl1.int = 2
+        self.assertIsNotNone(prop._history)
+        snap.close()
+        self.assertRaises(RuntimeError, snap.get, 'str')
+        self.root.lvl1.int = 3
+        self.assertIsNone(prop._history)
+
+    def test_released_by_gc(self):
+        prop = self.root.lvl1.get('*int')
+        self.root.snapshot()
+        gc.collect()
+        self.assertFalse(snapshot._live)
+        self.root.lvl1.int = 2
+        self.assertIsNone(prop._history)
+
+    def test_old_records_pruned(self):
+        prop = self.root.lvl1.get('*int')
+        old = self.root.snapshot()
+        self.root.lvl1.int = 2
+        del old
+        gc.collect()
+        keep = self.root.snapshot()
+        for value in xrange(3, 10):
+            self.root.lvl1.int = value
+            self.root.snapshot()
+        self.assertEqual(len(prop._history), 1)
+        self.assertEqual(keep.get('lvl1/int'), 2)
+
+    def test_old_structure_records_pruned(self):
+        old = self.root.snapshot()
+        self.lvl1.append(fp.PropertyInt('new', 1))
+        self.lvl1.remove('int')
+        keep = self.root.snapshot()
+        self.assertEqual(len(self.lvl1._born), 1)
+        self.assertEqual(len(self.lvl1._dead), 1)
+        del old
+        gc.collect()
+        self.lvl1.append(fp.PropertyInt('newer', 1))
+        self.assertEqual(self.lvl1._born.values(), [snapshot._epoch])
+        self.assertFalse(self.lvl1._dead)
+        self.assertEqual(keep['lvl1'].keys(),
+                ['enum', 'array', 'union', 'new'])
+        keep.close()
+        self.lvl1.remove('new')
+        self.assertIsNone(self.lvl1._born)
+        self.assertIsNone(self.lvl1._dead)
+
+    def test_lazy_cell_created_after_snapshot(self):
+        class Lazy(fp.CellContainer):
+            LAZY = True
+
+            def _create_abc_prop(self):
+                return fp.PropertyInt('abc', 1)
+
+        self.lvl1.append(Lazy('lazy'))
+        snap = self.root.snapshot()
+        self.root.set('lvl1/lazy/abc', 2)
+        self.assertEqual(snap.get('lvl1/lazy/abc'), 1)
+
+    def test_records_cleared_on_last_release(self):
+        prop = self.root.lvl1.get('*int')
+        arr = self.root.lvl1.get('*array')
+        snaps = [self.root.snapshot() for i in xrange(3)]
+        self.lvl1.int = 2
+        self.lvl1.array[0] = 5
+        self.lvl1.append(fp.PropertyInt('new', 1))
+        self.lvl1.remove('enum')
+        snaps.pop().close()
+        self.assertIsNotNone(prop._history)
+        del snaps
+        gc.collect()
+        # nothing written since, still nothing kept
+        self.assertIsNone(prop._history)
+        self.assertIsNone(arr._history)
+        self.assertIsNone(self.lvl1._born)
+        self.assertIsNone(self.lvl1._dead)
+        self.assertFalse(snapshot._recorded)
+
+
+if __name__ == '__main__':
+    unittest.main()
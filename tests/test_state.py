@@ -1,11 +1,13 @@
 #encoding=utf-8
 
 import sys
+import threading
 import unittest
 
 from ddt import ddt, data, unpack
 
 import figpie as fp
+from figpie import workers
 from figpie.state import State
 from figpie.actions import ActionManager
 
@@ -75,6 +77,38 @@ class TestState(unittest.TestCase):
         go_next('rc1')
         go_previous('root')
 
+    def test_go_next_lazy(self):
+        created = []
+
+        class Lazy(fp.CellContainer):
+
+            LAZY = True
+
+            def _create_lazy1_prop(self):
+                created.append('lazy1')
+                return fp.CellContainer('lazy1', [fp.Cell('x')])
+
+            def _create_lazy2_prop(self):
+                created.append('lazy2')
+                return fp.CellContainer('lazy2', [fp.Cell('y')])
+
+        state = State(Lazy('root'), self.actions)
+        self.assertEqual(created, [])
+        state.go_next('lazy2')
+        self.assertEqual(created, ['lazy2'])
+        self.assertEqual(state.current.keys(), ['y'])
+
+    def test_array_items(self):
+        arr = fp.PropertyArray('arr', [1, 2, 3], 'i')
+        state = State([arr], self.actions)
+        state.go_next('arr')
+        self.assertEqual(state.mode, 'container')
+        self.assertEqual(state.options.values()[1].value, 2)
+        state.go_next('1')
+        self.assertEqual(state.mode, 'property')
+        state.current.value = '5'
+        self.assertEqual(arr.value.tolist(), [1, 5, 3])
+
     def test_go_down_in_root_raises(self):
         self.assertRaises(RuntimeWarning, lambda: self.state.go_previous())
 
@@ -87,6 +121,69 @@ class TestState(unittest.TestCase):
     def test_go_up_raises(self, option):
         self.assertRaises(RuntimeWarning, lambda: self.state.go_next(option))
 
+    def test_jump(self):
+        self.state.jump(['lvl1', 'lvl2', '2p2'])
+        self.assertEqual(self.state.path, ['root', 'lvl1', 'lvl2', '2p2'])
+        self.assertRaises(RuntimeWarning,
+                lambda: self.state.jump(['lvl1', 'missing']))
+
+    def test_search(self):
+        self.assertEqual(self.state.mode, 'container')
+        self.state.start_search()
+        self.assertEqual(self.state.mode, 'search')
+        self.assertEqual(self.state.find('2p'),
+                [('lvl1', 'lvl2', '2p1'), ('lvl1', 'lvl2', '2p2')])
+        self.state.stop_search()
+        self.assertEqual(self.state.mode, 'container')
+
+    @data(
+        (lambda: 2, '2p: 2'),
+        (lambda: None, '2p done'),
+        (lambda: 1 / 0, '2p failed: integer division or modulo by zero'),
+    )
+    @unpack
+    def test_run_action(self, func, warning):
+        self.state.run_action(fp.Action('2p', func))
+        for _ in range(100):
+            self.state.collect_jobs()
+            if not self.state._workers.jobs:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(self.state.warnings, warning)
+        self.assertEqual(self.state.jobs, [])
+        self.state.close()
+
+    def test_cancelled_action_that_ran(self):
+        started = threading.Event()
+
+        def loop():
+            started.set()
+            while not workers.cancelled():
+                threading.Event().wait(0.01)
+            return 'stopped'
+
+        self.state.run_action(fp.Action('loop', loop))
+        self.assertIsNotNone(self.container._lock)
+        started.wait(1)
+        self.state.cancel_job()
+        self.assertEqual(self.state.close(1), [])
+        self.state.collect_jobs()
+        self.assertEqual(self.state.warnings, 'loop: stopped')
+        self.assertIsNone(self.container._lock)
+
+    def test_run_inactive_action_raises(self):
+        action = fp.Action('2p', lambda: 1, lambda: False)
+        self.assertRaises(RuntimeWarning,
+                lambda: self.state.run_action(action))
+
+    def test_cancel_job_raises(self):
+        self.assertRaises(RuntimeWarning, lambda: self.state.cancel_job())
+
+    def test_fuzzy_search(self):
+        self.state.start_search(fuzzy=True)
+        self.assertEqual(self.state.mode, 'search')
+        self.assertEqual(self.state.find('strng')[0], ('lvl1', 'lvl2', '2p2'))
+
 # @ddt
 # class TestShortFinder(unittest.TestCase):
 
@@ -0,0 +1,104 @@
+#encoding=utf-8
+
+import sys
+import unittest
+
+import figpie as fp
+from figpie import transaction
+from tests.trees import make_tree
+
+
+class TestTransaction(unittest.TestCase):
+
+    def setUp(self):
+        self.root = make_tree([
+            fp.PropertyInt('int', 1),
+            fp.PropertyFloat('float', 1.5),
+            fp.PropertyEnum('enum', ['x', 'y', 'z'], 'x')])
+        self.lvl1 = self.root.lvl1
+        self.union = self.lvl1.union
+
+    def values(self):
+        return self.root.get_many(
+                ['str', 'lvl1/int', 'lvl1/float', 'lvl1/enum'])
+
+    def test_commit(self):
+        with self.root.transaction():
+            self.root.set('str', 'b')
+            self.root.lvl1.int = '2'
+            self.root.get('lvl1/*enum').value = 'y'
+            # nothing visible before commit
+            self.assertEqual(self.values(), ['a', 1, 1.5, 'x'])
+        self.assertEqual(self.values(), ['b', 2, 1.5, 'y'])
+        self.assertIsNone(transaction.active())
+
+    def test_rollback_on_exception(self):
+        try:
+            with self.root.transaction():
+                self.root.set('str', 'b')
+                self.root.set('lvl1/int', 'not an int')
+        except fp.WrongValueException:
+            pass
+        else:
+            self.fail('exception not raised')
+        self.assertEqual(self.values(), ['a', 1, 1.5, 'x'])
+        self.assertIsNone(transaction.active())
+
+    def test_check_together(self):
+        def check(staged):
+            values = {prop.name: value for prop, value in staged.items()}
+            return values.get('int', 0) < values.get('float', 0)
+
+        def bad_transaction():
+            with self.root.transaction(check):
+                self.root.set('lvl1/int', 3)
+                self.root.set('lvl1/float', 2.5)
+
+        self.assertRaises(fp.WrongValueException, bad_transaction)
+        self.assertEqual(self.values(), ['a', 1, 1.5, 'x'])
+
+        with self.root.transaction(check):
+            self.root.set('lvl1/int', 2)
+            self.root.set('lvl1/float', 2.5)
+        self.assertEqual(self.values(), ['a', 2, 2.5, 'x'])
+
+    def test_nested_joins_outer(self):
+        with self.root.transaction() as outer:
+            self.root.set('str', 'b')
+            with self.lvl1.transaction() as inner:
+                self.assertIs(inner, outer)
+                self.root.set('lvl1/int', 5)
+            self.assertEqual(self.values(), ['a', 1, 1.5, 'x'])
+        self.assertEqual(self.values(), ['b', 5, 1.5, 'x'])
+
+    def test_latest_write_wins(self):
+        with self.root.transaction() as t:
+            self.root.set('lvl1/int', 5)
+            self.root.set('lvl1/int', 6)
+            self.assertEqual(t.staged.values(), [6])
+        self.assertEqual(self.root.get('lvl1/int'), 6)
+
+    def test_set_many_is_atomic(self):
+        self.assertRaises(fp.WrongValueException, lambda: self.root.set_many([
+            ('lvl1/int', 4), ('lvl1/enum', 'not an option')]))
+        self.assertEqual(self.values(), ['a', 1, 1.5, 'x'])
+
+    def test_union_mode(self):
+        with self.root.transaction():
+            self.root.set('lvl1/union/mode', 'b')
+            self.assertEqual(self.union.keys(), ['a1', 'mode'])
+        self.assertEqual(self.union.keys(), ['b1', 'mode'])
+        self.assertEqual(self.root.get('lvl1/union/b1'), 2)
+
+    def test_reactive_lambda_invalidated_on_commit(self):
+        total = fp.ReactiveLambda('total', lambda: (
+            self.root.get('lvl1/int') + self.root.get('lvl1/float')))
+        self.assertEqual(total.value, 2.5)
+        with self.root.transaction():
+            self.root.set('lvl1/int', 2)
+            self.assertEqual(total.value, 2.5)
+        self.assertEqual(total.value, 3.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
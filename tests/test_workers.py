@@ -0,0 +1,96 @@
+#encoding=utf-8
+
+import threading
+import unittest
+
+import figpie as fp
+from figpie import workers
+from figpie.workers import Workers
+
+
+def wait_done(job):
+    for _ in range(200):
+        if job.done:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError('{} not done'.format(job.name))
+
+
+class TestWorkers(unittest.TestCase):
+
+    def setUp(self):
+        self.workers = Workers(size=1)
+
+    def tearDown(self):
+        self.workers.close()
+
+    def test_submit_does_not_block(self):
+        release = threading.Event()
+        job = self.workers.submit(fp.Action('slow',
+                lambda: release.wait(1) and 'ok'))
+        self.assertFalse(job.done)
+        self.assertEqual(self.workers.jobs, [job])
+        self.assertEqual(self.workers.collect(), [])
+
+        release.set()
+        wait_done(job)
+        self.assertEqual(self.workers.collect(), [job])
+        self.assertEqual(job.result, 'ok')
+        self.assertEqual(self.workers.jobs, [])
+
+    def test_error(self):
+        def fail():
+            raise ValueError('broken')
+
+        job = self.workers.submit(fp.Action('fail', fail))
+        wait_done(job)
+        self.assertIsInstance(job.error, ValueError)
+        self.assertIsNone(job.result)
+
+    def test_cancel(self):
+        started = threading.Event()
+
+        def loop():
+            started.set()
+            while not workers.cancelled():
+                threading.Event().wait(0.01)
+            return 'stopped'
+
+        first = self.workers.submit(fp.Action('loop', loop))
+        waiting = self.workers.submit(fp.Action('waiting', lambda: 'run'))
+        started.wait(1)
+        self.assertIs(self.workers.cancel(), waiting)
+        self.assertIs(self.workers.cancel(), first)
+        self.assertIsNone(self.workers.cancel())
+
+        wait_done(first)
+        wait_done(waiting)
+        self.assertEqual(first.result, 'stopped')
+        self.assertIsNone(waiting.result)
+        self.assertTrue(waiting.cancelled)
+        self.assertTrue(waiting.skipped)
+        self.assertTrue(first.cancelled)
+        self.assertFalse(first.skipped)
+
+    def test_done_jobs_are_collectable(self):
+        jobs = [self.workers.submit(fp.Action('a{}'.format(i), lambda: i))
+                for i in range(20)]
+        for job in jobs:
+            wait_done(job)
+            self.assertIn(job, self.workers._finished)
+
+    def test_close_waits(self):
+        started, release = threading.Event(), threading.Event()
+        job = self.workers.submit(fp.Action('slow',
+                lambda: started.set() or release.wait(1)))
+        started.wait(1)
+        self.assertEqual(self.workers.close(0.02), [job])
+        release.set()
+        wait_done(job)
+
+    def test_cancelled_outside_job(self):
+        self.assertFalse(workers.cancelled())
+
+
+if __name__ == '__main__':
+    unittest.main()
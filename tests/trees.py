@@ -0,0 +1,21 @@
+#encoding=utf-8
+
+import figpie as fp
+
+
+''' Union 'union' with modes a and b (default cells a1 and b1) in given
+mode '''
+def make_union(mode='a', a=None, b=None):
+    union = fp.Union('union', {
+        'a': [fp.PropertyInt('a1', 1)] if a is None else a,
+        'b': [fp.PropertyInt('b1', 2)] if b is None else b})
+    union['mode'] = mode
+    return union
+
+
+''' Tree root[str, lvl1[cells..., union], extra...] '''
+def make_tree(cells, mode='a', extra=()):
+    return fp.CellContainer('root', [
+        fp.PropertyString('str', 'a'),
+        fp.CellContainer('lvl1', list(cells) + [make_union(mode)])]
+        + list(extra))